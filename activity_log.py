@@ -0,0 +1,86 @@
+"""
+Bounded in-memory activity log
+
+Any thread (engine, watchdog, GUI) appends records to a fixed-size ring;
+views read what is new since the last sequence number they saw, so a GUI
+can flush a whole batch to its widget in one insert. The full ring can be
+exported to a text file. With echo_debug set, DEBUG records are also
+printed to the console (other levels are printed by their callers).
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, List, Optional
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+
+@dataclass(frozen=True)
+class LogRecord:
+    seq: int
+    timestamp: float
+    level: str
+    message: str
+
+    def format(self) -> str:
+        stamp = datetime.fromtimestamp(self.timestamp).strftime("%H:%M:%S")
+        if self.level == "INFO":
+            return f"[{stamp}] {self.message}"
+        return f"[{stamp}] {self.level}: {self.message}"
+
+
+class ActivityLog:
+    """Thread-safe ring of the last capacity log records"""
+
+    def __init__(self, capacity: int = 1000):
+        self._records: Deque[LogRecord] = deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.echo_debug = False
+
+    def log(self, message: str, level: str = "INFO", timestamp: Optional[float] = None):
+        """Append a record; timestamp defaults to now (relayed records keep their own)"""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown log level '{level}'")
+        with self._lock:
+            self._seq += 1
+            record = LogRecord(self._seq, time.time() if timestamp is None else timestamp, level, message)
+            self._records.append(record)
+        if self.echo_debug and level == "DEBUG":
+            print(record.format())
+
+    def debug(self, message: str):
+        self.log(message, "DEBUG")
+
+    def info(self, message: str):
+        self.log(message, "INFO")
+
+    def warning(self, message: str):
+        self.log(message, "WARNING")
+
+    def error(self, message: str):
+        self.log(message, "ERROR")
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def since(self, seq: int = 0, level: str = "DEBUG", limit: Optional[int] = None) -> List[LogRecord]:
+        """Records newer than seq at or above level (the last limit of them)"""
+        threshold = LEVELS[level]
+        with self._lock:
+            if not self._records or self._records[-1].seq <= seq:
+                return []
+            records = [r for r in self._records if r.seq > seq and LEVELS[r.level] >= threshold]
+        return records[-limit:] if limit else records
+
+    def export(self, path: str, level: str = "DEBUG") -> int:
+        """Write the whole ring to a text file; returns the number of records written"""
+        records = self.since(0, level)
+        with open(path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(record.format() + "\n")
+        return len(records)
@@ -0,0 +1,309 @@
+"""
+asyncio variant of the monitoring engine
+
+AsyncEngineRunner is a drop-in EngineRunner (same snapshots, subscribers,
+start/stop/rescan) whose loop is a set of independent tasks on one event
+loop instead of one sequential tick:
+- focus: waits on focus-change events off-loop, idles and warm-starts the rest
+- capture: observes the screen and handles health/mana flasks every tick
+- health: the health watchdog, at its fixed sample rate
+- utility: sleeps until the next utility buff runs out instead of polling
+- rescan: full slot rescans on their interval or on request
+
+Detection runs on a single worker thread (so no two detector calls overlap)
+and health sampling on another, exactly like the threaded engine's main loop
+and watchdog. The health worker never waits on the manager's state_lock:
+like the watchdog thread it presses on its own and hands the use to the
+detect worker, which books it under the lock before its next decision.
+Every off-loop call has a timeout; a call that times out keeps its worker busy and later calls queue
+behind it, so nothing overlaps. Use run_async() to embed the engine in other
+asyncio code; cancelling that task stops the engine cleanly.
+"""
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from potions import AdvancedPotionManager, EngineRunner, PotionCategory
+
+
+class _HealthTask:
+    """Stands in for the HealthWatchdog thread while the async health task runs
+
+    observe() and decide_actions() only look at is_alive() and latest, so the
+    rest of the manager can't tell the difference.
+    """
+
+    def __init__(self, task: "asyncio.Task", loop: asyncio.AbstractEventLoop):
+        self.task = task
+        self.loop = loop
+        self.latest = None
+
+    def is_alive(self) -> bool:
+        return not self.task.done()
+
+    def stop(self):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.task.cancel)
+
+
+class AsyncEngineRunner(EngineRunner):
+    """EngineRunner whose loop is asyncio tasks instead of one sequential tick"""
+
+    def __init__(self, manager: AdvancedPotionManager, tick_interval: float = 0.1,
+                 publish_rate: float = 10.0, detector_timeout: float = 2.0,
+                 focus_timeout: float = 0.5, utility_interval: float = 0.5):
+        super().__init__(manager, tick_interval, publish_rate)
+        self.detector_timeout = detector_timeout  # Longest wait for one detection call
+        self.focus_timeout = focus_timeout  # Longest single wait for a focus change
+        self.utility_interval = utility_interval  # Utility check interval when no buff is running
+        self.timeouts = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._active: Optional[asyncio.Event] = None  # Set while focused (or focus isn't required)
+        self._rescan_requested: Optional[asyncio.Event] = None
+        self._detect: Optional[ThreadPoolExecutor] = None
+        self._health: Optional[ThreadPoolExecutor] = None
+
+    # Thread-safe control
+
+    def _signal(self, event_name: str):
+        loop, event = self._loop, getattr(self, event_name)
+        if loop is not None and event is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    def stop(self):
+        super().stop()
+        self._signal("_stopped")
+
+    def rescan(self):
+        super().rescan()
+        if self.running:
+            self._signal("_rescan_requested")
+
+    def run(self):
+        """Run the engine's event loop on the calling thread until stop()"""
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            print("\nStopping potion manager...")
+
+    # Event loop side
+
+    async def offload(self, executor: Optional[ThreadPoolExecutor], fn: Callable, *args,
+                      timeout: Optional[float] = None) -> Any:
+        """Run fn off the loop; None (and a logged warning) if it times out"""
+        future = self._loop.run_in_executor(executor, functools.partial(fn, *args))
+        try:
+            # shield: a timeout stops the wait, the worker still finishes the call
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.detector_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            name = getattr(fn, "__name__", "call")
+            print(f"{name} is taking longer than {timeout or self.detector_timeout:g}s")
+            self.manager.activity_log.warning(f"{name} timed out")
+            return None
+
+    def record_error(self, where: str, error: Exception):
+        self.error_count += 1
+        self.last_error = str(error)
+        print(f"Error in {where}: {error}")
+        self.manager.activity_log.error(f"Error in {where}: {error}")
+
+    async def run_async(self):
+        """Monitor until stop() or cancellation; embeddable in any running loop"""
+        manager = self.manager
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._active = asyncio.Event()
+        self._rescan_requested = asyncio.Event()
+        self._detect = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PotionDetect")
+        self._health = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PotionHealth")
+        self.running = True
+        tasks: List[asyncio.Task] = []
+        try:
+            # Templates may still be loading in the background
+            await self._loop.run_in_executor(None, manager.wait_for_templates)
+            manager.ensure_focus_provider()
+            manager.ensure_input_dispatcher()
+            manager.ensure_config_watcher()
+            if manager.last_scan_time == 0.0:
+                await self.offload(self._detect, manager.initial_scan)
+                self.scan_count += 1
+            if not manager.require_window_focus or manager.check_window_focus():
+                self._active.set()
+            else:
+                self._idle = True
+
+            tasks = [asyncio.ensure_future(coro) for coro in (
+                self.focus_task(), self.capture_task(), self.utility_task(), self.rescan_task())]
+            if manager.use_health_watchdog:
+                health = asyncio.ensure_future(self.health_task())
+                manager.health_watchdog = _HealthTask(health, self._loop)
+                tasks.append(health)
+            self.publish(force=True)
+            await self._stopped.wait()
+        finally:
+            self.running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if isinstance(manager.health_watchdog, _HealthTask):
+                manager.health_watchdog = None
+            # Let an in-flight detection call finish before anything else touches the manager
+            for executor in (self._detect, self._health):
+                await self._loop.run_in_executor(
+                    None, functools.partial(executor.shutdown, wait=True, cancel_futures=True))
+            manager.stop_input_dispatcher()
+            manager.persist_state(force=True)
+            self._idle = False
+            self.publish(force=True)
+            self._loop = None
+
+    async def focus_task(self):
+        """Idle every other task while the game is unfocused"""
+        manager = self.manager
+        while True:
+            try:
+                provider = manager.ensure_focus_provider()
+                # Blocking wait on the provider's condition, off the loop
+                await self._loop.run_in_executor(None, provider.wait_for_change, self.focus_timeout)
+                focused = not manager.require_window_focus or manager.check_window_focus()
+                if focused and not self._active.is_set():
+                    print("Path of Exile is active - resuming")
+                    await self.offload(self._detect, manager.warm_start)
+                    self.scan_count += 1
+                    self._idle = False
+                    self._active.set()
+                    self.publish(force=True)
+                elif not focused and self._active.is_set():
+                    print("\nPath of Exile is not focused - idling until it is active again")
+                    self._active.clear()
+                    self._idle = True
+                    await self.offload(self._detect, manager.release_capture_resources)
+                    self.publish(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record_error("focus task", e)
+                await asyncio.sleep(1)
+
+    def _capture_pass(self):
+        """One observation plus the health/mana decisions that depend on it"""
+        manager = self.manager
+        if manager.pending_config is not None:
+            manager.apply_pending_config()
+        if not manager.capture_ready():
+            return  # No fresh frames to decide on
+        manager.update_game_state()
+        if manager.pending_presses:
+            manager.verify_pending_presses()
+        manager.decide_and_apply({PotionCategory.HEALTH, PotionCategory.MANA})
+        manager.persist_state()
+
+    async def capture_task(self):
+        while True:
+            await self._active.wait()
+            try:
+                await self.offload(self._detect, self._capture_pass)
+                self.tick_count += 1
+                self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record_error("capture task", e)
+                await asyncio.sleep(1)
+            await asyncio.sleep(self.tick_interval)
+
+    async def health_task(self):
+        """Fixed-rate health sampling, skipping missed samples instead of bursting"""
+        manager = self.manager
+        interval = 1.0 / manager.health_watchdog_rate
+        next_sample = time.perf_counter()
+        while True:
+            if not self._active.is_set():
+                await self._active.wait()
+                next_sample = time.perf_counter()
+            try:
+                latest = await self.offload(self._health, manager.health_watchdog_tick, timeout=interval * 10)
+                if latest is not None and isinstance(manager.health_watchdog, _HealthTask):
+                    manager.health_watchdog.latest = latest
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Health watchdog error: {e}")
+            next_sample += interval
+            delay = next_sample - time.perf_counter()
+            if delay < 0:
+                next_sample = time.perf_counter()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def next_utility_expiry(self) -> Optional[float]:
+        """Wall-clock time the next running utility buff runs out, if any"""
+        now = time.time()
+        expiries = [slot.active_until for slot in self.manager.slots
+                    if slot.category == PotionCategory.UTILITY and slot.active_until > now]
+        return min(expiries) if expiries else None
+
+    async def utility_task(self):
+        """Utility flasks on their own timeline, woken when a buff runs out"""
+        manager = self.manager
+        while True:
+            await self._active.wait()
+            try:
+                if manager.last_observation is not None:
+                    await self.offload(self._detect, manager.process_utility_potions)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record_error("utility task", e)
+            expiry = self.next_utility_expiry()
+            delay = self.utility_interval if expiry is None else min(self.utility_interval,
+                                                                     max(0.0, expiry - time.time()))
+            # The capture tick must observe the expired buff before it can be renewed
+            await asyncio.sleep(max(delay, self.tick_interval))
+
+    async def rescan_task(self):
+        manager = self.manager
+        while True:
+            remaining = manager.last_scan_time + manager.full_rescan_interval - time.time()
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self._rescan_requested.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                self._rescan_requested.clear()
+            await self._active.wait()
+            try:
+                await self.offload(self._detect, manager.scan_all_slots)
+                manager.last_scan_time = time.time()
+                self.scan_count += 1
+                self.publish(force=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.record_error("rescan task", e)
+                await asyncio.sleep(1)
+
+
+async def main_loop_async(manager: AdvancedPotionManager):
+    """asyncio counterpart of AdvancedPotionManager.main_loop for use inside other async code"""
+    if not isinstance(manager.engine, AsyncEngineRunner):
+        manager.engine = AsyncEngineRunner(manager)
+    print("Advanced Potion Manager started (asyncio engine).")
+    await manager.engine.run_async()
+
+
+if __name__ == "__main__":
+    potion_manager = AdvancedPotionManager()
+    potion_manager.engine = AsyncEngineRunner(potion_manager)
+    potion_manager.engine.subscribe(lambda snapshot: potion_manager.print_status())
+    try:
+        asyncio.run(main_loop_async(potion_manager))
+    except KeyboardInterrupt:
+        print("\nStopping potion manager...")
+    finally:
+        potion_manager.stop()
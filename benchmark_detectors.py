@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Detector benchmark over labeled and recorded frames
+
+Feeds frames to the manager's detectors through frame_source (no screen
+capture) and reports, per detector, milliseconds per call (mean/p50/p99)
+and the peak memory allocated during a call (numpy/Python allocations as
+seen by tracemalloc; OpenCV's internal buffers are not traced).
+
+Inputs:
+- full/slotN/*.png and empty/slotN/*.png: slot images labeled by folder
+  (empty) or by the type in the file name (health/mana/utility). Every image
+  is detected against its own slot's other templates ("same slot", leaving
+  the image's own template out) and against the other slots' templates
+  ("cross slot"); each gets a category confusion matrix.
+- Synthetic health/mana orbs at known fill levels, sized like the configured
+  orb regions: a round orb with a rim on a noisy background, liquid with hue
+  and shade variation, for the orb, pixel and HSV detectors (mean absolute
+  error and how many inputs gave a reading). The orb detector bisects the
+  column the setup tool would calibrate; the combined detector runs with the
+  configured settings.
+- --frames DIR: recorded screenshots of the game at the configured layout;
+  names containing hp<N> / mp<N> (e.g. fight_hp62_mp40.png) are labeled.
+
+Results are written as JSON; --compare OLD.json prints the change against
+an earlier run so regressions between versions are visible.
+
+Usage:
+    python benchmark_detectors.py [--repeat N] [--slot-repeat N] [--frames DIR]
+                                  [--output FILE] [--compare OLD.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from potions import AdvancedPotionManager, PotionSubtype
+
+CATEGORIES = ["health", "mana", "utility", "empty"]
+FILL_LEVELS = list(range(0, 101, 5))
+ORB_BACKGROUND = (24, 22, 20)  # BGR of the UI around the orb
+ORB_RIM = (38, 64, 92)  # BGR of the orb's frame
+ORB_GLASS = (18, 14, 12)  # BGR of an empty orb
+ORB_LIQUID = {"health": (28, 20, 158), "mana": (181, 110, 11)}  # BGR, as the setup tool records them
+LABEL_PATTERN = re.compile(r"(hp|mp)(\d{1,3})", re.IGNORECASE)
+
+
+class FrameSource:
+    """Serves regions of one image placed at a screen origin; pixels outside it read as black"""
+
+    def __init__(self, image: np.ndarray, origin: Tuple[int, int] = (0, 0)):
+        self.image = image
+        self.origin = origin
+
+    def __call__(self, region) -> np.ndarray:
+        x, y, width, height = (int(v) for v in region)
+        x, y = x - self.origin[0], y - self.origin[1]
+        img_height, img_width = self.image.shape[:2]
+        out = np.zeros((height, width, 3), dtype=np.uint8)
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, img_width), min(y + height, img_height)
+        if right > left and bottom > top:
+            out[top - y:bottom - y, left - x:right - x] = self.image[top:bottom, left:right]
+        return out
+
+
+class DetectorStats:
+    """Per-call timings and peak allocations of one detector"""
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.peaks: List[int] = []
+
+    def summary(self) -> Dict[str, Any]:
+        times = np.array(self.times) * 1000
+        summary = {"calls": len(self.times)}
+        if len(times):
+            summary.update(mean_ms=round(float(times.mean()), 4),
+                           p50_ms=round(float(np.percentile(times, 50)), 4),
+                           p99_ms=round(float(np.percentile(times, 99)), 4),
+                           max_ms=round(float(times.max()), 4))
+        if self.peaks:
+            summary["peak_alloc_kib"] = round(float(np.mean(self.peaks)) / 1024, 2)
+        return summary
+
+
+class Benchmark:
+    def __init__(self, repeat: int = 5, slot_repeat: int = 1):
+        self.repeat = repeat
+        self.slot_repeat = slot_repeat
+        self.stats: Dict[str, DetectorStats] = defaultdict(DetectorStats)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.manager = AdvancedPotionManager(load_templates=False)
+        manager = self.manager
+        # Frames are served in config coordinates; no window tracking or focus provider
+        manager.coordinate_space = "desktop"
+        manager.window_rect = None
+        # The progress templates match screen regions outside the slot image; measure the fallback
+        manager.progress_bar_templates = {}
+        manager.slot_progress_regions = []
+        self.results: Dict[str, Any] = {}
+
+    def call(self, name: str, fn: Callable, *args) -> Any:
+        """Time one detector call (console output from the detector is discarded)"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn(*args)
+            self.stats[name].times.append(time.perf_counter() - start)
+        return result
+
+    def measure_allocations(self, name: str, fn: Callable, *args):
+        """Peak memory allocated during one call, in a separate traced run (tracing skews timings)"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            try:
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                fn(*args)
+                self.stats[name].peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            finally:
+                tracemalloc.stop()
+
+    # Slot detection
+
+    @staticmethod
+    def labeled_slot_images() -> List[Tuple[str, int, str]]:
+        """(path, slot index, category label) for every labeled slot image"""
+        images = []
+        for state in ("full", "empty"):
+            for slot_num in range(1, 6):
+                slot_dir = os.path.join(state, f"slot{slot_num}")
+                if not os.path.isdir(slot_dir):
+                    continue
+                for filename in sorted(os.listdir(slot_dir)):
+                    if not filename.endswith(".png"):
+                        continue
+                    label = "empty" if state == "empty" else filename[:-4].rsplit("_", 1)[-1].lower()
+                    if label in CATEGORIES:
+                        images.append((os.path.join(slot_dir, filename), slot_num - 1, label))
+        return images
+
+    def predicted_category(self, subtype: PotionSubtype, uses: int) -> str:
+        if subtype == PotionSubtype.EMPTY or uses == 0:
+            return "empty"
+        return self.manager.potion_configs[subtype]["category"].value
+
+    def run_slot_detection(self):
+        manager = self.manager
+        images = self.labeled_slot_images()
+        matrices = {mode: np.zeros((len(CATEGORIES), len(CATEGORIES)), dtype=int)
+                    for mode in ("same_slot", "cross_slot")}
+        progress_active = defaultdict(int)
+        progress_total = defaultdict(int)
+        for path, own_slot, label in images:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            height, width = image.shape[:2]
+            manager.frame_source = FrameSource(image)
+            slot_count = len(manager.slots)
+            manager.slot_regions = [(0, 0, width, height)] * slot_count
+            for slot in range(slot_count):
+                mode = "same_slot" if slot == own_slot else "cross_slot"
+                # The image is itself a template of its slot; matching it against itself proves nothing
+                manager.excluded_template_paths = {path} if slot == own_slot else set()
+                for _ in range(self.slot_repeat):
+                    subtype, uses, _ = self.call("detect_potion_type_and_uses",
+                                                 manager.detect_potion_type_and_uses, slot)
+                matrices[mode][CATEGORIES.index(label), CATEGORIES.index(self.predicted_category(subtype, uses))] += 1
+            manager.excluded_template_paths = set()
+            for _ in range(self.slot_repeat):
+                active = self.call("detect_slot_progress_bar", manager.detect_slot_progress_bar, own_slot)
+            progress_total[label] += 1
+            progress_active[label] += bool(active)
+            self.measure_allocations("detect_potion_type_and_uses", manager.detect_potion_type_and_uses, own_slot)
+            self.measure_allocations("detect_slot_progress_bar", manager.detect_slot_progress_bar, own_slot)
+
+        self.results["slot_detection"] = {
+            "images": len(images),
+            "labels": CATEGORIES,
+            **{mode: {"matrix": matrix.tolist(),
+                      "accuracy": round(float(np.trace(matrix) / matrix.sum()), 4) if matrix.sum() else None}
+               for mode, matrix in matrices.items()},
+        }
+        # No progress bar labels exist; report how often a bar was seen per slot label
+        self.results["progress_bar"] = {label: {"images": progress_total[label], "active": progress_active[label]}
+                                        for label in CATEGORIES if progress_total[label]}
+
+    # Health and mana
+
+    @staticmethod
+    def synthetic_orb(width: int, height: int, kind: str, fill: float) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        """A round orb filled to fill % of its height, and its liquid column
+
+        The column (x, y, 1, height, relative to the image) runs from the bottom
+        to the top of the liquid of a full orb, as the setup tool calibrates it.
+        """
+        rng = np.random.default_rng(int(fill))
+        orb = (np.array(ORB_BACKGROUND, np.int16) + rng.integers(-8, 9, (height, width, 3))).clip(0, 255)
+        orb = orb.astype(np.uint8)
+        cx, cy = width // 2, height // 2
+        radius = min(width, height) // 2 - max(4, min(width, height) // 20)
+        ys, xs = np.mgrid[0:height, 0:width]
+        distance = np.sqrt((xs - cx) ** 2 + (ys - cy) ** 2)
+        orb[distance <= radius + max(3, radius // 12)] = ORB_RIM
+        inside = distance <= radius
+        orb[inside] = ORB_GLASS
+        
+        # Liquid rows from the bottom; hue jitter, lighter towards the surface
+        rows = int(round((2 * radius + 1) * fill / 100))
+        liquid = inside & (ys >= cy + radius + 1 - rows)
+        base = cv2.cvtColor(np.uint8([[ORB_LIQUID[kind]]]), cv2.COLOR_BGR2HSV)[0, 0].astype(np.int16)
+        shade = 1.0 - 0.4 * (ys - (cy - radius)) / (2 * radius)
+        hsv = np.stack([(base[0] + rng.integers(-3, 4, (height, width))) % 180,
+                        base[1] - rng.integers(0, 40, (height, width)),
+                        base[2] * shade.clip(0.6, 1.0) + rng.integers(-10, 11, (height, width))], axis=-1)
+        colored = cv2.cvtColor(hsv.clip(0, 255).astype(np.uint8), cv2.COLOR_HSV2BGR)
+        orb[liquid] = colored[liquid]
+        return orb, (cx, cy - radius, 1, 2 * radius + 1)
+
+    def resource_detectors(self, kind: str, column) -> Dict[str, Tuple[Callable, bool]]:
+        """Name -> (detector, returns a real fill level) for one resource"""
+        manager = self.manager
+        return {
+            f"detect_orb_fill[{kind}]": (lambda: manager.detect_orb_fill(column, kind), True),
+            f"detect_{kind}_percentage_pixel": (getattr(manager, f"detect_{kind}_percentage_pixel"), False),
+            f"detect_{kind}_percentage_hsv": (getattr(manager, f"detect_{kind}_percentage_hsv"), False),
+            f"detect_{kind}_percentage": (getattr(manager, f"detect_{kind}_percentage"), True),
+        }
+
+    def run_resource_detectors(self):
+        manager = self.manager
+        errors: Dict[str, List[float]] = defaultdict(list)
+        inputs: Dict[str, int] = defaultdict(int)
+        for kind in ("health", "mana"):
+            region = getattr(manager, f"{kind}_bar_region")
+            if not region:
+                continue
+            x, y, width, height = region
+            detectors = None
+            for fill in FILL_LEVELS:
+                orb, (col_x, col_y, col_width, col_height) = self.synthetic_orb(width, height, kind, fill)
+                if detectors is None:
+                    detectors = self.resource_detectors(kind, (x + col_x, y + col_y, col_width, col_height))
+                manager.frame_source = FrameSource(orb, (x, y))
+                for name, (detector, exact) in detectors.items():
+                    for _ in range(self.repeat):
+                        value = self.call(name, detector)
+                    if exact:
+                        inputs[name] += 1
+                        if value is not None:
+                            errors[name].append(abs(value - fill))
+                    self.measure_allocations(name, detector)
+        self.results["resource_detection"] = {
+            "fill_levels": FILL_LEVELS,
+            "mean_abs_error": {name: round(float(np.mean(values)), 3) for name, values in errors.items()},
+            "readings": {name: {"inputs": count, "with_value": len(errors[name])} for name, count in inputs.items()},
+        }
+
+    def run_recorded_frames(self, frames_dir: str):
+        manager = self.manager
+        errors: Dict[str, List[float]] = defaultdict(list)
+        frames = sorted(f for f in os.listdir(frames_dir) if f.lower().endswith(".png"))
+        for filename in frames:
+            image = cv2.imread(os.path.join(frames_dir, filename))
+            if image is None:
+                continue
+            labels = {key.lower(): int(value) for key, value in LABEL_PATTERN.findall(filename)}
+            manager.frame_source = FrameSource(image)
+            for kind, key in (("health", "hp"), ("mana", "mp")):
+                name = f"recorded:detect_{kind}_percentage"
+                value = self.call(name, getattr(manager, f"detect_{kind}_percentage"))
+                if key in labels and value is not None:
+                    errors[name].append(abs(value - labels[key]))
+        self.results["recorded_frames"] = {
+            "frames": len(frames),
+            "mean_abs_error": {name: round(float(np.mean(values)), 3) for name, values in errors.items()},
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "revision": git_revision(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "repeat": self.repeat,
+            "slot_repeat": self.slot_repeat,
+            "detectors": {name: stats.summary() for name, stats in sorted(self.stats.items())},
+            **self.results,
+        }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    old_detectors = (previous or {}).get("detectors", {})
+    print(f"{'detector':<42} {'calls':>6} {'mean ms':>9} {'p99 ms':>9} {'peak KiB':>9}")
+    for name, stats in report["detectors"].items():
+        line = (f"{name:<42} {stats['calls']:>6} {stats.get('mean_ms', 0):>9.3f} {stats.get('p99_ms', 0):>9.3f} "
+                f"{stats.get('peak_alloc_kib', 0):>9.1f}")
+        old = old_detectors.get(name)
+        if old and old.get("mean_ms"):
+            line += f"   mean {(stats['mean_ms'] / old['mean_ms'] - 1) * 100:+.0f}% vs {previous.get('revision')}"
+        print(line)
+
+    slots = report.get("slot_detection")
+    if slots:
+        for mode in ("same_slot", "cross_slot"):
+            result = slots[mode]
+            old = (previous or {}).get("slot_detection", {}).get(mode, {}).get("accuracy")
+            change = f" (was {old:.1%})" if old is not None else ""
+            accuracy = f"{result['accuracy']:.1%}" if result["accuracy"] is not None else "n/a"
+            print(f"\n{mode.replace('_', '-')} detection: accuracy {accuracy}{change}  (rows: label, columns: detected)")
+            print(" " * 10 + "".join(f"{label:>9}" for label in slots["labels"]))
+            for label, row in zip(slots["labels"], result["matrix"]):
+                print(f"{label:<10}" + "".join(f"{count:>9}" for count in row))
+
+    for section in ("resource_detection", "recorded_frames"):
+        errors = report.get(section, {}).get("mean_abs_error")
+        readings = report.get(section, {}).get("readings", {})
+        if errors:
+            print(f"\n{section.replace('_', ' ')}: mean absolute error (percentage points)")
+            for name, error in errors.items():
+                line = f"  {name:<40} {error:7.2f}"
+                if name in readings:
+                    line += f"   ({readings[name]['with_value']}/{readings[name]['inputs']} inputs gave a reading)"
+                print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the potion detectors on labeled and recorded frames")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per health/mana input (default: 5)")
+    parser.add_argument("--slot-repeat", type=int, default=1, help="timed calls per slot image and slot (default: 1)")
+    parser.add_argument("--frames", help="directory of recorded game screenshots (hp<N>/mp<N> in names as labels)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(repeat=max(1, args.repeat), slot_repeat=max(1, args.slot_repeat))
+    benchmark.run_slot_detection()
+    benchmark.run_resource_detectors()
+    if args.frames:
+        benchmark.run_recorded_frames(args.frames)
+    report = benchmark.report()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
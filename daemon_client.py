@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Thin client for the headless potion daemon (potion_daemon.py)
+
+Talks to the daemon over a local Unix socket (a named pipe on Windows).
+Every message is one JSON object sent with send_bytes; nothing is pickled.
+Requests are {"cmd": ..., ...} and replies {"ok": true, ...} or
+{"ok": false, "error": ...}. After "subscribe" the daemon keeps sending
+{"event": "snapshot" | "log", ...} messages until the client disconnects.
+
+Only the standard library is imported here, so clients start instantly and
+never load the detection stack.
+
+Usage:
+    python daemon_client.py status
+    python daemon_client.py start | stop | rescan | shutdown
+    python daemon_client.py get
+    python daemon_client.py set health_threshold=45 slot_auto_use=1,1,0,1,1
+    python daemon_client.py watch [LEVEL]
+"""
+
+import json
+import os
+import platform
+import sys
+import tempfile
+from multiprocessing.connection import Client
+from typing import Any, Dict, Iterator, Optional
+
+
+# Per-slot flag lists clients may set alongside manager_config.SETTINGS and use_gui_controls
+SLOT_FLAG_SETTINGS = ("slot_auto_use", "slot_instant", "slot_enduring")
+
+
+class DaemonError(Exception):
+    """The daemon refused a request"""
+
+
+def default_address() -> str:
+    """Per-user control address: a named pipe on Windows, a socket file elsewhere"""
+    if platform.system() == "Windows":
+        return r"\\.\pipe\poe-potion-daemon-" + os.environ.get("USERNAME", "user")
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"poe-potion-daemon-{os.getuid()}.sock")
+
+
+def address_family(address: str) -> str:
+    return "AF_PIPE" if address.startswith("\\\\") else "AF_UNIX"
+
+
+def send_message(conn, message: Dict[str, Any]):
+    conn.send_bytes(json.dumps(message).encode("utf-8"))
+
+
+def recv_message(conn) -> Dict[str, Any]:
+    return json.loads(conn.recv_bytes().decode("utf-8"))
+
+
+class DaemonClient:
+    """One connection to the daemon; request/reply, or a subscription stream"""
+
+    def __init__(self, address: Optional[str] = None):
+        self.address = address or default_address()
+        self.conn = Client(self.address, family=address_family(self.address))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, cmd: str, **params) -> Dict[str, Any]:
+        send_message(self.conn, {"cmd": cmd, **params})
+        reply = recv_message(self.conn)
+        if not reply.get("ok"):
+            raise DaemonError(reply.get("error", "request failed"))
+        return reply
+
+    def ping(self) -> Dict[str, Any]:
+        return self.request("ping")
+
+    def start(self):
+        self.request("start")
+
+    def stop(self):
+        self.request("stop")
+
+    def rescan(self):
+        self.request("rescan")
+
+    def shutdown(self):
+        self.request("shutdown")
+
+    def get_settings(self) -> Dict[str, Any]:
+        return self.request("get")["settings"]
+
+    def set_settings(self, **settings) -> Dict[str, Any]:
+        return self.request("set", settings=settings)["settings"]
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        return self.request("snapshot")["snapshot"]
+
+    def subscribe(self, level: str = "INFO") -> Iterator[Dict[str, Any]]:
+        """Yield snapshot and log events until the daemon goes away
+
+        The connection is dedicated to the stream afterwards; use a second
+        client for commands.
+        """
+        self.request("subscribe", level=level)
+        while True:
+            try:
+                yield recv_message(self.conn)
+            except (EOFError, OSError):
+                return
+
+
+def _parse_value(text: str) -> Any:
+    if "," in text:
+        return [_parse_value(part) for part in text.split(",")]
+    lowered = text.lower()
+    if lowered in ("true", "yes", "on"):
+        return True
+    if lowered in ("false", "no", "off"):
+        return False
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _format_snapshot(snapshot: Dict[str, Any]) -> str:
+    state = "idle" if snapshot["idle"] else ("running" if snapshot["running"] else "stopped")
+    slots = " | ".join(f"{slot['slot_number']}:{slot['subtype']}({slot['uses_remaining']}/{slot['max_uses']})"
+                       for slot in snapshot["slots"])
+    return (f"[{state}] HP {snapshot['health_percentage']:.1f}% MP {snapshot['mana_percentage']:.1f}% "
+            f"tick {snapshot['tick']} | {slots}")
+
+
+def main(argv=None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] in ("-h", "--help"):
+        print(__doc__)
+        return 0
+    command, rest = args[0], args[1:]
+    try:
+        client = DaemonClient()
+    except (FileNotFoundError, ConnectionRefusedError, OSError) as e:
+        print(f"Potion daemon is not running ({e})")
+        return 1
+
+    with client:
+        try:
+            if command == "status":
+                info = client.ping()
+                print(f"Daemon PID {info['pid']}, engine {'running' if info['running'] else 'stopped'}")
+                snapshot = client.snapshot()
+                if snapshot:
+                    print(_format_snapshot(snapshot))
+            elif command in ("start", "stop", "rescan", "shutdown"):
+                client.request(command)
+                print(f"{command}: ok")
+            elif command == "get":
+                for name, value in sorted(client.get_settings().items()):
+                    print(f"{name} = {value}")
+            elif command == "set":
+                settings = {}
+                for assignment in rest:
+                    name, _, value = assignment.partition("=")
+                    settings[name] = _parse_value(value)
+                for name, value in sorted(client.set_settings(**settings).items()):
+                    print(f"{name} = {value}")
+            elif command == "watch":
+                for event in client.subscribe(rest[0].upper() if rest else "INFO"):
+                    if event["event"] == "snapshot":
+                        print(_format_snapshot(event["snapshot"]))
+                    else:
+                        for record in event["records"]:
+                            print(f"  {record['level']}: {record['message']}")
+            else:
+                print(f"Unknown command '{command}'")
+                return 2
+        except DaemonError as e:
+            print(f"Error: {e}")
+            return 1
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
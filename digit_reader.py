@@ -0,0 +1,156 @@
+"""
+Low-CPU digit reader for the health/mana number regions
+
+Reads text like "1523/1600" without a general OCR engine: the region is
+binarized, split into glyphs by column projection and each glyph is matched
+against a small atlas learned from setup captures (potion-setup.py).
+Results are memoized on a hash of the captured pixels, so unchanged
+numbers cost only the capture and a hash.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from startup import lazy_import
+
+cv2 = lazy_import("cv2")
+
+GLYPH_DIR = os.path.join("settings", "glyphs")
+GLYPH_SIZE = (8, 12)  # Normalized glyph width, height
+MAX_GLYPH_DISTANCE = 0.35  # Mean absolute difference above which a glyph is unknown
+
+
+def binarize(img: np.ndarray) -> np.ndarray:
+    """Binarize a BGR capture so the (bright) text is 1 and the background 0"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return mask
+
+
+def segment_glyphs(mask: np.ndarray) -> List[np.ndarray]:
+    """Split a binary text image into glyphs using its column projection"""
+    columns = mask.any(axis=0)
+    glyphs = []
+    start = None
+    for x, filled in enumerate(np.append(columns, False)):
+        if filled and start is None:
+            start = x
+        elif not filled and start is not None:
+            glyph = mask[:, start:x]
+            rows = np.flatnonzero(glyph.any(axis=1))
+            glyphs.append(glyph[rows[0]:rows[-1] + 1])
+            start = None
+    return glyphs
+
+
+def normalize_glyph(glyph: np.ndarray) -> np.ndarray:
+    """Scale a glyph to the atlas size as a float image in [0, 1]"""
+    return cv2.resize(glyph.astype(np.float32), GLYPH_SIZE, interpolation=cv2.INTER_AREA)
+
+
+class GlyphAtlas:
+    """Reference glyphs per character, learned from captures with known text"""
+
+    def __init__(self):
+        self.glyphs: Dict[str, List[np.ndarray]] = {}
+        self._chars: List[str] = []
+        self._stack: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return sum(len(g) for g in self.glyphs.values())
+
+    def add(self, char: str, glyph: np.ndarray):
+        self.glyphs.setdefault(char, []).append(normalize_glyph(glyph))
+        self._stack = None
+
+    def learn(self, img: np.ndarray, text: str) -> bool:
+        """Learn glyphs from a capture showing the given text (e.g. "1523/1600")"""
+        text = text.replace(" ", "")
+        glyphs = segment_glyphs(binarize(img))
+        if len(glyphs) != len(text):
+            print(f"Digit atlas: found {len(glyphs)} glyphs for {len(text)} characters in '{text}'")
+            return False
+        for char, glyph in zip(text, glyphs):
+            self.add(char, glyph)
+        return True
+
+    def match(self, glyph: np.ndarray) -> Tuple[Optional[str], float]:
+        """Closest atlas character and its mean absolute difference"""
+        if self._stack is None:
+            self._chars = [c for c, gs in self.glyphs.items() for _ in gs]
+            self._stack = np.stack([g for gs in self.glyphs.values() for g in gs])
+        distances = np.abs(self._stack - normalize_glyph(glyph)).mean(axis=(1, 2))
+        best = int(np.argmin(distances))
+        return self._chars[best], float(distances[best])
+
+    def save(self, directory: str = GLYPH_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for char, glyphs in self.glyphs.items():
+            for n, glyph in enumerate(glyphs):
+                path = os.path.join(directory, f"{ord(char)}_{n}.png")
+                cv2.imwrite(path, (glyph * 255).astype(np.uint8))
+
+    @classmethod
+    def load(cls, directory: str = GLYPH_DIR) -> "GlyphAtlas":
+        atlas = cls()
+        if not os.path.exists(directory):
+            return atlas
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".png"):
+                continue
+            code = filename[:-4].split("_", 1)[0]
+            img = cv2.imread(os.path.join(directory, filename), cv2.IMREAD_GRAYSCALE)
+            if img is None or not code.isdigit():
+                continue
+            atlas.glyphs.setdefault(chr(int(code)), []).append(img.astype(np.float32) / 255)
+        return atlas
+
+
+class DigitReader:
+    """Reads "current/max" numbers from a captured region using a glyph atlas"""
+
+    def __init__(self, atlas: GlyphAtlas, cache_size: int = 64):
+        self.atlas = atlas
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, Optional[str]]" = OrderedDict()
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def read_text(self, img: np.ndarray) -> Optional[str]:
+        """Read the text in a capture, memoized on the capture's pixel hash"""
+        if not len(self.atlas):
+            return None
+        key = hashlib.blake2b(img.tobytes(), digest_size=16,
+                              person=str(img.shape).encode()[:16]).digest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        chars = []
+        for glyph in segment_glyphs(binarize(img)):
+            char, distance = self.atlas.match(glyph)
+            if distance > MAX_GLYPH_DISTANCE:
+                chars = None
+                break
+            chars.append(char)
+        text = "".join(chars) if chars else None
+
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def read_values(self, img: np.ndarray) -> Optional[Tuple[int, int]]:
+        """Read a "current/max" pair, or None if it can't be read"""
+        text = self.read_text(img)
+        if not text or text.count("/") != 1:
+            return None
+        current, maximum = text.split("/")
+        if not (current.isdigit() and maximum.isdigit()):
+            return None
+        return int(current), int(maximum)
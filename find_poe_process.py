@@ -1,50 +1,28 @@
 #!/usr/bin/env python3
 """
-Find Path of Exile process name on Windows
+Find the Path of Exile process (Windows, Linux and macOS)
 """
 
-import subprocess
-import platform
+from poe_process import GameProcessFinder, list_processes
 
 def find_poe_process():
-    """List all processes and find Path of Exile"""
-    if platform.system() != "Windows":
-        print("This script is for Windows only")
-        return
-        
-    ps_script = """
-    Get-Process | Where-Object {
-        $_.ProcessName -like '*path*' -or 
-        $_.ProcessName -like '*exile*' -or 
-        $_.ProcessName -like '*poe*' -or
-        $_.MainWindowTitle -like '*path of exile*'
-    } | Select-Object ProcessName, Id, MainWindowTitle | Format-Table -AutoSize
-    """
-    
+    """Find Path of Exile, or list processes that look like it"""
     print("Searching for Path of Exile processes...")
     print("=" * 60)
-    
-    result = subprocess.run(['powershell', '-Command', ps_script], 
-                          capture_output=True, text=True, timeout=5)
-    
-    if result.returncode == 0 and result.stdout.strip():
-        print("Found potential Path of Exile processes:")
-        print(result.stdout)
-    else:
-        print("No Path of Exile processes found.")
-        print("\nLet's list ALL processes with a window title:")
-        
-        ps_script_all = """
-        Get-Process | Where-Object { $_.MainWindowTitle -ne '' } | 
-        Select-Object ProcessName, Id, MainWindowTitle | 
-        Sort-Object ProcessName | Format-Table -AutoSize
-        """
-        
-        result = subprocess.run(['powershell', '-Command', ps_script_all], 
-                              capture_output=True, text=True, timeout=5)
-        
-        if result.returncode == 0:
-            print(result.stdout)
+
+    process = GameProcessFinder().scan()
+    if process:
+        print(f"Found Path of Exile: {process.name} (PID {process.pid})")
+        return
+
+    print("No Path of Exile process found.")
+    print("\nProcesses with 'path', 'exile' or 'poe' in their name:")
+    candidates = sorted((name, pid) for pid, name in list_processes()
+                        if any(part in name.lower() for part in ("path", "exile", "poe")))
+    if not candidates:
+        print("  (none)")
+    for name, pid in candidates:
+        print(f"  {pid:>8}  {name}")
 
 if __name__ == "__main__":
     find_poe_process()
@@ -0,0 +1,158 @@
+"""
+Shared Tk helpers for main_gui.py and potions_gui.py
+
+The GUIs are passive: a RefreshPump pulls the engine's latest snapshot at a
+fixed frame rate, a WidgetDiffer skips configure() calls that would not
+change anything, SlotPreview redraws slot images only when they change and
+LogView flushes new activity log records to a Text widget in one insert.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import tkinter as tk
+import numpy as np
+
+from activity_log import ActivityLog
+from startup import lazy_import
+
+# Loaded when the first slot preview is drawn, not at window creation
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+
+PREVIEW_SIZE = (60, 60)
+_UNSET = object()
+
+
+class SlotPreview:
+    """Slot image label fed from the engine's captured frames
+
+    Redraws only when the frame hash changes, downsamples with a
+    nearest-neighbour resize and pastes into one reused PhotoImage.
+    """
+
+    def __init__(self, label, size: Tuple[int, int] = PREVIEW_SIZE):
+        self.label = label
+        self.size = size
+        self.photo: Optional["ImageTk.PhotoImage"] = None
+        self.frame_hash: Optional[bytes] = None
+
+    def update(self, frame: Optional[np.ndarray], frame_hash: Optional[bytes]) -> bool:
+        """Show a BGR frame; returns False if nothing had to be redrawn"""
+        if frame is None or frame_hash == self.frame_hash:
+            return False
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_NEAREST)
+        image = Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image)
+            self.label.configure(image=self.photo)
+        else:
+            self.photo.paste(image)
+        self.frame_hash = frame_hash
+        return True
+
+
+class WidgetDiffer:
+    """configure() that only touches options whose value actually changed
+
+    Every change to a widget that goes through a differ must go through the
+    same differ, or its cached values go stale.
+    """
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    def configure(self, widget, **options) -> bool:
+        state = self._state.setdefault(str(widget), {})
+        changed = {key: value for key, value in options.items() if state.get(key, _UNSET) != value}
+        if changed:
+            widget.configure(**changed)
+            state.update(changed)
+        return bool(changed)
+
+
+class RefreshPump:
+    """Redraws a view from the latest engine snapshot at a fixed frame rate
+
+    Pulls instead of being pushed: however fast the engine ticks there is
+    only ever one pending Tk timer, and an unchanged snapshot is not redrawn.
+    """
+
+    def __init__(self, widget, source: Callable[[], Any], render: Callable[[Any], None], fps: float = 10.0,
+                 on_frame: Optional[Callable[[], None]] = None):
+        self.widget = widget
+        self.source = source
+        self.render = render
+        self.fps = fps
+        self.on_frame = on_frame  # Called every frame, snapshot changed or not
+        self._shown = None
+        self._after_id = None
+
+    def start(self):
+        if self._after_id is None:
+            self._tick()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def invalidate(self):
+        """Redraw on the next frame even if the snapshot hasn't changed"""
+        self._shown = None
+
+    def _tick(self):
+        snapshot = self.source()
+        if snapshot is not None and snapshot is not self._shown:
+            self._shown = snapshot
+            try:
+                self.render(snapshot)
+            except Exception as e:
+                print(f"GUI refresh error: {e}")
+        if self.on_frame is not None:
+            try:
+                self.on_frame()
+            except Exception as e:
+                print(f"GUI refresh error: {e}")
+        self._after_id = self.widget.after(max(1, int(1000 / self.fps)), self._tick)
+
+
+class LogView:
+    """Shows an ActivityLog in a Text widget
+
+    flush() inserts everything new since the last flush in one call and trims
+    the widget to max_lines with one delete, so heavy logging costs one
+    widget update per GUI frame.
+    """
+
+    def __init__(self, text: tk.Text, log: ActivityLog, max_lines: int = 100, level: str = "INFO"):
+        self.text = text
+        self.log = log
+        self.max_lines = max_lines
+        self.level = level
+        self._seq = 0
+        self._lines = 0
+
+    def set_level(self, level: str):
+        """Change the minimum level shown and redraw from the ring"""
+        self.level = level
+        self.text.delete("1.0", tk.END)
+        self._seq = 0
+        self._lines = 0
+        self.flush()
+
+    def flush(self):
+        if self.log.last_seq == self._seq:
+            return
+        records = self.log.since(self._seq, self.level, limit=self.max_lines)
+        self._seq = self.log.last_seq
+        if not records:
+            return
+        text = "".join(record.format() + "\n" for record in records)
+        self.text.insert(tk.END, text)
+        self._lines += text.count("\n")  # A message may span several lines
+        if self._lines > self.max_lines:
+            excess = self._lines - self.max_lines
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self._lines = self.max_lines
+        self.text.see(tk.END)
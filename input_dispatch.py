@@ -0,0 +1,269 @@
+"""
+Non-blocking key dispatch for flask presses
+
+The monitor loop and the health watchdog only enqueue presses; a dedicated
+thread sends them through a pause-free backend and enforces a minimum
+spacing per key, so decisions never wait on input. Flasks that come due in
+the same tick are queued as one burst and sent back to back with a short
+inter-key spacing. A key that is already queued is not queued again.
+- Windows: SendInput with hardware scan codes
+- Linux/X11: XTest fake key events over one persistent connection (python-xlib)
+- Anything else: pyautogui with its per-call PAUSE disabled
+"""
+
+import platform
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from startup import lazy_import
+
+pyautogui = lazy_import("pyautogui")  # Only the fallback backend needs it
+
+# How long every backend holds a key down; some games drop a press whose
+# down and up events land in the same input frame
+KEY_HOLD = 0.01
+
+
+@dataclass(frozen=True)
+class Dispatch:
+    """A sent key press with when it was requested and when it went out"""
+    key: str
+    queued_at: float
+    sent_at: float
+
+
+@dataclass(frozen=True)
+class _Request:
+    keys: Tuple[str, ...]
+    queued_at: float
+    spacing: float
+    on_sent: Optional[Callable[[Dispatch], None]]
+
+
+class PyAutoGuiBackend:
+    name = "pyautogui"
+
+    def press(self, key: str):
+        pyautogui.keyDown(key, _pause=False)
+        time.sleep(KEY_HOLD)
+        pyautogui.keyUp(key, _pause=False)
+
+    def close(self):
+        pass
+
+
+class XTestBackend:
+    """Fake key events through the XTest extension"""
+    name = "xtest"
+
+    def __init__(self):
+        from Xlib import X, XK, display  # Optional dependency (python-xlib)
+        from Xlib.ext import xtest
+        self._X = X
+        self._XK = XK
+        self._xtest = xtest
+        self.display = display.Display()
+        if not self.display.has_extension("XTEST"):
+            self.display.close()
+            raise RuntimeError("X server has no XTEST extension")
+        self._keycodes: Dict[str, int] = {}
+
+    def keycode(self, key: str) -> int:
+        if key not in self._keycodes:
+            keysym = self._XK.string_to_keysym(key)
+            keycode = self.display.keysym_to_keycode(keysym) if keysym else 0
+            if not keycode:
+                raise ValueError(f"No keycode for key '{key}'")
+            self._keycodes[key] = keycode
+        return self._keycodes[key]
+
+    def press(self, key: str):
+        keycode = self.keycode(key)
+        self._xtest.fake_input(self.display, self._X.KeyPress, keycode)
+        self.display.sync()
+        time.sleep(KEY_HOLD)
+        self._xtest.fake_input(self.display, self._X.KeyRelease, keycode)
+        self.display.sync()
+
+    def close(self):
+        self.display.close()
+
+
+class SendInputBackend:
+    """Key down/up events through SendInput, as scan codes (games read those)"""
+    name = "sendinput"
+    INPUT_KEYBOARD = 1
+    KEYEVENTF_KEYUP = 0x0002
+    KEYEVENTF_SCANCODE = 0x0008
+    MAPVK_VK_TO_VSC = 0
+    NAMED_KEYS = {"space": 0x20, "tab": 0x09, "enter": 0x0D, "shift": 0x10, "ctrl": 0x11, "alt": 0x12}
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+
+        class KEYBDINPUT(ctypes.Structure):
+            _fields_ = [("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                        ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class MOUSEINPUT(ctypes.Structure):
+            _fields_ = [("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                        ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t)]
+
+        class _INPUTUNION(ctypes.Union):
+            _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+        class INPUT(ctypes.Structure):
+            _fields_ = [("type", wintypes.DWORD), ("u", _INPUTUNION)]
+
+        self.INPUT = INPUT
+        self._scancodes: Dict[str, int] = {}
+
+    def scancode(self, key: str) -> int:
+        if key not in self._scancodes:
+            if key.lower() in self.NAMED_KEYS:
+                vk = self.NAMED_KEYS[key.lower()]
+            elif len(key) == 1:
+                vk = self.user32.VkKeyScanW(ord(key)) & 0xFF
+            elif key.lower().startswith("f") and key[1:].isdigit():
+                vk = 0x70 + int(key[1:]) - 1  # VK_F1...
+            else:
+                raise ValueError(f"Unsupported key '{key}'")
+            self._scancodes[key] = self.user32.MapVirtualKeyW(vk, self.MAPVK_VK_TO_VSC)
+        return self._scancodes[key]
+
+    def send(self, scan: int, flags: int):
+        event = self.INPUT()
+        event.type = self.INPUT_KEYBOARD
+        event.u.ki.wScan = scan
+        event.u.ki.dwFlags = self.KEYEVENTF_SCANCODE | flags
+        if self.user32.SendInput(1, self.ctypes.byref(event), self.ctypes.sizeof(self.INPUT)) != 1:
+            raise OSError("SendInput was blocked")
+
+    def press(self, key: str):
+        scan = self.scancode(key)
+        self.send(scan, 0)
+        time.sleep(KEY_HOLD)
+        self.send(scan, self.KEYEVENTF_KEYUP)
+
+    def close(self):
+        pass
+
+
+def create_input_backend():
+    """Best available pause-free key backend for this platform"""
+    system = platform.system()
+    try:
+        if system == "Windows":
+            return SendInputBackend()
+        if system == "Linux":
+            return XTestBackend()
+    except Exception as e:
+        print(f"Native key input unavailable ({e}); using pyautogui without pauses")
+    return PyAutoGuiBackend()
+
+
+class InputDispatcher(threading.Thread):
+    """Sends queued key presses off the monitor thread
+
+    Presses of the same key are kept at least min_key_spacing seconds apart;
+    different keys are not delayed by each other's spacing. Keys of a burst
+    go out burst_spacing seconds apart.
+    """
+
+    def __init__(self, backend=None, min_key_spacing: float = 0.05, burst_spacing: float = 0.015,
+                 history_size: int = 64):
+        super().__init__(name="InputDispatcher", daemon=True)
+        self.backend = backend or create_input_backend()
+        self.min_key_spacing = min_key_spacing
+        self.burst_spacing = burst_spacing
+        self.last_sent: Dict[str, float] = {}  # perf_counter of the last send per key
+        self.history: Deque[Dispatch] = deque(maxlen=history_size)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending: Set[str] = set()  # Keys queued but not sent yet
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def submit(self, key: str, on_sent: Optional[Callable[[Dispatch], None]] = None) -> bool:
+        """Queue a press; returns immediately, False if the key is already queued"""
+        return bool(self.submit_burst([key], on_sent=on_sent))
+
+    def submit_burst(self, keys: Iterable[str], spacing: Optional[float] = None,
+                     on_sent: Optional[Callable[[Dispatch], None]] = None) -> List[str]:
+        """Queue several presses to be sent back to back; returns the keys accepted
+
+        Repeated keys, and keys still waiting in the queue, are dropped.
+        """
+        with self._lock:
+            keys = [key for key in dict.fromkeys(keys) if key not in self._pending]
+            self._pending.update(keys)
+        if keys:
+            spacing = self.burst_spacing if spacing is None else spacing
+            self._queue.put(_Request(tuple(keys), time.perf_counter(), spacing, on_sent))
+        return keys
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def ready_at(self, key: str) -> float:
+        return self.last_sent.get(key, float("-inf")) + self.min_key_spacing
+
+    def run(self):
+        deferred: List[_Request] = []  # Requests with keys waiting for their spacing
+        while not self._stop_event.is_set():
+            timeout = 0.5
+            if deferred:
+                ready_at = min(self.ready_at(key) for request in deferred for key in request.keys)
+                timeout = max(0.0, ready_at - time.perf_counter())
+            try:
+                request = self._queue.get(timeout=timeout)
+                if request is None:
+                    break
+                deferred.append(request)
+            except queue.Empty:
+                pass
+            for request in list(deferred):
+                now = time.perf_counter()
+                ready = tuple(key for key in request.keys if self.ready_at(key) <= now)
+                if not ready:
+                    continue
+                # Send what is ready now; keys still inside their spacing wait
+                deferred.remove(request)
+                waiting = tuple(key for key in request.keys if key not in ready)
+                if waiting:
+                    deferred.append(replace(request, keys=waiting))
+                self._send(request, ready)
+        self.backend.close()
+
+    def _send(self, request: _Request, keys: Tuple[str, ...]):
+        for i, key in enumerate(keys):
+            if i and request.spacing > 0:
+                time.sleep(request.spacing)
+            try:
+                self.backend.press(key)
+            except Exception as e:
+                print(f"Key dispatch error ({self.backend.name}, '{key}'): {e}")
+                continue
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+            sent_at = time.perf_counter()
+            self.last_sent[key] = sent_at
+            dispatch = Dispatch(key, request.queued_at, sent_at)
+            self.history.append(dispatch)
+            if request.on_sent is not None:
+                try:
+                    request.on_sent(dispatch)
+                except Exception as e:
+                    print(f"Dispatch callback error: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put(None)
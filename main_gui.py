@@ -1,29 +1,37 @@
 """
 Main GUI Application - Tabbed interface for Potion Manager
 Combines monitoring, settings, and setup in one application
+With --daemon [ADDRESS] it is a thin client of a running potion_daemon.py
 """
 
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
-import threading
+from tkinter import ttk, messagebox, filedialog
 import time
-from datetime import datetime
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
-from potions import AdvancedPotionManager, PotionCategory
+from startup import STARTUP, lazy_import
+from potions import AdvancedPotionManager, PotionCategory, EngineSnapshot, SlotSnapshot
+from gui_common import SlotPreview, WidgetDiffer, RefreshPump, LogView
+from activity_log import LEVELS
+from manager_config import default_settings, load_general_settings, save_general_settings
+from daemon_client import DaemonError
 import os
 import json
-import pyautogui
+
+cv2 = lazy_import("cv2")  # Only the setup tab's captures need it
 
 class MainApplication:
-    def __init__(self, root):
+    def __init__(self, root, manager=None):
         self.root = root
         self.root.title("Path of Exile - Potion Manager")
         self.root.geometry("1200x900")
         
-        # Initialize potion manager
-        self.manager = AdvancedPotionManager()
+        # Initialize potion manager (templates load after the window is up),
+        # unless a remote_manager.DaemonManager was passed in (client mode)
+        self.client_mode = manager is not None
+        if manager is None:
+            with STARTUP.phase("manager"):
+                manager = AdvancedPotionManager(load_templates=False)
+        self.manager = manager
         self.manager.use_gui_controls = True
         
         # Initialize variables
@@ -48,6 +56,24 @@ class MainApplication:
         # Bind tab change event
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         
+        # Templates and the initial scan load in the background once the window is shown
+        self.root.after_idle(self.on_window_ready)
+        
+    def on_window_ready(self):
+        """First idle moment after the window appeared: load templates off the GUI thread"""
+        STARTUP.record("until interactive", STARTUP.t0)
+        if self.client_mode:
+            self.potion_gui.log(f"Connected to the potion daemon at {self.manager.address}")
+            return
+        self.potion_gui.log("Loading templates...")
+        self.manager.load_templates_async(initial_scan=True, on_done=self.on_templates_loaded)
+        
+    def on_templates_loaded(self):
+        """Runs on the loader thread; the activity log is safe to use from there"""
+        self.potion_gui.log(STARTUP.summary(["until interactive", "templates", "import cv2", "first scan"]),
+                            "DEBUG")
+        self.potion_gui.log(STARTUP.report(), "DEBUG")  # Echoed to the console only with debug on
+        
     def init_monitor_tab(self):
         """Initialize the Monitor Potions tab"""
         # This is essentially the original potions_gui content
@@ -68,12 +94,14 @@ class MainApplication:
         self.advanced_settings_tab = ttk.Frame(self.settings_notebook)
         
         self.settings_notebook.add(self.general_settings_tab, text='General')
-        self.settings_notebook.add(self.potion_setup_tab, text='Potion Setup')
+        if not self.client_mode:  # Setup captures the screen and writes templates locally
+            self.settings_notebook.add(self.potion_setup_tab, text='Potion Setup')
         self.settings_notebook.add(self.advanced_settings_tab, text='Advanced')
         
         # Initialize sub-tabs
         self.init_general_settings()
-        self.init_potion_setup()
+        if not self.client_mode:
+            self.init_potion_setup()
         self.init_advanced_settings()
         
     def init_general_settings(self):
@@ -200,25 +228,13 @@ class MainApplication:
         """Handle tab change events"""
         selected_tab = event.widget.tab('current')['text']
         if selected_tab == 'Monitor Potions' and hasattr(self, 'potion_gui'):
-            # Refresh potion display when switching to monitor tab
-            self.potion_gui.scan_all_slots()
+            # Refresh potion display from the engine's latest snapshot (no new captures)
+            self.potion_gui.show_latest()
             
     def save_settings(self):
         """Save current settings to file"""
-        settings = {
-            'health_threshold': self.manager.health_threshold,
-            'mana_threshold': self.manager.mana_threshold,
-            'require_window_focus': self.manager.require_window_focus,
-            'potion_cooldown': self.manager.potion_cooldown,
-            'pixel_color_tolerance': self.manager.pixel_color_tolerance,
-            'progress_threshold': self.manager.progress_threshold,
-            'debug': self.manager.debug
-        }
-        
         try:
-            os.makedirs('settings', exist_ok=True)
-            with open('settings/general_settings.json', 'w') as f:
-                json.dump(settings, f, indent=4)
+            save_general_settings(self.manager.settings())
             messagebox.showinfo("Success", "Settings saved successfully!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save settings: {e}")
@@ -226,27 +242,9 @@ class MainApplication:
     def load_settings(self):
         """Load settings from file"""
         try:
-            with open('settings/general_settings.json', 'r') as f:
-                settings = json.load(f)
-                
-            # Update manager settings
-            self.manager.health_threshold = settings.get('health_threshold', 50)
-            self.manager.mana_threshold = settings.get('mana_threshold', 30)
-            self.manager.require_window_focus = settings.get('require_window_focus', True)
-            self.manager.potion_cooldown = settings.get('potion_cooldown', 250)
-            self.manager.pixel_color_tolerance = settings.get('pixel_color_tolerance', 50)
-            self.manager.progress_threshold = settings.get('progress_threshold', 0.1)
-            self.manager.debug = settings.get('debug', False)
-            
-            # Update UI
-            self.health_var.set(self.manager.health_threshold)
-            self.mana_var.set(self.manager.mana_threshold)
-            self.focus_var.set(self.manager.require_window_focus)
-            self.cooldown_var.set(self.manager.potion_cooldown)
-            self.tolerance_var.set(self.manager.pixel_color_tolerance)
-            self.progress_var.set(self.manager.progress_threshold * 100)
-            self.debug_var.set(self.manager.debug)
-            
+            # Validated; settings missing from the file keep their defaults
+            self.manager.update_settings({**default_settings(), **load_general_settings()})
+            self.refresh_settings_controls()
             messagebox.showinfo("Success", "Settings loaded successfully!")
         except FileNotFoundError:
             messagebox.showwarning("Warning", "No saved settings found.")
@@ -256,24 +254,19 @@ class MainApplication:
     def reset_settings(self):
         """Reset all settings to defaults"""
         if messagebox.askyesno("Confirm", "Reset all settings to defaults?"):
-            self.manager.health_threshold = 50
-            self.manager.mana_threshold = 30
-            self.manager.require_window_focus = True
-            self.manager.potion_cooldown = 250
-            self.manager.pixel_color_tolerance = 50
-            self.manager.progress_threshold = 0.1
-            self.manager.debug = False
-            
-            # Update UI
-            self.health_var.set(50)
-            self.mana_var.set(30)
-            self.focus_var.set(True)
-            self.cooldown_var.set(250)
-            self.tolerance_var.set(50)
-            self.progress_var.set(10)
-            self.debug_var.set(False)
-            
+            self.manager.update_settings(default_settings())
+            self.refresh_settings_controls()
             messagebox.showinfo("Success", "Settings reset to defaults!")
+            
+    def refresh_settings_controls(self):
+        """Show the manager's current settings in the settings tabs"""
+        self.health_var.set(self.manager.health_threshold)
+        self.mana_var.set(self.manager.mana_threshold)
+        self.focus_var.set(self.manager.require_window_focus)
+        self.cooldown_var.set(self.manager.potion_cooldown)
+        self.tolerance_var.set(self.manager.pixel_color_tolerance)
+        self.progress_var.set(self.manager.progress_threshold * 100)
+        self.debug_var.set(self.manager.debug)
 
 
 class PotionMonitorTab:
@@ -288,7 +281,7 @@ class PotionMonitorTab:
         self.instant_vars = []
         self.enduring_vars = []
         self.monitoring = False
-        self.monitor_thread = None
+        self.differ = WidgetDiffer()
         
         # Create main frame
         main_frame = ttk.Frame(parent, padding="10")
@@ -316,8 +309,16 @@ class PotionMonitorTab:
         # Update checkboxes
         self.update_slot_checkboxes()
         
-        # Initial scan
-        self.scan_all_slots()
+        # A daemon may already be monitoring
+        if self.manager.engine.is_alive():
+            self.monitoring = True
+            self.monitor_button.configure(text="Stop Monitoring")
+        
+        # The engine drives detection; this tab only displays its snapshots
+        self.refresh_pump = RefreshPump(self.parent, lambda: self.manager.engine.latest,
+                                        self.apply_snapshot, self.manager.gui_refresh_rate,
+                                        on_frame=self.log_view.flush)
+        self.refresh_pump.start()
         
     def create_header(self, parent):
         """Create header with control buttons"""
@@ -425,6 +426,7 @@ class PotionMonitorTab:
         self.slot_widgets[slot_num] = {
             'frame': slot_frame,
             'current_image': current_image,
+            'preview': SlotPreview(current_image),
             'potion_label': potion_label,
             'type_label': type_label,
             'uses_label': uses_label,
@@ -459,6 +461,19 @@ class PotionMonitorTab:
         log_frame = ttk.Frame(status_frame)
         log_frame.pack(fill='both', expand=True, pady=10)
         
+        log_controls = ttk.Frame(log_frame)
+        log_controls.pack(side='top', fill='x', pady=(0, 5))
+        
+        ttk.Label(log_controls, text="Log level:").pack(side='left')
+        self.log_level_var = tk.StringVar(value="INFO")
+        log_level_combo = ttk.Combobox(log_controls, textvariable=self.log_level_var,
+                                       values=list(LEVELS), state='readonly', width=10)
+        log_level_combo.pack(side='left', padx=5)
+        log_level_combo.bind('<<ComboboxSelected>>',
+                             lambda e: self.log_view.set_level(self.log_level_var.get()))
+        
+        ttk.Button(log_controls, text="Export Log", command=self.export_log).pack(side='right')
+        
         self.log_text = tk.Text(log_frame, height=6, width=80, wrap='word')
         log_scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
@@ -466,6 +481,9 @@ class PotionMonitorTab:
         self.log_text.pack(side='left', fill='both', expand=True)
         log_scrollbar.pack(side='right', fill='y')
         
+        # Filled from the manager's activity log, one batch per GUI refresh
+        self.log_view = LogView(self.log_text, self.manager.activity_log)
+        
     def update_slot_checkboxes(self):
         """Update checkbox states from manager"""
         for i in range(5):
@@ -494,182 +512,126 @@ class PotionMonitorTab:
             self.manager.slot_enduring[slot_index] = self.enduring_vars[slot_index].get()
             self.log(f"Slot {slot_index+1} enduring: {'Yes' if self.enduring_vars[slot_index].get() else 'No'}")
             
-    def convert_cv2_to_tk(self, cv2_image, size=(60, 60)):
-        """Convert OpenCV image to Tkinter PhotoImage"""
-        rgb_image = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(rgb_image)
-        pil_image = pil_image.resize(size, Image.Resampling.LANCZOS)
-        return ImageTk.PhotoImage(pil_image)
-        
-    def update_slot_display(self, slot_num):
+    def update_slot_display(self, slot: SlotSnapshot):
         """Update display for a specific slot"""
-        if slot_num > len(self.manager.slots):
-            return
-            
-        slot = self.manager.slots[slot_num-1]
+        slot_num = slot.slot_number
         widgets = self.slot_widgets[slot_num]
         
-        # Capture current slot image
-        if slot_num <= len(self.manager.slot_regions) and self.manager.slot_regions[slot_num-1]:
-            try:
-                region = self.manager.slot_regions[slot_num-1]
-                screenshot = pyautogui.screenshot(region=region)
-                slot_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                
-                tk_image = self.convert_cv2_to_tk(slot_img)
-                widgets['current_image'].configure(image=tk_image)
-                widgets['current_image'].image = tk_image
-            except:
-                pass
-                
         # Update labels
-        widgets['potion_label'].configure(text=f"Potion: {slot.subtype.value}")
+        self.differ.configure(widgets['potion_label'], text=f"Potion: {slot.subtype.value}")
         
         # Type with color
         type_text = f"Type: {slot.category.value}"
         if slot.category == PotionCategory.HEALTH:
-            widgets['type_label'].configure(text=type_text, foreground="red")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="red")
         elif slot.category == PotionCategory.MANA:
-            widgets['type_label'].configure(text=type_text, foreground="blue")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="blue")
         elif slot.category == PotionCategory.UTILITY:
-            widgets['type_label'].configure(text=type_text, foreground="green")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="green")
         else:
-            widgets['type_label'].configure(text=type_text, foreground="gray")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="gray")
             
         # Uses
-        widgets['uses_label'].configure(text=f"Uses: {slot.uses_remaining}/{slot.max_uses}")
+        self.differ.configure(widgets['uses_label'], text=f"Uses: {slot.uses_remaining}/{slot.max_uses}")
         
         # Status
         current_time = time.time()
         if slot.uses_remaining == 0:
-            widgets['status_label'].configure(text="Status: Empty", foreground="red")
+            self.differ.configure(widgets['status_label'], text="Status: Empty", foreground="red")
         elif current_time < slot.active_until:
             remaining = slot.active_until - current_time
-            widgets['status_label'].configure(text=f"Status: Active ({remaining:.0f}s)", foreground="green")
+            self.differ.configure(widgets['status_label'], text=f"Status: Active ({remaining:.0f}s)", foreground="green")
         else:
-            widgets['status_label'].configure(text="Status: Ready", foreground="blue")
+            self.differ.configure(widgets['status_label'], text="Status: Ready", foreground="blue")
             
         # Update checkbox visibility
         if slot.category == PotionCategory.HEALTH:
-            widgets['instant_check'].configure(state="normal")
+            self.differ.configure(widgets['instant_check'], state="normal")
         else:
-            widgets['instant_check'].configure(state="disabled")
+            self.differ.configure(widgets['instant_check'], state="disabled")
             
         if slot.category == PotionCategory.MANA:
-            widgets['enduring_check'].configure(state="normal")
+            self.differ.configure(widgets['enduring_check'], state="normal")
         else:
-            widgets['enduring_check'].configure(state="disabled")
+            self.differ.configure(widgets['enduring_check'], state="disabled")
             
     def scan_all_slots(self):
-        """Scan all slots"""
+        """Rescan all slots (the displays update from the engine's next snapshot)"""
+        if not self.manager.templates_ready.is_set():
+            self.log("Templates are still loading - slots are scanned as soon as they are ready")
+            return
         self.log("Scanning all slots...")
-        self.manager.scan_all_slots()
-        
-        for slot_num in range(1, 6):
-            self.update_slot_display(slot_num)
-            
-        self.log("Scan complete")
+        self.manager.engine.rescan()
         
-    def update_game_status(self):
+    def update_game_status(self, snapshot: EngineSnapshot):
         """Update game status display"""
-        health = self.manager.game_state.health_percentage
-        mana = self.manager.game_state.mana_percentage
-        
-        self.health_label.configure(text=f"Health: {health:.1f}%")
-        self.mana_label.configure(text=f"Mana: {mana:.1f}%")
+        self.differ.configure(self.health_label, text=f"Health: {snapshot.health_percentage:.1f}%")
+        self.differ.configure(self.mana_label, text=f"Mana: {snapshot.mana_percentage:.1f}%")
         
         # Active effects
         active_effects = []
         current_time = time.time()
-        for slot in self.manager.slots:
+        for slot in snapshot.slots:
             if current_time < slot.active_until:
                 remaining = slot.active_until - current_time
                 active_effects.append(f"{slot.subtype.value}({remaining:.0f}s)")
                 
         if active_effects:
-            self.active_label.configure(text=f"Active: {', '.join(active_effects)}")
+            self.differ.configure(self.active_label, text=f"Active: {', '.join(active_effects)}")
         else:
-            self.active_label.configure(text="Active Effects: None")
+            self.differ.configure(self.active_label, text="Active Effects: None")
             
     def toggle_monitoring(self):
         """Toggle monitoring on/off"""
         if not self.monitoring:
+            if not self.manager.engine.start():
+                return  # The previous run is still stopping; the reason is in the log
             self.monitoring = True
             self.monitor_button.configure(text="Stop Monitoring")
-            self.main_status_label.configure(text="Monitoring Active", foreground="green")
+            self.differ.configure(self.main_status_label, text="Monitoring Active", foreground="green")
             self.log("Started monitoring")
-            
-            self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-            self.monitor_thread.start()
         else:
             self.monitoring = False
+            self.manager.engine.stop()
             self.monitor_button.configure(text="Start Monitoring")
-            self.main_status_label.configure(text="Monitoring Stopped", foreground="orange")
+            self.differ.configure(self.main_status_label, text="Monitoring Stopped", foreground="orange")
             self.log("Stopped monitoring")
             
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        last_scan_time = 0
-        
-        while self.monitoring:
-            try:
-                current_time = time.time()
-                
-                # Check window focus if required
-                if self.manager.require_window_focus:
-                    self.manager.poe_window_focused = self.manager.is_poe_window_focused()
-                    
-                    if self.manager.poe_window_focused:
-                        # Update game state
-                        self.manager.update_game_state()
-                        
-                        # Rescan slots periodically
-                        if current_time - last_scan_time > 5:
-                            self.manager.scan_all_slots()
-                            last_scan_time = current_time
-                            self.parent.after(0, self.update_all_slots)
-                            
-                        # Process potions
-                        self.manager.process_health_potions()
-                        self.manager.process_mana_potions()
-                        self.manager.process_utility_potions()
-                else:
-                    # Process normally without focus check
-                    self.manager.update_game_state()
-                    
-                    if current_time - last_scan_time > 5:
-                        self.manager.scan_all_slots()
-                        last_scan_time = current_time
-                        self.parent.after(0, self.update_all_slots)
-                        
-                    self.manager.process_health_potions()
-                    self.manager.process_mana_potions()
-                    self.manager.process_utility_potions()
-                    
-                # Update status display
-                self.parent.after(0, self.update_game_status)
+    def apply_snapshot(self, snapshot: EngineSnapshot):
+        """Show an engine snapshot"""
+        self.update_game_status(snapshot)
+        # Previews come from the engine's frames and only redraw when a slot changed
+        for slot in snapshot.slots:
+            self.slot_widgets[slot.slot_number]['preview'].update(slot.frame, slot.frame_hash)
+        self.update_all_slots(snapshot)
                 
-                time.sleep(0.1)
-                
-            except Exception as e:
-                self.parent.after(0, lambda: self.log(f"Error: {e}"))
-                time.sleep(1)
-                
-    def update_all_slots(self):
+    def show_latest(self):
+        """Redraw every slot from the latest snapshot, scanning only if there is none"""
+        if self.manager.engine.latest is None:
+            if self.manager.templates_ready.is_set():
+                self.scan_all_slots()  # Otherwise the background loader's first scan is on its way
+        else:
+            self.refresh_pump.invalidate()
+            
+    def update_all_slots(self, snapshot: EngineSnapshot):
         """Update all slot displays"""
-        for slot_num in range(1, 6):
-            self.update_slot_display(slot_num)
+        for slot in snapshot.slots:
+            self.update_slot_display(slot)
             
-    def log(self, message):
-        """Add message to log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        
-        # Limit log size
-        lines = int(self.log_text.index('end-1c').split('.')[0])
-        if lines > 100:
-            self.log_text.delete('1.0', '2.0')
+    def log(self, message, level="INFO"):
+        """Add message to the activity log; the log view shows it on the next refresh"""
+        self.manager.activity_log.log(message, level)
+        
+    def export_log(self):
+        """Save the whole activity log ring to a text file"""
+        path = filedialog.asksaveasfilename(defaultextension=".txt", initialfile="activity_log.txt",
+                                            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if path:
+            try:
+                count = self.manager.activity_log.export(path)
+                self.log(f"Exported {count} log entries to {path}")
+            except OSError as e:
+                messagebox.showerror("Export Failed", str(e))
 
 
 class PotionSetupTab:
@@ -785,8 +747,7 @@ class PotionSetupTab:
                     slot_dir = f"full/slot{i+1}"
                     os.makedirs(slot_dir, exist_ok=True)
                     
-                    screenshot = pyautogui.screenshot(region=region)
-                    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+                    img = self.manager.capture_region(region)
                     
                     # Save with placeholder name
                     filename = f"{slot_dir}/captured_potion.png"
@@ -813,8 +774,7 @@ class PotionSetupTab:
                     slot_dir = f"empty/slot{i+1}"
                     os.makedirs(slot_dir, exist_ok=True)
                     
-                    screenshot = pyautogui.screenshot(region=region)
-                    img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+                    img = self.manager.capture_region(region)
                     
                     # Save with placeholder name
                     filename = f"{slot_dir}/captured_potion.png"
@@ -927,14 +887,31 @@ class PotionSetupTab:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Tabbed GUI for the potion manager")
+    parser.add_argument("--daemon", nargs="?", const="", metavar="ADDRESS",
+                        help="drive a running potion_daemon.py instead of a local engine")
+    args = parser.parse_args()
+    STARTUP.mark("imports")
     root = tk.Tk()
     
+    manager = None
+    if args.daemon is not None:
+        from remote_manager import DaemonManager
+        try:
+            manager = DaemonManager(args.daemon or None)
+        except (DaemonError, EOFError, OSError) as e:
+            messagebox.showerror("Potion Daemon", f"Could not connect to the potion daemon: {e}")
+            root.destroy()
+            return
+    
     # Style configuration
     style = ttk.Style()
     style.configure("Accent.TButton", foreground="green")
     
-    app = MainApplication(root)
+    app = MainApplication(root, manager)
     root.mainloop()
+    if manager is not None:
+        manager.stop()
 
 
 if __name__ == "__main__":
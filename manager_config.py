@@ -0,0 +1,323 @@
+"""
+Typed, validated manager configuration with hot reload
+
+Two files configure the potion manager:
+- settings/general_settings.json: tunables (thresholds, delays, rates...),
+  every one declared with its type, default and range in SETTINGS
+- settings/potion_manager_config.json: the screen layout recorded by the
+  setup tool (regions, pixel points and colors, orb probes)
+
+load_config() validates both into one immutable ManagerConfig. A bad value
+is rejected with a ConfigError naming the file and key instead of surfacing
+later in the engine. ConfigWatcher polls the files' modification times and
+hands reloaded configs to the manager, which swaps them in between engine
+ticks; nothing on the hot path reads or parses files.
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+SETTINGS_DIR = "settings"
+GENERAL_SETTINGS_PATH = os.path.join(SETTINGS_DIR, "general_settings.json")
+LAYOUT_PATH = os.path.join(SETTINGS_DIR, "potion_manager_config.json")
+LEGACY_LAYOUT_PATH = "potion_manager_config.json"  # Written by old setup tools
+
+
+class ConfigError(ValueError):
+    """A configuration file or value that failed validation"""
+
+
+@dataclass(frozen=True)
+class Setting:
+    """One tunable: its type, default and allowed range"""
+    name: str
+    kind: type
+    default: Any
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    description: str = ""
+
+    def coerce(self, value: Any) -> Any:
+        """The value as this setting's type, or ConfigError"""
+        if self.kind is bool:
+            if isinstance(value, bool) or value in (0, 1):
+                return bool(value)
+            raise ConfigError(f"{self.name} must be true or false, not {value!r}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ConfigError(f"{self.name} must be a number, not {value!r}")
+        if self.kind is int:
+            if value != int(value):
+                raise ConfigError(f"{self.name} must be a whole number, not {value!r}")
+            value = int(value)
+        else:
+            value = float(value)
+        if self.minimum is not None and value < self.minimum:
+            raise ConfigError(f"{self.name} must be at least {self.minimum:g}, not {value:g}")
+        if self.maximum is not None and value > self.maximum:
+            raise ConfigError(f"{self.name} must be at most {self.maximum:g}, not {value:g}")
+        return value
+
+
+SETTINGS: Dict[str, Setting] = {setting.name: setting for setting in (
+    # Flask policy
+    Setting("health_threshold", float, 50.0, 0, 100, "Use health flasks below this %"),
+    Setting("mana_threshold", float, 30.0, 0, 100, "Use mana flasks below this %"),
+    Setting("health_potion_delay", float, 2.0, 0, 60, "Seconds between presses of one health flask"),
+    Setting("instant_potion_delay", float, 0.3, 0, 60, "Shared cooldown between any two health flasks"),
+    Setting("mana_potion_delay", float, 3.0, 0, 60, "Seconds between mana flask presses"),
+    Setting("potion_cooldown", int, 250, 0, 5000, "Min ms between two presses of one key (other keys aren't delayed)"),
+    Setting("trend_prediction", bool, True, description="Fire before a damage spike crosses the threshold"),
+    Setting("trend_lookahead_ms", float, 250.0, 0, 2000, "How far ahead the trend is projected"),
+    # Detection
+    Setting("require_window_focus", bool, True, description="Only watch potions while the game is focused"),
+    Setting("pixel_color_tolerance", int, 50, 0, 442, "RGB distance a probe may drift from its color"),
+    Setting("progress_threshold", float, 0.1, 0, 1, "Colored fraction that counts as an active progress bar"),
+    Setting("orb_fill_detection", bool, False, description="Measure orb fill by bisecting the calibrated orb column"),
+    Setting("number_read_interval", float, 0.25, 0, 10, "Seconds between digit reads"),
+    Setting("use_health_watchdog", bool, True, description="Sample health on a separate fast thread"),
+    Setting("health_watchdog_rate", float, 50.0, 1, 500, "Health watchdog samples per second"),
+    # Press verification and input
+    Setting("verify_presses", bool, True, description="Re-capture a slot after pressing it"),
+    Setting("verify_delay", float, 0.15, 0, 2, "Seconds after a press before re-capturing the slot"),
+    # On the labeled full/ and empty/ slot images a whole flask draining changes the mean by 2.8-14.8,
+    # and one charge of a 3-use flask by 1.0-4.8; two captures of an unchanged slot differ by 0
+    Setting("press_diff_threshold", float, 0.5, 0, 255, "Mean pixel change that counts as consumed"),
+    Setting("burst_key_spacing", float, 0.015, 0, 1, "Seconds between keys of one multi-flask burst"),
+    Setting("full_rescan_interval", float, 30.0, 1, 3600, "Seconds between full slot rescans"),
+    # Warm start
+    Setting("persist_slot_state", bool, True, description="Save slot state and restore unchanged slots on start"),
+    Setting("state_save_interval", float, 1.0, 0.1, 60, "Seconds between warm-start state saves"),
+    # Idle and display
+    Setting("idle_max_backoff", float, 2.0, 0.1, 60, "Longest focus poll interval while idle"),
+    Setting("gui_refresh_rate", float, 10.0, 1, 60, "GUI redraws per second"),
+    Setting("debug", bool, False, description="Echo debug log messages to the console"),
+)}
+
+
+def default_settings() -> Dict[str, Any]:
+    return {name: setting.default for name, setting in SETTINGS.items()}
+
+
+def validate_settings(raw: Mapping[str, Any], strict: bool = True) -> Dict[str, Any]:
+    """Coerce every value; unknown names are an error when strict, otherwise skipped"""
+    settings = {}
+    for name, value in raw.items():
+        if name in SETTINGS:
+            settings[name] = SETTINGS[name].coerce(value)
+        elif strict:
+            raise ConfigError(f"Unknown setting '{name}'")
+    return settings
+
+
+def _rect(key: str, value) -> Tuple[int, int, int, int]:
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        raise ConfigError(f"{key} must be [x, y, width, height], not {value!r}")
+    x, y, width, height = (int(v) for v in value)
+    if width <= 0 or height <= 0:
+        raise ConfigError(f"{key} must have a positive size, not {value!r}")
+    return (x, y, width, height)
+
+
+def _point(key: str, value) -> Tuple[int, int]:
+    if not isinstance(value, (list, tuple)) or len(value) < 2:
+        raise ConfigError(f"{key} must be [x, y], not {value!r}")
+    return (int(value[0]), int(value[1]))
+
+
+def _color(key: str, value) -> Tuple[int, int, int]:
+    if not isinstance(value, (list, tuple)) or len(value) < 3 or not all(0 <= v <= 255 for v in value[:3]):
+        raise ConfigError(f"{key} must be [r, g, b] with values 0-255, not {value!r}")
+    return tuple(int(v) for v in value[:3])
+
+
+def validate_layout(raw: Mapping[str, Any]) -> Dict[str, Any]:
+    """Setup-tool config as manager attribute values
+
+    Missing or empty entries are left out, so the manager keeps its defaults
+    for them. Probe points and colors stay lists; the manager builds its
+    ProbeSets from them.
+    """
+    layout: Dict[str, Any] = {}
+    space = raw.get("coordinate_space", "desktop")
+    if space not in ("desktop", "window"):
+        raise ConfigError(f"coordinate_space must be 'desktop' or 'window', not {space!r}")
+    layout["coordinate_space"] = space
+    for key, attr in (("slot_regions", "slot_regions"), ("slot_progress_bars", "slot_progress_regions")):
+        regions = [_rect(f"{key}[{i}]", r) for i, r in enumerate(raw.get(key) or []) if r is not None]
+        if regions:
+            layout[attr] = regions
+    for key in ("health_bar_region", "mana_bar_region", "health_number_region", "mana_number_region"):
+        if raw.get(key):
+            layout[key] = _rect(key, raw[key])
+    for kind in ("health", "mana"):
+        if raw.get(f"{kind}_pixel_point"):
+            layout[f"{kind}_pixel_point"] = _point(f"{kind}_pixel_point", raw[f"{kind}_pixel_point"])
+        if raw.get(f"{kind}_pixel_color"):
+            layout[f"{kind}_pixel_color"] = _color(f"{kind}_pixel_color", raw[f"{kind}_pixel_color"])
+        points, colors = raw.get(f"{kind}_probe_points"), raw.get(f"{kind}_probe_colors")
+        if points and colors:
+            if len(points) != len(colors):
+                raise ConfigError(f"{kind}_probe_points and {kind}_probe_colors differ in length")
+            layout[f"{kind}_probe_points"] = [_point(f"{kind}_probe_points", p) for p in points]
+            layout[f"{kind}_probe_colors"] = [_color(f"{kind}_probe_colors", c) for c in colors]
+        if raw.get(f"{kind}_orb_column"):
+            layout[f"{kind}_orb_column"] = _rect(f"{kind}_orb_column", raw[f"{kind}_orb_column"])
+    return layout
+
+
+def layout_path() -> str:
+    """The setup tool's config file, falling back to the old location"""
+    return LAYOUT_PATH if os.path.exists(LAYOUT_PATH) or not os.path.exists(LEGACY_LAYOUT_PATH) \
+        else LEGACY_LAYOUT_PATH
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except ValueError as e:
+        raise ConfigError(f"not valid JSON ({e})")
+    if not isinstance(data, dict):
+        raise ConfigError("must contain a JSON object")
+    return data
+
+
+def load_general_settings(path: str = GENERAL_SETTINGS_PATH) -> Dict[str, Any]:
+    """Validated settings from the file (only the ones it sets); unknown keys are ignored"""
+    try:
+        return validate_settings(_read_json(path), strict=False)
+    except ConfigError as e:
+        raise ConfigError(f"{path}: {e}") from None
+
+
+def load_layout(path: str) -> Dict[str, Any]:
+    try:
+        return validate_layout(_read_json(path))
+    except (ValueError, TypeError) as e:  # ConfigError, or a non-numeric coordinate
+        raise ConfigError(f"{path}: {e}") from None
+
+
+def save_general_settings(settings: Mapping[str, Any], path: str = GENERAL_SETTINGS_PATH):
+    """Validate and write settings; the file is replaced in one step so a watcher never reads half of it"""
+    settings = validate_settings(settings)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(settings, f, indent=4)
+    os.replace(temp_path, path)
+
+
+@dataclass(frozen=True)
+class ManagerConfig:
+    """Validated contents of the config files, applied to the manager as one unit"""
+    settings: Mapping[str, Any] = field(default_factory=dict)  # Only the settings a file set
+    layout: Mapping[str, Any] = field(default_factory=dict)    # By manager attribute name
+    stamps: Mapping[str, Optional[Tuple[int, int]]] = field(default_factory=dict)  # File stamps when read
+    errors: Tuple[str, ...] = ()  # Files that were skipped because they failed validation
+
+    def merged(self, newer: "ManagerConfig") -> "ManagerConfig":
+        """This config with a newer (partial) one applied on top"""
+        return ManagerConfig(MappingProxyType({**self.settings, **newer.settings}),
+                             MappingProxyType({**self.layout, **newer.layout}),
+                             MappingProxyType({**self.stamps, **newer.stamps}),
+                             newer.errors)
+
+
+def load_config(general_path: str = GENERAL_SETTINGS_PATH, layout_file: Optional[str] = None) -> ManagerConfig:
+    """Read and validate both files; a file that fails validation is skipped and reported in errors"""
+    layout_file = layout_file or layout_path()
+    settings: Dict[str, Any] = {}
+    layout: Dict[str, Any] = {}
+    stamps = {}
+    errors = []
+    for path, load, target in ((general_path, load_general_settings, settings),
+                               (layout_file, load_layout, layout)):
+        stamps[path] = file_stamp(path)  # Taken first, so a write during the read is seen as a change
+        if stamps[path] is None:
+            continue
+        try:
+            target.update(load(path))
+        except (ConfigError, OSError) as e:
+            errors.append(str(e))
+    return ManagerConfig(MappingProxyType(settings), MappingProxyType(layout),
+                         MappingProxyType(stamps), tuple(errors))
+
+
+class ConfigWatcher(threading.Thread):
+    """Polls the config files and submits what changed to the manager
+
+    Only the settings whose values differ from the previous read of the file
+    are submitted, so a reload never reverts settings changed in a GUI that
+    the file doesn't touch. A file that fails validation is reported once
+    and ignored until it changes again.
+    """
+
+    def __init__(self, manager, interval: float = 1.0, general_path: str = GENERAL_SETTINGS_PATH):
+        super().__init__(name="ConfigWatcher", daemon=True)
+        self.manager = manager
+        self.interval = interval
+        self.general_path = general_path
+        self.reloads = 0
+        self._stamps = dict(manager.config.stamps)
+        self._file_settings = dict(manager.config.settings)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Config watcher error: {e}")
+
+    def poll(self) -> Optional[ManagerConfig]:
+        """Check both files once; returns the submitted config, if anything changed"""
+        settings: Dict[str, Any] = {}
+        layout: Dict[str, Any] = {}
+        changed = []
+        for path in (self.general_path, layout_path()):
+            stamp = file_stamp(path)
+            if stamp == self._stamps.get(path):
+                continue
+            self._stamps[path] = stamp
+            if stamp is None:
+                continue  # Deleted: keep running with what was loaded
+            try:
+                if path == self.general_path:
+                    loaded = load_general_settings(path)
+                    settings = {name: value for name, value in loaded.items()
+                                if self._file_settings.get(name, SETTINGS[name].default) != value}
+                    self._file_settings = loaded
+                else:
+                    layout = load_layout(path)
+            except (ConfigError, OSError) as e:
+                print(f"Ignoring config change: {e}")
+                self.manager.activity_log.warning(f"Ignoring config change: {e}")
+                continue
+            changed.append(os.path.basename(path))
+        if not changed:
+            return None
+        config = ManagerConfig(MappingProxyType(settings), MappingProxyType(layout),
+                               MappingProxyType(dict(self._stamps)))
+        self.reloads += 1
+        names = sorted(settings) + (["screen layout"] if layout else [])
+        self.manager.activity_log.info(f"Reloaded {', '.join(changed)}"
+                                       + (f": {', '.join(names)}" if names else " (no changes)"))
+        if settings or layout:
+            self.manager.submit_config(config)
+        return config
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,422 @@
+"""
+Multi-process capture/analysis pipeline
+
+Optional mode that spreads one engine over three processes:
+- capture: screenshots the area covering every configured region into a
+  shared-memory ring of frames, each published with a sequence number
+- analysis: the process owning the AdvancedPotionManager (the daemon or a
+  script); its captures become crops of the newest shared frame
+- actuator: sends the key presses the analysis stage decides on
+
+Frames never get pickled; only key names and send acknowledgements cross a
+queue. Screenshots and key input no longer share the analysis GIL, and the
+health path no longer waits for a screenshot on every sample.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from input_dispatch import Dispatch, InputDispatcher
+from potions import AdvancedPotionManager, EngineSnapshot, grab_screen
+from window_focus import Rect
+
+# Ring header fields (int64)
+LATEST, PAUSED, STOP, ORIGIN_X, ORIGIN_Y, CAPTURE_ERRORS = range(6)
+HEADER_FIELDS = 8
+_ALIGN = 64
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class StaleFrameError(TimeoutError):
+    """No frame recent enough to act on (capture process stalled or gone)"""
+
+
+class FrameRing:
+    """Fixed-size BGR frames in shared memory, published with sequence numbers
+
+    One writer (the capture process). A slot's sequence number is -1 while it
+    is being written and the frame's sequence number afterwards; readers copy
+    what they need and then check the number didn't change (a seqlock), so
+    nothing is locked and no frame is ever copied whole.
+    """
+
+    def __init__(self, width: int, height: int, slots: int = 4, name: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        header_size = _aligned(HEADER_FIELDS * 8)
+        meta_size = _aligned(slots * 3 * 8)
+        times_size = _aligned(slots * 8)
+        frames_size = slots * height * width * 3
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create,
+                                              size=header_size + meta_size + times_size + frames_size)
+        buf = self.shm.buf
+        offset = 0
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, buf, offset)
+        offset += header_size
+        self.meta = np.ndarray((slots, 3), np.int64, buf, offset)  # seq, origin x, origin y
+        offset += meta_size
+        self.times = np.ndarray((slots,), np.float64, buf, offset)  # Wall-clock capture time
+        offset += times_size
+        self.frames = np.ndarray((slots, height, width, 3), np.uint8, buf, offset)
+        if create:
+            self.header[:] = 0
+            self.meta[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def origin(self) -> Tuple[int, int]:
+        return int(self.header[ORIGIN_X]), int(self.header[ORIGIN_Y])
+
+    def set_origin(self, x: int, y: int):
+        self.header[ORIGIN_X] = x
+        self.header[ORIGIN_Y] = y
+
+    def write(self, img: np.ndarray, x: int, y: int, captured_at: float):
+        """Publish a frame whose top-left corner is desktop (x, y)"""
+        seq = int(self.header[LATEST]) + 1
+        slot = seq % self.slots
+        self.meta[slot, 0] = -1
+        frame = self.frames[slot]
+        height = min(img.shape[0], self.height)
+        width = min(img.shape[1], self.width)
+        frame[:height, :width] = img[:height, :width]
+        if height < self.height or width < self.width:  # Partly off-screen
+            frame[height:] = 0
+            frame[:height, width:] = 0
+        self.meta[slot, 1] = x
+        self.meta[slot, 2] = y
+        self.times[slot] = captured_at
+        self.meta[slot, 0] = seq
+        self.header[LATEST] = seq
+
+    def age(self) -> float:
+        """Seconds since the newest frame was captured (inf before the first one)"""
+        seq = int(self.header[LATEST])
+        return time.time() - float(self.times[seq % self.slots]) if seq > 0 else float("inf")
+
+    def read(self, region: Rect, max_age: float, timeout: float = 0.5,
+             stale_after: float = 1.0) -> np.ndarray:
+        """Crop a desktop region out of the newest frame
+
+        Waits (up to timeout) for a frame captured at most max_age seconds ago;
+        after that the newest frame is used if it is at most stale_after seconds
+        old, otherwise StaleFrameError is raised. Parts of the region outside
+        the frame read as black.
+        """
+        x, y, width, height = region
+        deadline = time.time() + timeout
+        while True:
+            seq = int(self.header[LATEST])
+            if seq > 0:
+                slot = seq % self.slots
+                now = time.time()
+                age = now - self.times[slot]
+                if now >= deadline and age > stale_after:
+                    raise StaleFrameError(f"Newest frame is {age:.1f}s old")
+                if self.meta[slot, 0] == seq and (age <= max_age or now >= deadline):
+                    origin_x, origin_y = int(self.meta[slot, 1]), int(self.meta[slot, 2])
+                    img = np.zeros((height, width, 3), dtype=np.uint8)
+                    left, top = max(x, origin_x), max(y, origin_y)
+                    right = min(x + width, origin_x + self.width)
+                    bottom = min(y + height, origin_y + self.height)
+                    if right > left and bottom > top:
+                        img[top - y:bottom - y, left - x:right - x] = \
+                            self.frames[slot, top - origin_y:bottom - origin_y, left - origin_x:right - origin_x]
+                    if self.meta[slot, 0] == seq:
+                        return img
+                    continue  # Overwritten while copying; take the next frame
+            if time.time() >= deadline:
+                raise StaleFrameError("No frame from the capture process")
+            time.sleep(0.002)
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be closed
+        self.header = self.meta = self.times = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def capture_worker(name: str, width: int, height: int, slots: int, fps: float):
+    """Capture process: screenshot the ring's area into the ring at a fixed rate"""
+    ring = FrameRing(width, height, slots, name=name)
+    interval = 1.0 / fps
+    next_frame = time.perf_counter()
+    try:
+        while not ring.header[STOP]:
+            if ring.header[PAUSED]:
+                time.sleep(0.01)
+                next_frame = time.perf_counter()
+                continue
+            x, y = ring.origin()
+            try:
+                ring.write(grab_screen((x, y, width, height)), x, y, time.time())
+            except Exception as e:
+                ring.header[CAPTURE_ERRORS] += 1
+                print(f"Pipeline capture error: {e}")
+                time.sleep(0.5)
+            next_frame += interval
+            delay = next_frame - time.perf_counter()
+            if delay < 0:
+                next_frame = time.perf_counter()  # Skip missed frames instead of bursting
+                delay = 0
+            time.sleep(delay)
+    finally:
+        ring.close()
+
+
+def actuator_worker(key_queue, ack_queue, min_key_spacing: float, burst_spacing: float):
+    """Actuator process: send queued bursts and acknowledge each sent key"""
+    dispatcher = InputDispatcher(min_key_spacing=min_key_spacing, burst_spacing=burst_spacing)
+    dispatcher.start()
+
+    def acknowledge(dispatch: Dispatch):
+        ack_queue.put((dispatch.key, time.time()))
+
+    try:
+        while True:
+            item = key_queue.get()
+            if item is None:
+                break
+            keys, spacing = item
+            dispatcher.submit_burst(keys, spacing, on_sent=acknowledge)
+    finally:
+        dispatcher.stop()
+        dispatcher.join(timeout=1)
+
+
+class RemoteDispatcher(threading.Thread):
+    """InputDispatcher stand-in in the analysis process
+
+    Bursts go to the actuator process; acknowledgements come back on this
+    thread and fire the on_sent callbacks. A key counts as queued until it is
+    acknowledged or pending_timeout passes (a failed press is never acked).
+    """
+
+    def __init__(self, key_queue, ack_queue, pending_timeout: float = 1.0):
+        super().__init__(name="RemoteDispatcher", daemon=True)
+        self.key_queue = key_queue
+        self.ack_queue = ack_queue
+        self.pending_timeout = pending_timeout
+        self._pending: Dict[str, Tuple[float, Optional[Callable[[Dispatch], None]]]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def submit(self, key: str, on_sent: Optional[Callable[[Dispatch], None]] = None) -> bool:
+        return bool(self.submit_burst([key], on_sent=on_sent))
+
+    def submit_burst(self, keys, spacing: Optional[float] = None,
+                     on_sent: Optional[Callable[[Dispatch], None]] = None) -> List[str]:
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (queued_at, _) in self._pending.items() if now - queued_at > self.pending_timeout]:
+                del self._pending[key]
+            keys = [key for key in dict.fromkeys(keys) if key not in self._pending]
+            for key in keys:
+                self._pending[key] = (now, on_sent)
+        if keys:
+            self.key_queue.put((keys, spacing))
+        return keys
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                key, sent_at = self.ack_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            with self._lock:
+                entry = self._pending.pop(key, None)
+            if entry is not None and entry[1] is not None:
+                try:
+                    entry[1](Dispatch(key, entry[0], sent_at))
+                except Exception as e:
+                    print(f"Dispatch callback error: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class Pipeline:
+    """Runs a manager's capture and key input in separate processes
+
+    Start it before the engine and stop it after; the engine itself keeps
+    running in the calling process as usual.
+    """
+
+    def __init__(self, manager: AdvancedPotionManager, capture_fps: float = 30.0, ring_slots: int = 4,
+                 max_frame_age: Optional[float] = None, read_timeout: float = 0.5, stale_frame_age: float = 1.0,
+                 start_timeout: float = 15.0):
+        self.manager = manager
+        self.capture_fps = capture_fps
+        self.ring_slots = ring_slots
+        self.max_frame_age = max_frame_age or 2.0 / capture_fps  # Older frames are waited on
+        self.read_timeout = read_timeout
+        self.stale_frame_age = stale_frame_age  # Older frames are never used
+        self.start_timeout = start_timeout  # Spawned workers re-import cv2 and friends
+        self.bounds: Optional[Rect] = None
+        self.ring: Optional[FrameRing] = None
+        self.key_queue = None
+        self.ack_queue = None
+        self.processes: List[multiprocessing.Process] = []  # Capture first, then the actuator
+        self._context = multiprocessing.get_context("spawn")  # X11 and capture handles don't survive fork
+        self._layout_lock = threading.Lock()
+        self._retired: List[Tuple[FrameRing, multiprocessing.Process, float]] = []  # Replaced rings, their writers
+
+    def running(self) -> bool:
+        return self.ring is not None
+
+    def start(self):
+        if self.running():
+            return
+        manager = self.manager
+        self.bounds = manager.capture_bounds()
+        if self.bounds is None:
+            raise RuntimeError("No capture regions configured")
+        _, _, width, height = self.bounds
+
+        context = self._context
+        self.key_queue = context.Queue()
+        self.ack_queue = context.Queue()
+        self.processes = [
+            self._capture_process(),
+            context.Process(target=actuator_worker, name="PotionActuator", daemon=True,
+                            args=(self.key_queue, self.ack_queue, manager.min_key_spacing,
+                                  manager.burst_key_spacing)),
+        ]
+        for process in self.processes:
+            process.start()
+        deadline = time.time() + self.start_timeout
+        while not self.ring.header[LATEST]:
+            if time.time() > deadline or not self.processes[0].is_alive():
+                self.stop()
+                raise RuntimeError("Capture process did not produce a frame")
+            time.sleep(0.05)
+
+        manager.stop_input_dispatcher()  # A local dispatcher would bypass the actuator
+        manager.dispatcher_factory = lambda: RemoteDispatcher(self.key_queue, self.ack_queue)
+        manager.frame_source = self.read
+        manager.frame_source_ready = self.ready
+        manager.engine.subscribe(self.on_snapshot)
+        print(f"Pipeline started: capturing {width}x{height} at {self.capture_fps:g} fps")
+
+    def _capture_process(self) -> multiprocessing.Process:
+        """A new ring sized to the current bounds, and a (not yet started) capture process for it"""
+        _, _, width, height = self.bounds
+        self.ring = FrameRing(width, height, self.ring_slots)
+        self.update_origin()
+        return self._context.Process(target=capture_worker, name="PotionCapture", daemon=True,
+                                     args=(self.ring.name, width, height, self.ring_slots, self.capture_fps))
+
+    def sync_layout(self):
+        """Follow layout changes (config reloads, the setup tab)
+
+        A moved capture area only needs a new origin. A resized one needs a
+        ring of the new size, so the capture process is restarted on a fresh
+        ring; the engine waits for its first frame as after any stall.
+        """
+        bounds = self.manager.capture_bounds()
+        if bounds is None or bounds == self.bounds:
+            return
+        with self._layout_lock:
+            if bounds == self.bounds:
+                return
+            resized = bounds[2:] != self.bounds[2:]
+            self.bounds = bounds
+            if resized:
+                old_ring, old_process = self.ring, self.processes[0]
+                process = self._capture_process()
+                process.start()
+                self.processes[0] = process
+                old_ring.header[STOP] = 1
+                old_ring.unlink()  # The old capture process is already attached
+                self._retired.append((old_ring, old_process, time.time()))
+                print(f"Pipeline capture restarted for the new layout: {bounds[2]}x{bounds[3]}")
+            self.update_origin()
+        self._release_retired()
+
+    def _release_retired(self, force: bool = False):
+        """Unmap replaced rings once no read can still be copying from them"""
+        keep = []
+        for ring, process, retired_at in self._retired:
+            if force or time.time() - retired_at > self.read_timeout + 1.0:
+                ring.close()
+                process.join(timeout=0.5 if force else 0)  # Exits on its own once it sees STOP
+            else:
+                keep.append((ring, process, retired_at))
+        self._retired = keep
+
+    def update_origin(self):
+        """Keep the captured area on the game window as it moves"""
+        x, y = self.bounds[0], self.bounds[1]
+        rect = self.manager.window_rect
+        if self.manager.coordinate_space == "window" and rect is not None:
+            x, y = x + rect[0], y + rect[1]
+        if self.ring.origin() != (x, y):
+            self.ring.set_origin(x, y)
+
+    def capture_alive(self) -> bool:
+        return bool(self.processes) and self.processes[0].is_alive()
+
+    def ready(self) -> bool:
+        """Whether there are fresh frames to decide on; the engine idles otherwise"""
+        if not self.capture_alive():
+            return False
+        # A paused capture process resumes on the next read
+        return bool(self.ring.header[PAUSED]) or self.ring.age() <= self.stale_frame_age
+
+    def read(self, region: Rect) -> np.ndarray:
+        """Frame source for the manager: a crop of the newest shared frame"""
+        if not self.capture_alive():
+            raise StaleFrameError("Capture process exited")
+        self.sync_layout()
+        self.update_origin()
+        ring = self.ring  # A layout change may swap in a new ring meanwhile
+        ring.header[PAUSED] = 0  # Any read wakes the capture process
+        return ring.read(region, self.max_frame_age, self.read_timeout, self.stale_frame_age)
+
+    def on_snapshot(self, snapshot: EngineSnapshot):
+        # Nothing reads frames while the engine idles or is stopped
+        if snapshot.idle or not snapshot.running:
+            self.ring.header[PAUSED] = 1
+
+    def stop(self):
+        if not self.running():
+            return
+        manager = self.manager
+        manager.engine.stop()
+        manager.engine.join(timeout=3)  # Nothing may read the ring once it is closed
+        manager.engine.unsubscribe(self.on_snapshot)
+        manager.frame_source = None
+        manager.frame_source_ready = None
+        manager.dispatcher_factory = None
+        manager.stop_input_dispatcher()
+
+        self.ring.header[STOP] = 1
+        self.key_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.ring.close()
+        self.ring.unlink()
+        self.ring = None
+        self._release_retired(force=True)
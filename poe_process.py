@@ -0,0 +1,238 @@
+"""
+Cached Path of Exile process discovery
+
+The game process is looked up once (a /proc scan on Linux, a Toolhelp
+snapshot on Windows, one ``ps`` call elsewhere) and its PID and executable
+name are cached. Later lookups only check that the cached process is still
+alive, so focus logic can match windows by PID instead of re-deriving and
+comparing process names on every check.
+"""
+
+import os
+import platform
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+GAME_PROCESS_NAMES = ("pathofexile", "pathofexile_x64", "pathofexilesteam")
+
+
+def is_game_process(name: Optional[str]) -> bool:
+    if not name:
+        return False
+    name = name.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    if name.endswith(".exe"):
+        name = name[:-4]
+    return "pathofexile" in name or name in GAME_PROCESS_NAMES
+
+
+@dataclass(frozen=True)
+class GameProcess:
+    pid: int
+    name: str
+    started: Optional[int] = None  # Start time (Linux clock ticks), guards against PID reuse
+
+
+# Linux: /proc
+
+def _linux_name(pid: int) -> Optional[str]:
+    """Executable name; argv[0] is checked too since comm is cut at 15 characters
+    and Wine/Proton games show up as the loader with the .exe in argv[0]"""
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            comm = f.read().strip()
+    except OSError:
+        return None
+    if is_game_process(comm):
+        return comm
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            argv0 = f.read().split(b"\0", 1)[0].decode("utf-8", "replace")
+    except OSError:
+        return comm
+    return argv0.replace("\\", "/").rsplit("/", 1)[-1] if is_game_process(argv0) else comm
+
+
+def _linux_started(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised comm start at field 3; starttime is field 22
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _linux_processes() -> Iterator[Tuple[int, str]]:
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            name = _linux_name(int(entry))
+            if name:
+                yield int(entry), name
+
+
+# Windows: Toolhelp snapshot and QueryFullProcessImageNameW
+
+def _windows_processes() -> Iterator[Tuple[int, str]]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [("dwSize", wintypes.DWORD), ("cntUsage", wintypes.DWORD),
+                    ("th32ProcessID", wintypes.DWORD), ("th32DefaultHeapID", ctypes.c_size_t),
+                    ("th32ModuleID", wintypes.DWORD), ("cntThreads", wintypes.DWORD),
+                    ("th32ParentProcessID", wintypes.DWORD), ("pcPriClassBase", wintypes.LONG),
+                    ("dwFlags", wintypes.DWORD), ("szExeFile", wintypes.WCHAR * 260)]
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    kernel32 = ctypes.windll.kernel32
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    if not snapshot or snapshot == ctypes.c_void_p(-1).value:
+        return
+    try:
+        entry = PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+        more = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while more:
+            yield entry.th32ProcessID, entry.szExeFile
+            more = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+
+
+def _windows_name(pid: int) -> Optional[str]:
+    import ctypes
+    from ctypes import wintypes
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    kernel32 = ctypes.windll.kernel32
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        return None
+    try:
+        buffer = ctypes.create_unicode_buffer(512)
+        size = wintypes.DWORD(512)
+        if not kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+            return None
+        return buffer.value.replace("/", "\\").rsplit("\\", 1)[-1]
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+# macOS and others: ps
+
+def _ps_processes() -> Iterator[Tuple[int, str]]:
+    result = subprocess.run(["ps", "-axo", "pid=,comm="], capture_output=True, text=True, timeout=5)
+    for line in result.stdout.splitlines():
+        pid, _, command = line.strip().partition(" ")
+        if pid.isdigit():
+            yield int(pid), command.strip().rsplit("/", 1)[-1]
+
+
+def _ps_name(pid: int) -> Optional[str]:
+    result = subprocess.run(["ps", "-p", str(pid), "-o", "comm="], capture_output=True, text=True, timeout=1)
+    command = result.stdout.strip()
+    return command.rsplit("/", 1)[-1] if command else None
+
+
+def _pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def list_processes() -> Iterator[Tuple[int, str]]:
+    """All (pid, executable name) pairs on this system"""
+    system = platform.system()
+    if system == "Linux":
+        return _linux_processes()
+    if system == "Windows":
+        return _windows_processes()
+    return _ps_processes()
+
+
+def process_name(pid: int) -> Optional[str]:
+    """Executable name of a single process, or None if it doesn't exist"""
+    system = platform.system()
+    if system == "Linux":
+        return _linux_name(pid)
+    if system == "Windows":
+        return _windows_name(pid)
+    return _ps_name(pid)
+
+
+class GameProcessFinder:
+    """Finds the game process once and caches it while it stays alive
+
+    Thread-safe; shared between the focus provider thread and the main loop.
+    Full scans are throttled to one per rescan_interval while the game isn't
+    running.
+    """
+
+    def __init__(self, rescan_interval: float = 2.0):
+        self.rescan_interval = rescan_interval
+        self.system = platform.system()
+        self._process: Optional[GameProcess] = None
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    def _make(self, pid: int, name: str) -> GameProcess:
+        started = _linux_started(pid) if self.system == "Linux" else None
+        return GameProcess(pid, name, started)
+
+    def _alive(self, process: GameProcess) -> bool:
+        if self.system == "Linux":
+            return process.started is not None and _linux_started(process.pid) == process.started
+        if self.system == "Windows":
+            # A reused PID would belong to a different executable
+            return is_game_process(_windows_name(process.pid))
+        return _pid_exists(process.pid)
+
+    def scan(self) -> Optional[GameProcess]:
+        """Full process scan, ignoring the cache"""
+        with self._lock:
+            self._last_scan = time.monotonic()
+            self._process = None
+            try:
+                for pid, name in list_processes():
+                    if is_game_process(name):
+                        self._process = self._make(pid, name)
+                        break
+            except Exception as e:
+                print(f"Process scan error: {e}")
+            return self._process
+
+    def current(self) -> Optional[GameProcess]:
+        """Cached game process, rescanning (throttled) if it has exited"""
+        with self._lock:
+            process = self._process
+            if process is not None and self._alive(process):
+                return process
+            self._process = None
+            if time.monotonic() - self._last_scan < self.rescan_interval:
+                return None
+        return self.scan()
+
+    def is_game_pid(self, pid: Optional[int]) -> bool:
+        """Whether pid is the game: a PID comparison once the game is cached
+
+        An unknown PID is looked up on its own (not a full scan), so a game
+        that was just launched is recognised on its first focus event.
+        """
+        if not pid:
+            return False
+        process = self.current()
+        if process is not None:
+            return pid == process.pid
+        name = process_name(pid)
+        if not is_game_process(name):
+            return False
+        with self._lock:
+            self._process = self._make(pid, name)
+        return True
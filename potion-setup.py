@@ -7,6 +7,11 @@ import json
 import os
 import time
 from PIL import Image, ImageTk
+from digit_reader import GlyphAtlas
+from window_focus import locate_game_client_rect, translate_config
+
+# Number of probe points recorded along each orb (one every 10%)
+PROBE_COUNT = 10
 
 class VisualSetupTool:
     def __init__(self):
@@ -21,12 +26,18 @@ class VisualSetupTool:
             "slot_progress_bars": [],  # Progress bars for each slot
             "health_bar_region": None,
             "mana_bar_region": None,
-            "health_number_region": None,  # For OCR reading of health numbers
-            "mana_number_region": None,    # For OCR reading of mana numbers
+            "health_number_region": None,  # For the digit reader (health numbers)
+            "mana_number_region": None,    # For the digit reader (mana numbers)
             "health_pixel_point": None,    # Single pixel for health detection
             "mana_pixel_point": None,      # Single pixel for mana detection
             "health_pixel_color": None,    # Color when health is full
             "mana_pixel_color": None,      # Color when mana is full
+            "health_probe_points": None,   # Probe points along the health orb, bottom to top
+            "health_probe_colors": None,   # Probe colors when health is full
+            "mana_probe_points": None,     # Probe points along the mana orb, bottom to top
+            "mana_probe_colors": None,     # Probe colors when mana is full
+            "health_orb_column": None,     # Column through the health liquid, for orb fill detection
+            "mana_orb_column": None,       # Column through the mana liquid, for orb fill detection
             "slot_size": {"width": 40, "height": 40},
             "bar_size": {"width": 200, "height": 20}
         }
@@ -118,9 +129,15 @@ class VisualSetupTool:
         tk.Button(pixel_frame, text="Mana Pixel", width=12,
                  command=lambda: self.start_position_capture("mana_pixel"),
                  bg="darkblue", fg="white").pack(side="left", padx=2)
+        tk.Button(pixel_frame, text="Health Probes", width=12,
+                 command=lambda: self.start_position_capture("health_probes"),
+                 bg="darkgreen", fg="white").pack(side="left", padx=2)
+        tk.Button(pixel_frame, text="Mana Probes", width=12,
+                 command=lambda: self.start_position_capture("mana_probes"),
+                 bg="darkblue", fg="white").pack(side="left", padx=2)
         
-        # Health and Mana numbers (for OCR)
-        tk.Label(setup_frame, text="Resource Numbers (for OCR - High CPU):", font=("Arial", 10, "bold")).pack(anchor="w", pady=(10,0))
+        # Health and Mana numbers (for the digit reader)
+        tk.Label(setup_frame, text="Resource Numbers (Digit Reader - Low CPU):", font=("Arial", 10, "bold")).pack(anchor="w", pady=(10,0))
         
         numbers_frame = tk.Frame(setup_frame)
         numbers_frame.pack(fill="x", pady=5)
@@ -129,6 +146,8 @@ class VisualSetupTool:
                  command=lambda: self.start_position_capture("health_number")).pack(side="left", padx=2)
         tk.Button(numbers_frame, text="Mana Numbers", width=12,
                  command=lambda: self.start_position_capture("mana_number")).pack(side="left", padx=2)
+        tk.Button(numbers_frame, text="Learn Digits", width=12,
+                 command=self.learn_digits).pack(side="left", padx=2)
         
         
         # Progress Bar Areas (for template matching)
@@ -231,7 +250,7 @@ class VisualSetupTool:
         self.click_overlay.attributes("-fullscreen", True)
         
         element_type, slot_index = self.setup_mode
-        if element_type in ["health_pixel", "mana_pixel"]:
+        if element_type in ["health_pixel", "mana_pixel", "health_probes", "mana_probes"]:
             # For pixel capture, use very transparent overlay
             self.click_overlay.attributes("-alpha", 0.1)  # Almost invisible
             self.click_overlay.configure(bg='gray')
@@ -246,7 +265,7 @@ class VisualSetupTool:
         self.canvas = tk.Canvas(self.click_overlay, highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
         
-        if element_type in ["health_pixel", "mana_pixel"]:
+        if element_type in ["health_pixel", "mana_pixel", "health_probes", "mana_probes"]:
             self.canvas.configure(bg='gray')
         else:
             self.canvas.configure(bg='red')
@@ -266,6 +285,10 @@ class VisualSetupTool:
             instruction = "CLICK on a point in your health globe/bar that changes color when you lose health"
         elif element_type == "mana_pixel":
             instruction = "CLICK on a point in your mana globe/bar that changes color when you lose mana"
+        elif element_type == "health_probes":
+            instruction = "CLICK the BOTTOM, then the TOP of the liquid in your FULL health orb"
+        elif element_type == "mana_probes":
+            instruction = "CLICK the BOTTOM, then the TOP of the liquid in your FULL mana orb"
         elif element_type == "progress":
             instruction = f"Draw a rectangle around Slot {slot_index + 1}'s PROGRESS BAR area (when NO buff is active)"
         
@@ -282,12 +305,16 @@ class VisualSetupTool:
         self.start_x = None
         self.start_y = None
         self.rect_id = None
+        self.probe_bottom = None
         
         # Bind mouse events
         element_type, _ = self.setup_mode
         if element_type in ["health_pixel", "mana_pixel"]:
             # For pixel detection, just capture single click
             self.canvas.bind("<Button-1>", self.on_pixel_click)
+        elif element_type in ["health_probes", "mana_probes"]:
+            # For probes, capture two clicks (bottom and top of the orb)
+            self.canvas.bind("<Button-1>", self.on_probe_click)
         else:
             # For rectangles, use drag behavior
             self.canvas.bind("<Button-1>", self.on_mouse_down)
@@ -406,6 +433,48 @@ class VisualSetupTool:
         
         self.finish_capture()
     
+    def on_probe_click(self, event):
+        """Handle the bottom/top clicks that define a column of orb probes"""
+        if self.probe_bottom is None:
+            # First click: bottom of the orb
+            self.probe_bottom = (event.x_root, event.y_root)
+            self.canvas.create_oval(event.x - 4, event.y - 4, event.x + 4, event.y + 4,
+                                    outline="lime", width=2)
+            return
+        
+        bottom_x, bottom_y = self.probe_bottom
+        top_x, top_y = event.x_root, event.y_root
+        element_type, _ = self.setup_mode
+        kind = "health" if element_type == "health_probes" else "mana"
+        
+        # Hide the overlay temporarily to get true colors
+        self.click_overlay.withdraw()
+        time.sleep(0.1)
+        screenshot = pyautogui.screenshot()
+        self.click_overlay.deiconify()
+        
+        # Probe i is covered by liquid when the orb is at least (i+1)/N full
+        points = []
+        colors = []
+        for i in range(PROBE_COUNT):
+            fraction = (i + 1) / PROBE_COUNT
+            x = round(bottom_x + (top_x - bottom_x) * fraction)
+            y = round(bottom_y + (top_y - bottom_y) * fraction)
+            points.append((x, y))
+            colors.append(screenshot.getpixel((x, y))[:3])
+        
+        self.config[f"{kind}_probe_points"] = points
+        self.config[f"{kind}_probe_colors"] = colors
+        # The same clicks calibrate the column that orb fill detection bisects
+        top, bottom = sorted((top_y, bottom_y))
+        self.config[f"{kind}_orb_column"] = [round((bottom_x + top_x) / 2), top, 1, bottom - top + 1]
+        messagebox.showinfo("Probes Captured",
+                          f"{PROBE_COUNT} {kind} probes captured from ({bottom_x}, {bottom_y}) "
+                          f"to ({top_x}, {top_y})\n\n"
+                          f"Make sure your {kind.upper()} is FULL when capturing!")
+        
+        self.finish_capture()
+    
     def cancel_capture(self, event=None):
         """Cancel position capture"""
         self.finish_capture()
@@ -464,8 +533,16 @@ class VisualSetupTool:
         else:
             self.status_text.insert(tk.END, "  Mana Pixel: Not set\n")
         
+        for kind in ["health", "mana"]:
+            points = self.config.get(f"{kind}_probe_points")
+            if points:
+                self.status_text.insert(tk.END, f"  {kind.title()} Probes: {len(points)} points "
+                                               f"from {tuple(points[0])} to {tuple(points[-1])}\n")
+            else:
+                self.status_text.insert(tk.END, f"  {kind.title()} Probes: Not set\n")
+        
         # Resource numbers
-        self.status_text.insert(tk.END, "\nRESOURCE NUMBERS (OCR - High CPU):\n")
+        self.status_text.insert(tk.END, "\nRESOURCE NUMBERS (Digit Reader):\n")
         if self.config["health_number_region"]:
             self.status_text.insert(tk.END, f"  Health Numbers: {self.config['health_number_region']}\n")
         else:
@@ -503,8 +580,20 @@ class VisualSetupTool:
             full_path = os.path.abspath(config_path)
             print(f"Saving config to: {full_path}")
             
+            # Regions are picked on the desktop; store them relative to the game
+            # window so moving the window doesn't invalidate the setup
+            config = dict(self.config)
+            config.pop("coordinate_space", None)
+            client_rect = locate_game_client_rect()
+            if client_rect:
+                config = translate_config(config, -client_rect[0], -client_rect[1])
+                config["coordinate_space"] = "window"
+                print(f"Saving regions relative to the game window at {client_rect[:2]}")
+            else:
+                print("Game window not found - saving desktop coordinates")
+            
             with open(config_path, "w") as f:
-                json.dump(self.config, f, indent=2)
+                json.dump(config, f, indent=2)
             
             # Verify file was created
             if os.path.exists(config_path):
@@ -530,7 +619,15 @@ class VisualSetupTool:
                 config_path = "potion_manager_config.json"
             
             with open(config_path, "r") as f:
-                self.config = json.load(f)
+                config = json.load(f)
+            if config.pop("coordinate_space", "desktop") == "window":
+                client_rect = locate_game_client_rect()
+                if client_rect:
+                    config = translate_config(config, client_rect[0], client_rect[1])
+                else:
+                    messagebox.showwarning("Warning", "Regions are relative to the game window, "
+                                           "but the game window was not found")
+            self.config = config
             self.update_status_display()
             messagebox.showinfo("Success", f"Configuration loaded from {config_path}")
         except FileNotFoundError:
@@ -588,7 +685,7 @@ def configure_potion_manager(manager):
     manager.health_bar_region = {self.config["health_bar_region"]}
     manager.mana_bar_region = {self.config["mana_bar_region"]}
     
-    # OCR number regions
+    # Digit reader number regions
     manager.health_number_region = {self.config["health_number_region"]}
     manager.mana_number_region = {self.config["mana_number_region"]}
     
@@ -673,6 +770,39 @@ def configure_potion_manager(manager):
             messagebox.showerror("Error", f"Failed to capture template: {e}")
             print(f"Error capturing template: {e}")
     
+    def learn_digits(self):
+        """Teach the digit reader the glyphs currently shown in the number regions"""
+        atlas = GlyphAtlas.load()
+        learned = 0
+        
+        for kind in ["health", "mana"]:
+            region = self.config.get(f"{kind}_number_region")
+            if not region:
+                continue
+            
+            screenshot = pyautogui.screenshot(region=tuple(region))
+            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            text = simpledialog.askstring("Learn Digits",
+                                          f"Type the {kind} numbers exactly as shown in game\n"
+                                          f"(e.g. 1523/1600):", parent=self.root)
+            if not text:
+                continue
+            if atlas.learn(img, text):
+                learned += 1
+            else:
+                messagebox.showwarning("Learn Digits",
+                                       f"Could not split the {kind} numbers into {len(text.replace(' ', ''))} "
+                                       f"characters. Redraw the region tightly around the numbers.")
+        
+        if not learned:
+            messagebox.showerror("Error", "No digits learned. Set the number regions first.")
+            return
+        
+        atlas.save()
+        messagebox.showinfo("Success", f"Digit atlas saved with {len(atlas)} glyphs.\n"
+                                       f"Learn again with different values to cover all digits.")
+        print(f"Saved digit atlas with {len(atlas)} glyphs")
+    
     def save_progress_template(self, region, slot_index):
         """Save progress bar template for a specific slot"""
         try:
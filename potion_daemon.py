@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Headless potion daemon
+
+Runs the potion engine with no GUI and without loading Tk at all, and
+exposes a local control and telemetry protocol (see daemon_client.py):
+start/stop, rescans, settings changes, one-off snapshots and a snapshot/log
+stream. GUIs and scripts become clients in their own processes, so Tk
+repaints never compete with the engine for the GIL.
+
+With --pipeline, screen capture and key input run in their own processes
+(see pipeline.py) and this process only analyses shared frames.
+
+Usage:
+    python potion_daemon.py [--autostart] [--async-engine] [--pipeline [--capture-fps FPS]]
+                            [--address ADDRESS]
+"""
+
+import argparse
+import os
+import threading
+from dataclasses import asdict
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, Optional
+
+from daemon_client import SLOT_FLAG_SETTINGS, address_family, default_address, recv_message, send_message
+from activity_log import LEVELS
+from manager_config import ConfigError, validate_settings
+from potions import AdvancedPotionManager, EngineSnapshot
+from pipeline import Pipeline
+from async_engine import AsyncEngineRunner
+
+
+def snapshot_to_dict(snapshot: EngineSnapshot) -> Dict[str, Any]:
+    """JSON-safe form of a snapshot (frames are left out, hashes as hex)"""
+    return {
+        "timestamp": snapshot.timestamp,
+        "tick": snapshot.tick,
+        "running": snapshot.running,
+        "idle": snapshot.idle,
+        "focused": snapshot.focused,
+        "health_percentage": snapshot.health_percentage,
+        "mana_percentage": snapshot.mana_percentage,
+        "scan_count": snapshot.scan_count,
+        "error_count": snapshot.error_count,
+        "last_error": snapshot.last_error,
+        "slots": [{
+            "slot_number": slot.slot_number,
+            "subtype": slot.subtype.value,
+            "category": slot.category.value,
+            "uses_remaining": slot.uses_remaining,
+            "max_uses": slot.max_uses,
+            "last_used": slot.last_used,
+            "active_until": slot.active_until,
+            "confidence": slot.confidence,
+            "progress_active": bool(slot.progress_active),
+            "frame_hash": slot.frame_hash.hex() if slot.frame_hash else None,
+        } for slot in snapshot.slots],
+    }
+
+
+class _Subscription:
+    """Latest-only snapshot mailbox for one streaming client
+
+    The engine thread only swaps a reference; a slow client skips snapshots
+    instead of queueing them up.
+    """
+
+    def __init__(self, level: str):
+        self.level = level
+        self.log_seq = 0
+        self._snapshot: Optional[EngineSnapshot] = None
+        self._changed = threading.Event()
+
+    def push(self, snapshot: EngineSnapshot):
+        self._snapshot = snapshot
+        self._changed.set()
+
+    def wait(self, timeout: float) -> Optional[EngineSnapshot]:
+        self._changed.wait(timeout)
+        self._changed.clear()
+        snapshot, self._snapshot = self._snapshot, None
+        return snapshot
+
+
+class PotionDaemon:
+    """Owns the manager and serves control connections, one thread each"""
+
+    def __init__(self, manager: Optional[AdvancedPotionManager] = None, address: Optional[str] = None,
+                 stream_interval: float = 0.1, pipeline: Optional[Pipeline] = None):
+        self.manager = manager or AdvancedPotionManager()
+        self.address = address or default_address()
+        self.pipeline = pipeline  # Started once the control socket is up
+        self.stream_interval = stream_interval  # Max seconds between stream checks for log records
+        self.listener: Optional[Listener] = None
+        self._shutdown = threading.Event()
+
+    # Commands
+
+    def settings(self) -> Dict[str, Any]:
+        settings = self.manager.settings()
+        settings["use_gui_controls"] = self.manager.use_gui_controls
+        for name in SLOT_FLAG_SETTINGS:
+            settings[name] = list(getattr(self.manager, name))
+        return settings
+
+    def apply_settings(self, changes: Dict[str, Any]):
+        """Validate every change first, then apply them all"""
+        coerced = validate_settings({name: value for name, value in changes.items()
+                                     if name != "use_gui_controls" and name not in SLOT_FLAG_SETTINGS})
+        flags = {}
+        for name in SLOT_FLAG_SETTINGS:
+            if name in changes:
+                flags[name] = [bool(v) for v in changes[name]]
+                if len(flags[name]) != len(getattr(self.manager, name)):
+                    raise ConfigError(f"{name} needs one value per slot")
+        if "use_gui_controls" in changes:
+            if not isinstance(changes["use_gui_controls"], bool):
+                raise ConfigError("use_gui_controls must be true or false")
+            coerced["use_gui_controls"] = changes["use_gui_controls"]
+        for name, value in coerced.items():
+            setattr(self.manager, name, value)
+        for name, value in flags.items():
+            getattr(self.manager, name)[:] = value
+        coerced.update(flags)
+        if coerced:
+            self.manager.activity_log.info(f"Settings changed: {', '.join(sorted(coerced))}")
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        engine = self.manager.engine
+        cmd = request.get("cmd")
+        if cmd == "ping":
+            return {"pid": os.getpid(), "running": engine.is_alive()}
+        if cmd == "start":
+            if not engine.is_alive():
+                if not engine.start():
+                    raise RuntimeError("The engine is still stopping; try again")
+                self.manager.activity_log.info("Started monitoring")
+            return {}
+        if cmd == "stop":
+            if engine.is_alive():
+                engine.stop()
+                self.manager.activity_log.info("Stopped monitoring")
+            return {}
+        if cmd == "rescan":
+            engine.rescan()
+            return {}
+        if cmd == "get":
+            return {"settings": self.settings()}
+        if cmd == "set":
+            self.apply_settings(request.get("settings") or {})
+            return {"settings": self.settings()}
+        if cmd == "snapshot":
+            snapshot = engine.latest
+            return {"snapshot": snapshot_to_dict(snapshot) if snapshot is not None else None}
+        if cmd == "log":
+            records = self.manager.activity_log.since(int(request.get("since", 0)), request.get("level", "DEBUG"))
+            return {"records": [asdict(record) for record in records]}
+        if cmd == "shutdown":
+            self.shutdown()
+            return {}
+        raise ValueError(f"Unknown command '{cmd}'")
+
+    # Connections
+
+    def serve_connection(self, conn):
+        try:
+            while not self._shutdown.is_set():
+                request = recv_message(conn)
+                if request.get("cmd") == "subscribe":
+                    level = request.get("level", "INFO")
+                    if level not in LEVELS:
+                        send_message(conn, {"ok": False, "error": f"Unknown log level '{level}'"})
+                        continue
+                    send_message(conn, {"ok": True})
+                    self.stream(conn, _Subscription(level))
+                    return
+                try:
+                    reply = {"ok": True, **self.handle(request)}
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                send_message(conn, reply)
+        except (EOFError, OSError, ValueError):
+            pass  # Client went away (or sent garbage)
+        finally:
+            conn.close()
+
+    def stream(self, conn, subscription: _Subscription):
+        """Send snapshots and new log records until the client disconnects"""
+        engine = self.manager.engine
+        activity_log = self.manager.activity_log
+        subscription.log_seq = activity_log.last_seq
+        engine.subscribe(subscription.push)
+        try:
+            while not self._shutdown.is_set():
+                snapshot = subscription.wait(self.stream_interval)
+                if snapshot is not None:
+                    send_message(conn, {"event": "snapshot", "snapshot": snapshot_to_dict(snapshot)})
+                if activity_log.last_seq != subscription.log_seq:
+                    records = activity_log.since(subscription.log_seq, subscription.level)
+                    subscription.log_seq = activity_log.last_seq
+                    if records:
+                        send_message(conn, {"event": "log", "records": [asdict(record) for record in records]})
+        finally:
+            engine.unsubscribe(subscription.push)
+
+    def _remove_stale_socket(self):
+        if address_family(self.address) != "AF_UNIX" or not os.path.exists(self.address):
+            return
+        try:
+            Client(self.address, family="AF_UNIX").close()
+        except OSError:
+            os.unlink(self.address)  # Left over from a daemon that didn't exit cleanly
+            return
+        raise RuntimeError(f"Another potion daemon is already listening on {self.address}")
+
+    def serve_forever(self, autostart: bool = False):
+        self._remove_stale_socket()
+        family = address_family(self.address)
+        old_umask = os.umask(0o077) if family == "AF_UNIX" else None  # Socket only for this user
+        try:
+            self.listener = Listener(self.address, family=family)
+        finally:
+            if old_umask is not None:
+                os.umask(old_umask)
+        print(f"Potion daemon listening on {self.address}")
+        self.manager.ensure_config_watcher()  # Edits to the settings files apply without a restart
+        if self.pipeline is not None:
+            self.pipeline.start()
+        if autostart:
+            self.manager.engine.start()
+            self.manager.activity_log.info("Started monitoring")
+        try:
+            while not self._shutdown.is_set():
+                conn = self.listener.accept()
+                if self._shutdown.is_set():
+                    conn.close()
+                    break
+                threading.Thread(target=self.serve_connection, args=(conn,), name="DaemonClient",
+                                 daemon=True).start()
+        except KeyboardInterrupt:
+            print("\nStopping potion daemon...")
+        finally:
+            self._shutdown.set()
+            self.manager.stop()
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            self.listener.close()
+            if family == "AF_UNIX" and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    def shutdown(self):
+        """Stop serving; wakes the accept loop with a throwaway connection"""
+        if self._shutdown.is_set():
+            return
+        self._shutdown.set()
+        try:
+            Client(self.address, family=address_family(self.address)).close()
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the potion engine headless with local IPC control")
+    parser.add_argument("--autostart", action="store_true", help="start monitoring immediately")
+    parser.add_argument("--async-engine", action="store_true",
+                        help="run the engine as asyncio tasks instead of one sequential loop")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="capture and send keys from separate processes over shared memory")
+    parser.add_argument("--capture-fps", type=float, default=30.0, help="pipeline capture rate (default: 30)")
+    parser.add_argument("--address", default=None, help=f"control socket/pipe (default: {default_address()})")
+    args = parser.parse_args()
+
+    manager = AdvancedPotionManager()
+    if args.async_engine:
+        manager.engine = AsyncEngineRunner(manager)
+    pipeline = Pipeline(manager, capture_fps=args.capture_fps) if args.pipeline else None
+    daemon = PotionDaemon(manager, address=args.address, pipeline=pipeline)
+    daemon.serve_forever(autostart=args.autostart)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,30 @@
-import cv2
+from startup import STARTUP, lazy_import
 import numpy as np
-import pyautogui
 import time
 import threading
 import os
-import json
 import re
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Set, Tuple
+from typing import Optional, List, Dict, Set, Tuple, Callable
 from enum import Enum
 import platform
 import subprocess
+import colorsys
+import hashlib
+from digit_reader import DigitReader, GlyphAtlas
+from window_focus import FocusProvider, create_focus_provider, Rect
+from poe_process import GameProcessFinder
+from input_dispatch import InputDispatcher
+from activity_log import ActivityLog
+from manager_config import SETTINGS, ConfigWatcher, ManagerConfig, load_config, validate_settings
+from warm_state import SlotState, WarmStateStore, layout_hash
 
-# OCR functionality has been removed
+# Heavy and only needed once capturing starts
+cv2 = lazy_import("cv2")
+pyscreeze = lazy_import("pyscreeze")  # pyautogui's screenshot backend, without pyautogui's Tk message boxes
+
+# General OCR has been removed; exact numbers come from the glyph-atlas digit reader
 
 class PotionCategory(Enum):
     HEALTH = "health"
@@ -45,19 +57,185 @@ class PotionSubtype(Enum):
     
     EMPTY = "empty"
 
-@dataclass
+# Liquid hue ranges (OpenCV hue scale 0-180) used for orb fill detection
+ORB_LIQUID_HUES = {
+    "health": ((0, 10), (170, 180)),
+    "mana": ((100, 130),),
+}
+ORB_MIN_SATURATION = 50
+ORB_MIN_VALUE = 50
+
+# Oldest cached slot capture still used as the pre-press image for verification (seconds)
+PRESS_FRAME_MAX_AGE = 0.5
+
+# Integer codes used by the slot table for category filtering
+CATEGORY_CODES = {
+    PotionCategory.EMPTY: 0,
+    PotionCategory.HEALTH: 1,
+    PotionCategory.MANA: 2,
+    PotionCategory.UTILITY: 3,
+}
+CODE_CATEGORIES = {code: category for category, code in CATEGORY_CODES.items()}
+
+# Per-slot flag bits (GUI controls)
+SLOT_AUTO_USE = 1
+SLOT_INSTANT = 2
+SLOT_ENDURING = 4
+
+class SlotTable:
+    """Struct-of-arrays storage for per-slot state.
+
+    Category filters and cooldown checks are done as vectorized masks over
+    these arrays instead of rebuilding lists of slots every tick.
+    """
+    def __init__(self, size: int = 5):
+        self.size = size
+        self.category = np.zeros(size, dtype=np.int8)
+        self.subtype: List[PotionSubtype] = [PotionSubtype.EMPTY] * size
+        self.hotkey: List[str] = [str(i + 1) for i in range(size)]
+        self.uses = np.zeros(size, dtype=np.int16)
+        self.max_uses = np.zeros(size, dtype=np.int16)
+        self.cooldown = np.zeros(size, dtype=np.float64)
+        self.last_used = np.zeros(size, dtype=np.float64)
+        self.duration = np.zeros(size, dtype=np.float64)
+        self.active_until = np.zeros(size, dtype=np.float64)
+        self.confidence = np.zeros(size, dtype=np.float64)
+        self.flags = np.full(size, SLOT_AUTO_USE, dtype=np.uint8)
+        self.flags_version = 0  # Bumped on every flag change so compiled policies can detect it
+
+    def category_mask(self, category: PotionCategory) -> np.ndarray:
+        """Mask of slots holding a potion of the given category"""
+        return self.category == CATEGORY_CODES[category]
+
+    def available_mask(self, category: PotionCategory) -> np.ndarray:
+        """Mask of slots of the given category that still have uses"""
+        return (self.category == CATEGORY_CODES[category]) & (self.uses > 0)
+
+    def flag_mask(self, flag: int) -> np.ndarray:
+        """Mask of slots with the given flag bit set"""
+        return (self.flags & flag) != 0
+
+    def ready_mask(self, current_time: float, delays) -> np.ndarray:
+        """Mask of slots whose per-slot delay has elapsed since last use"""
+        return (current_time - self.last_used) >= delays
+
+    def get_flag(self, index: int, flag: int) -> bool:
+        return bool(self.flags[index] & flag)
+
+    def set_flag(self, index: int, flag: int, value: bool):
+        if value:
+            self.flags[index] |= flag
+        else:
+            self.flags[index] &= ~np.uint8(flag)
+        self.flags_version += 1
+
+    def pick_fullest(self, mask: np.ndarray) -> Optional[int]:
+        """Index of the masked slot with the most uses (lowest index on ties)"""
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return None
+        return int(candidates[np.argmax(self.uses[candidates])])
+
+def _slot_field(name: str, cast):
+    """Property that reads/writes one column of the slot table"""
+    def getter(self):
+        return cast(getattr(self._table, name)[self._index])
+
+    def setter(self, value):
+        getattr(self._table, name)[self._index] = value
+
+    return property(getter, setter)
+
 class PotionSlot:
-    slot_number: int
-    category: PotionCategory = PotionCategory.EMPTY
-    subtype: PotionSubtype = PotionSubtype.EMPTY
-    hotkey: str = ""
-    uses_remaining: int = 0
-    max_uses: int = 0
-    cooldown: float = 0.0
-    last_used: float = 0.0
-    duration: float = 0.0
-    active_until: float = 0.0
-    confidence: float = 0.0  # Detection confidence
+    """View of a single row of the SlotTable.
+
+    Keeps the attribute interface of the old dataclass so the GUIs can keep
+    reading and writing slot state directly.
+    """
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: SlotTable, index: int):
+        self._table = table
+        self._index = index
+
+    @property
+    def slot_number(self) -> int:
+        return self._index + 1
+
+    @property
+    def category(self) -> PotionCategory:
+        return CODE_CATEGORIES[int(self._table.category[self._index])]
+
+    @category.setter
+    def category(self, value: PotionCategory):
+        self._table.category[self._index] = CATEGORY_CODES[value]
+
+    @property
+    def subtype(self) -> PotionSubtype:
+        return self._table.subtype[self._index]
+
+    @subtype.setter
+    def subtype(self, value: PotionSubtype):
+        self._table.subtype[self._index] = value
+
+    @property
+    def hotkey(self) -> str:
+        return self._table.hotkey[self._index]
+
+    @hotkey.setter
+    def hotkey(self, value: str):
+        self._table.hotkey[self._index] = value
+
+    uses_remaining = _slot_field("uses", int)
+    max_uses = _slot_field("max_uses", int)
+    cooldown = _slot_field("cooldown", float)
+    last_used = _slot_field("last_used", float)
+    duration = _slot_field("duration", float)
+    active_until = _slot_field("active_until", float)
+    confidence = _slot_field("confidence", float)  # Detection confidence
+
+    def __repr__(self):
+        return (f"PotionSlot(slot_number={self.slot_number}, subtype={self.subtype.value}, "
+                f"uses_remaining={self.uses_remaining}/{self.max_uses})")
+
+class SlotFlagView:
+    """List-like view over one flag bit of the slot table.
+
+    Used for slot_auto_use / slot_instant / slot_enduring so the GUIs can keep
+    assigning ``manager.slot_auto_use[i] = value``.
+    """
+    def __init__(self, table: SlotTable, flag: int):
+        self._table = table
+        self._flag = flag
+
+    def __len__(self):
+        return self._table.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("slot index out of range")
+        return self._table.get_flag(index, self._flag)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            for i, v in zip(range(*index.indices(len(self))), value):
+                self[i] = v
+            return
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("slot index out of range")
+        self._table.set_flag(index, self._flag, bool(value))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return repr(list(self))
 
 @dataclass
 class ActiveEffect:
@@ -66,6 +244,30 @@ class ActiveEffect:
     expires_at: float
     progress_bar_region: tuple = None
 
+@dataclass
+class PendingPress:
+    """A flask press waiting to be confirmed against the slot's pre-press image"""
+    slot_index: int
+    hotkey: str
+    before_slot: Optional[np.ndarray]
+    before_progress: Optional[np.ndarray]
+    queued_at: float
+    sent_at: Optional[float] = None
+
+@dataclass
+class PressReservation:
+    """Flask uses booked under the state lock whose keys are not queued yet
+
+    Keeps what the booking replaced, so a use whose key the dispatcher
+    refuses can be taken back.
+    """
+    time: float
+    slots: List["PotionSlot"]
+    replaced: List[Tuple[float, int, float]]  # Each slot's (last_used, uses_remaining, active_until) before
+    kinds: Dict[int, str] = field(default_factory=dict)  # "health"/"mana" by slot index, for engine actions
+    flask_times: Dict[str, float] = field(default_factory=dict)  # last_flask_time entries before, by kind
+    health_time: Optional[float] = None  # Shared health cooldown before, if a health flask was booked
+
 @dataclass
 class GameState:
     health_percentage: float = 100.0
@@ -76,31 +278,623 @@ class GameState:
     mana_max: Optional[int] = None
     active_effects: List[ActiveEffect] = field(default_factory=list)
 
+@dataclass(frozen=True)
+class ProbeSet:
+    """Screen probe points with their reference colors, ordered bottom to top.
+
+    All probes are read from one small capture covering their bounding box.
+    """
+    region: Tuple[int, int, int, int]  # Capture rectangle covering every probe
+    rows: np.ndarray                   # Probe rows relative to the region
+    cols: np.ndarray                   # Probe columns relative to the region
+    colors: np.ndarray                 # Reference colors (BGR, float32)
+
+    @classmethod
+    def from_points(cls, points, colors) -> Optional["ProbeSet"]:
+        """Build a probe set from screen points and RGB reference colors"""
+        if not points or not colors or len(points) != len(colors):
+            return None
+        xy = np.array([tuple(p)[:2] for p in points], dtype=np.int32)
+        left, top = xy.min(axis=0)
+        right, bottom = xy.max(axis=0)
+        region = (int(left), int(top), int(right - left + 1), int(bottom - top + 1))
+        rgb = np.array([tuple(c)[:3] for c in colors], dtype=np.float32)
+        return cls(region=region,
+                   rows=xy[:, 1] - top,
+                   cols=xy[:, 0] - left,
+                   colors=rgb[:, ::-1].copy())
+
+    def __len__(self):
+        return len(self.rows)
+
+class ResourceTrend:
+    """Exponentially smoothed level and derivative of a resource reading (Holt's method)"""
+    def __init__(self, alpha: float = 0.5, beta: float = 0.3):
+        self.alpha = alpha  # Level smoothing
+        self.beta = beta    # Derivative smoothing
+        self.reset()
+
+    def reset(self):
+        self.level: Optional[float] = None
+        self.slope = 0.0  # Percent per second
+        self.last_time = 0.0
+
+    def update(self, value: float, timestamp: float):
+        if self.level is None:
+            self.level = value
+            self.last_time = timestamp
+            return
+        dt = timestamp - self.last_time
+        if dt <= 0:
+            return
+        predicted = self.level + self.slope * dt
+        level = self.alpha * value + (1 - self.alpha) * predicted
+        self.slope = self.beta * (level - self.level) / dt + (1 - self.beta) * self.slope
+        self.level = level
+        self.last_time = timestamp
+
+    def project(self, seconds_ahead: float) -> Optional[float]:
+        """Projected reading after the given look-ahead"""
+        if self.level is None:
+            return None
+        return self.level + self.slope * seconds_ahead
+
+@dataclass(frozen=True)
+class Observation:
+    """Immutable snapshot of everything the flask policy looks at in one tick"""
+    timestamp: float
+    health_percentage: float
+    mana_percentage: float
+    progress_active: Tuple[bool, ...] = ()  # Per slot; False where not sampled
+    health_exact: bool = False  # True when health is a measured fill level, not a full/not-full signal
+    mana_exact: bool = False
+    health_projected: Optional[float] = None  # Trend projection over the look-ahead window
+    mana_projected: Optional[float] = None
+
+@dataclass(frozen=True)
+class FlaskAction:
+    """A flask press decided by the policy"""
+    slot_index: int
+    category: PotionCategory
+    reason: str = ""
+
+@dataclass(frozen=True)
+class FlaskPolicy:
+    """Flask policy rules compiled from the manager settings into per-slot tables.
+
+    Rebuilt only when a policy setting or a slot flag changes, so the decision
+    engine never re-derives them on the hot path.
+    """
+    auto_use: np.ndarray        # Slots the policy may press
+    health_delay: np.ndarray    # Per-slot health cooldown (instant vs normal)
+    min_health_gap: float       # Shared cooldown between any two health flasks
+    enduring: np.ndarray        # Mana slots kept up via their progress bar
+    mana_delay: float
+    health_threshold: float = 50.0
+    mana_threshold: float = 30.0
+    flags_version: int = 0
+
+    @classmethod
+    def compile(cls, manager: "AdvancedPotionManager") -> "FlaskPolicy":
+        table = manager.slot_table
+        if manager.use_gui_controls:
+            auto_use = table.flag_mask(SLOT_AUTO_USE)
+            health_delay = np.where(table.flag_mask(SLOT_INSTANT),
+                                    manager.instant_potion_delay, manager.health_potion_delay)
+            enduring = table.flag_mask(SLOT_ENDURING)
+        else:
+            auto_use = np.ones(table.size, dtype=bool)
+            health_delay = np.full(table.size, manager.health_potion_delay)
+            enduring = np.zeros(table.size, dtype=bool)
+        for array in (auto_use, health_delay, enduring):
+            array.flags.writeable = False
+        return cls(auto_use=auto_use,
+                   health_delay=health_delay,
+                   min_health_gap=manager.instant_potion_delay,
+                   enduring=enduring,
+                   mana_delay=manager.mana_potion_delay,
+                   health_threshold=manager.health_threshold,
+                   mana_threshold=manager.mana_threshold,
+                   flags_version=table.flags_version)
+
+@dataclass(frozen=True)
+class CompiledLayout:
+    """Capture structures derived from the screen layout settings
+
+    Rebuilt only when a layout attribute is assigned (by a config reload or
+    the setup tab), so detection never rebuilds probe sets per tick.
+    """
+    health_pixel_probe: Optional[ProbeSet]
+    mana_pixel_probe: Optional[ProbeSet]
+    capture_bounds: Optional[Rect]  # Smallest rectangle covering every captured region
+    slot_layout_hash: bytes         # Identifies the slot layout in the warm-start state
+
+    @classmethod
+    def compile(cls, manager: "AdvancedPotionManager") -> "CompiledLayout":
+        pixel_probes = {}
+        for kind in ("health", "mana"):
+            point, color = getattr(manager, f"{kind}_pixel_point"), getattr(manager, f"{kind}_pixel_color")
+            pixel_probes[kind] = ProbeSet.from_points([point], [color]) if point and color else None
+        
+        regions = [*manager.slot_regions, *manager.slot_progress_regions,
+                   manager.health_bar_region, manager.mana_bar_region,
+                   manager.health_number_region, manager.mana_number_region,
+                   manager.health_orb_column, manager.mana_orb_column]
+        for probes in (manager.health_probes, manager.mana_probes):
+            if probes:
+                regions.append(probes.region)
+        for point in (manager.health_pixel_point, manager.mana_pixel_point):
+            if point:
+                regions.append((point[0], point[1], 1, 1))
+        regions = [tuple(int(v) for v in region) for region in regions if region]
+        bounds = None
+        if regions:
+            left = min(x for x, _, _, _ in regions)
+            top = min(y for _, y, _, _ in regions)
+            right = max(x + w for x, _, w, _ in regions)
+            bottom = max(y + h for _, y, _, h in regions)
+            bounds = (left, top, right - left, bottom - top)
+        return cls(health_pixel_probe=pixel_probes["health"],
+                   mana_pixel_probe=pixel_probes["mana"],
+                   capture_bounds=bounds,
+                   slot_layout_hash=layout_hash(manager.slot_regions, manager.coordinate_space))
+
+class DecisionEngine:
+    """Turns one observation plus the slot table into flask actions in a single pass"""
+
+    def decide_health(self, observation: Observation, table: SlotTable, policy: FlaskPolicy,
+                      last_health_potion_time: float) -> Optional[FlaskAction]:
+        """Health rule only: shared cooldown plus per-slot cooldown, fullest flask first"""
+        # Thresholds only apply to measured fill levels; binary detectors mean "not full"
+        health_trigger = policy.health_threshold if observation.health_exact else 100.0
+        
+        # Fire early when the trend projects a crossing within the look-ahead window
+        health = observation.health_percentage
+        if observation.health_exact and observation.health_projected is not None:
+            health = min(health, observation.health_projected)
+        if health >= health_trigger:
+            return None
+        
+        now = observation.timestamp
+        since_last_health = now - last_health_potion_time
+        if since_last_health < policy.min_health_gap:
+            return None
+        usable = table.available_mask(PotionCategory.HEALTH) & policy.auto_use
+        usable &= table.ready_mask(now, policy.health_delay)
+        usable &= since_last_health >= policy.health_delay
+        index = table.pick_fullest(usable)
+        if index is None:
+            return None
+        return FlaskAction(index, PotionCategory.HEALTH, "health below threshold")
+
+    def decide(self, observation: Observation, table: SlotTable, policy: FlaskPolicy,
+               last_health_potion_time: float, include_health: bool = True) -> List[FlaskAction]:
+        actions: List[FlaskAction] = []
+        now = observation.timestamp
+        progress = np.zeros(table.size, dtype=bool)
+        progress[:len(observation.progress_active)] = observation.progress_active[:table.size]
+
+        if include_health:
+            action = self.decide_health(observation, table, policy, last_health_potion_time)
+            if action is not None:
+                actions.append(action)
+
+        mana_trigger = policy.mana_threshold if observation.mana_exact else 100.0
+        mana = observation.mana_percentage
+        if observation.mana_exact and observation.mana_projected is not None:
+            mana = min(mana, observation.mana_projected)
+
+        # Mana: progress bar for enduring flasks, per-slot cooldown otherwise
+        if mana < mana_trigger:
+            usable = table.available_mask(PotionCategory.MANA) & policy.auto_use
+            ready = np.where(policy.enduring, ~progress,
+                             table.ready_mask(now, policy.mana_delay))
+            index = table.pick_fullest(usable & ready)
+            if index is not None:
+                actions.append(FlaskAction(index, PotionCategory.MANA, "mana below threshold"))
+
+        # Utility: keep each buff type up, using the first ready slot of that type
+        utility = table.category_mask(PotionCategory.UTILITY)
+        active_types = {table.subtype[i] for i in np.flatnonzero(utility & progress)}
+        handled = set()
+        for i in np.flatnonzero(utility & (table.uses > 0) & policy.auto_use):
+            subtype = table.subtype[i]
+            if subtype == PotionSubtype.EMPTY or subtype in active_types or subtype in handled:
+                continue
+            handled.add(subtype)
+            actions.append(FlaskAction(int(i), PotionCategory.UTILITY, "buff expired"))
+
+        return actions
+
+class HealthWatchdog(threading.Thread):
+    """Samples only health at a fixed high rate and fires the health flask itself.
+
+    While it runs, the main loop reads health from the watchdog's latest
+    sample instead of measuring it, and leaves health flasks to the watchdog,
+    so emergency latency does not depend on how heavy the rest of a tick is.
+    It never takes the manager's state_lock (the main loop holds it while
+    deciding): it only reads the slot table, gates itself on its own last
+    press, and hands each press to the main loop through
+    manager.watchdog_presses, which books the use under the lock.
+    """
+    def __init__(self, manager: "AdvancedPotionManager", rate_hz: float = 50.0):
+        super().__init__(name="HealthWatchdog", daemon=True)
+        self.manager = manager
+        self.interval = 1.0 / rate_hz
+        self.latest: Optional[Observation] = None  # Replaced wholesale, never mutated
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_tick = time.perf_counter()
+        while not self._stop_event.is_set():
+            try:
+                self.latest = self.manager.health_watchdog_tick()
+            except Exception as e:
+                print(f"Health watchdog error: {e}")
+            
+            # Fixed-rate schedule; skip missed ticks instead of bursting
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay < 0:
+                next_tick = time.perf_counter()
+                delay = 0
+            self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
+
+def grab_screen(region) -> np.ndarray:
+    """Screenshot of a desktop (x, y, width, height) region as a BGR image"""
+    screenshot = pyscreeze.screenshot(region=region)
+    return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+
+@dataclass(frozen=True)
+class SlotSnapshot:
+    slot_number: int
+    subtype: PotionSubtype
+    category: PotionCategory
+    uses_remaining: int
+    max_uses: int
+    last_used: float
+    active_until: float
+    confidence: float
+    progress_active: bool
+    frame: Optional[np.ndarray] = field(default=None, compare=False, repr=False)  # Latest capture (BGR)
+    frame_hash: Optional[bytes] = None
+
+@dataclass(frozen=True)
+class EngineSnapshot:
+    """Immutable engine state published to subscribers (GUIs, status line)"""
+    timestamp: float
+    tick: int
+    running: bool
+    idle: bool  # Blocked waiting for the game to be focused
+    focused: bool
+    health_percentage: float
+    mana_percentage: float
+    slots: Tuple[SlotSnapshot, ...]
+    scan_count: int  # Bumped whenever slots were (re)scanned
+    error_count: int = 0
+    last_error: Optional[str] = None
+
+class EngineRunner:
+    """The one monitoring loop: focus/idle handling, detection, rescans, potions
+
+    Runs either on the caller's thread (run) or on its own (start). After each
+    tick it publishes an EngineSnapshot to subscribers, at most publish_rate
+    times per second; rescans, idle transitions and stopping always publish.
+    Subscriber callbacks run on the engine thread and must not block.
+    """
+
+    def __init__(self, manager: "AdvancedPotionManager", tick_interval: float = 0.1,
+                 publish_rate: float = 10.0):
+        self.manager = manager
+        self.tick_interval = tick_interval
+        self.publish_rate = publish_rate
+        self.running = False
+        self.latest: Optional[EngineSnapshot] = None
+        self.tick_count = 0
+        self.scan_count = 0
+        self.error_count = 0
+        self.last_error: Optional[str] = None
+        self._idle = False
+        self._capture_lost = False  # Frame source had no fresh frames on the last tick
+        self._last_publish = 0.0
+        self._subscribers: List[Callable[[EngineSnapshot], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._rescan_thread: Optional[threading.Thread] = None  # Rescan requested while stopped
+
+    def subscribe(self, callback: Callable[[EngineSnapshot], None]):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        if self.latest is not None:
+            callback(self.latest)
+
+    def unsubscribe(self, callback: Callable[[EngineSnapshot], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Run the engine on a background thread; False if the previous one is still stopping"""
+        if self.is_alive():
+            self.running = False
+            self._thread.join(timeout=3)
+            if self._thread.is_alive():
+                self.manager.activity_log.error("The engine is still stopping - not starting a second one")
+                return False
+        self.running = True
+        self._thread = threading.Thread(target=self.run, name="PotionEngine", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the background engine thread to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def rescan(self):
+        """Rescan all slots: on the next tick if running, otherwise on a worker thread"""
+        if self.running:
+            self.manager.last_scan_time = 0.0
+            return
+        if self._rescan_thread is not None and self._rescan_thread.is_alive():
+            return  # One is already under way
+        self._rescan_thread = threading.Thread(target=self._rescan_stopped, name="EngineRescan", daemon=True)
+        self._rescan_thread.start()
+
+    def _rescan_stopped(self):
+        try:
+            self.manager.scan_all_slots()
+            self.manager.persist_state(force=True)
+            self.scan_count += 1
+        except Exception as e:
+            self.error_count += 1
+            self.last_error = str(e)
+            self.manager.activity_log.error(f"Rescan failed: {e}")
+        self.publish(force=True)
+
+    def initial_scan(self):
+        """First scan of a session, warm-started from the saved state (run() does its own)"""
+        if self.running:
+            return
+        self.manager.initial_scan()
+        self.scan_count += 1
+        self.publish(force=True)
+
+    def run(self):
+        """Monitor until stop() (or Ctrl+C) on the calling thread"""
+        manager = self.manager
+        self.running = True
+        if self._rescan_thread is not None:
+            self._rescan_thread.join()  # A rescan requested while stopped finishes first
+        manager.wait_for_templates()  # Progress bar detection needs them too
+        manager.ensure_focus_provider()  # Resolve the game window before the first capture
+        manager.ensure_input_dispatcher()
+        manager.ensure_config_watcher()
+        if manager.last_scan_time == 0.0:
+            manager.initial_scan()
+            self.scan_count += 1
+        manager.start_health_watchdog()
+        try:
+            while self.running:
+                try:
+                    self.tick()
+                except KeyboardInterrupt:
+                    print("\nStopping potion manager...")
+                    break
+                except Exception as e:
+                    self.error_count += 1
+                    self.last_error = str(e)
+                    print(f"Error in main loop: {e}")
+                    manager.activity_log.error(f"Error in main loop: {e}")
+                    time.sleep(1)
+        finally:
+            self.running = False
+            manager.stop_health_watchdog()
+            manager.stop_input_dispatcher()
+            manager.persist_state(force=True)
+            self.publish(force=True)
+
+    def tick(self):
+        manager = self.manager
+        if manager.pending_config is not None:
+            manager.apply_pending_config()  # Reloaded settings land between ticks, all at once
+        
+        # Block in idle mode while the game is not focused
+        if manager.require_window_focus and not manager.check_window_focus():
+            self._idle = True
+            self.publish(force=True)
+            resumed = manager.idle_until_focused(lambda: self.running)
+            self._idle = False
+            if resumed:
+                self.scan_count += 1  # Warm-start rescan
+                self.publish(force=True)
+            return
+        
+        # No fresh frames: decide nothing until capture is back
+        if not manager.capture_ready():
+            if not self._capture_lost:
+                self._capture_lost = True
+                print("\nNo fresh frames from the capture process - waiting")
+                manager.activity_log.error("No fresh frames from the capture process - waiting")
+                self.publish(force=True)
+            time.sleep(0.5)
+            return
+        if self._capture_lost:
+            self._capture_lost = False
+            manager.activity_log.info("Frames are coming in again - resuming")
+        
+        current_time = time.time()
+        manager.update_game_state()
+        
+        # Rescan slots periodically (presses are verified individually)
+        rescanned = current_time - manager.last_scan_time > manager.full_rescan_interval
+        if rescanned:
+            manager.scan_all_slots()
+            manager.last_scan_time = current_time
+            self.scan_count += 1
+        
+        manager.process_potions()
+        manager.persist_state()
+        self.tick_count += 1
+        self.publish(force=rescanned)
+        time.sleep(self.tick_interval)
+
+    def snapshot(self) -> EngineSnapshot:
+        manager = self.manager
+        observation = manager.last_observation
+        progress = observation.progress_active if observation is not None else ()
+        frames = manager.slot_frames
+        slots = tuple(SlotSnapshot(slot.slot_number, slot.subtype, slot.category, slot.uses_remaining,
+                                   slot.max_uses, slot.last_used, slot.active_until, slot.confidence,
+                                   i < len(progress) and progress[i], *(frames[i] or (None, None)))
+                      for i, slot in enumerate(manager.slots))
+        return EngineSnapshot(time.time(), self.tick_count, self.running, self._idle,
+                              manager.poe_window_focused or not manager.require_window_focus,
+                              manager.game_state.health_percentage, manager.game_state.mana_percentage,
+                              slots, self.scan_count, self.error_count, self.last_error)
+
+    def publish(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last_publish < 1.0 / self.publish_rate:
+            return
+        self._last_publish = now
+        self.latest = snapshot = self.snapshot()
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Snapshot subscriber error: {e}")
+
+def _compiled_input(name: str, cache: str):
+    """Property whose assignment drops a compiled cache (the cache attribute is set to None)"""
+    field_name = "_" + name
+
+    def getter(self):
+        return getattr(self, field_name)
+
+    def setter(self, value):
+        setattr(self, field_name, value)
+        setattr(self, cache, None)
+
+    return property(getter, setter)
+
 class AdvancedPotionManager:
     # Make enums accessible for GUI
     PotionSubtype = PotionSubtype
     PotionCategory = PotionCategory
     
-    def __init__(self):
+    # Settings compiled into the FlaskPolicy; assigning one invalidates it
+    use_gui_controls = _compiled_input("use_gui_controls", "_flask_policy")
+    health_potion_delay = _compiled_input("health_potion_delay", "_flask_policy")
+    instant_potion_delay = _compiled_input("instant_potion_delay", "_flask_policy")
+    mana_potion_delay = _compiled_input("mana_potion_delay", "_flask_policy")
+    health_threshold = _compiled_input("health_threshold", "_flask_policy")
+    mana_threshold = _compiled_input("mana_threshold", "_flask_policy")
+    
+    # Screen layout compiled into the CompiledLayout; assigning one invalidates it
+    slot_regions = _compiled_input("slot_regions", "_compiled_layout")
+    slot_progress_regions = _compiled_input("slot_progress_regions", "_compiled_layout")
+    health_bar_region = _compiled_input("health_bar_region", "_compiled_layout")
+    mana_bar_region = _compiled_input("mana_bar_region", "_compiled_layout")
+    health_number_region = _compiled_input("health_number_region", "_compiled_layout")
+    mana_number_region = _compiled_input("mana_number_region", "_compiled_layout")
+    health_pixel_point = _compiled_input("health_pixel_point", "_compiled_layout")
+    mana_pixel_point = _compiled_input("mana_pixel_point", "_compiled_layout")
+    health_pixel_color = _compiled_input("health_pixel_color", "_compiled_layout")
+    mana_pixel_color = _compiled_input("mana_pixel_color", "_compiled_layout")
+    health_probes = _compiled_input("health_probes", "_compiled_layout")
+    mana_probes = _compiled_input("mana_probes", "_compiled_layout")
+    health_orb_column = _compiled_input("health_orb_column", "_compiled_layout")
+    mana_orb_column = _compiled_input("mana_orb_column", "_compiled_layout")
+    coordinate_space = _compiled_input("coordinate_space", "_compiled_layout")
+    
+    def __init__(self, load_templates: bool = True):
+        """load_templates=False leaves template loading to load_templates_async()
+        so a GUI can show its window first"""
+        self._flask_policy = None
+        self._compiled_layout = None
+        self.activity_log = ActivityLog()  # Fed from any thread, shown by the GUIs
+        
+        # Tunables, typed and range-checked (see manager_config.SETTINGS)
+        for name, setting in SETTINGS.items():
+            setattr(self, name, setting.default)
+        self.config = ManagerConfig()  # Last config read from the settings files
+        self.pending_config: Optional[ManagerConfig] = None  # Reload waiting for the engine to swap it in
+        self._config_lock = threading.Lock()
+        self.config_watcher: Optional[ConfigWatcher] = None
+        
+        self.decision_engine = DecisionEngine()
+        self.last_observation: Optional[Observation] = None
+        self.slot_table = SlotTable(5)
         self.slots: List[PotionSlot] = []
         self.game_state = GameState()
-        self.health_threshold = 50.0
-        self.mana_threshold = 30.0
         self.running = False
         
         # GUI control settings
         self.use_gui_controls = False
-        self.slot_auto_use = [True, True, True, True, True]  # Which slots to auto-use
-        self.slot_instant = [False, False, False, False, False]  # Which slots are instant
-        self.slot_enduring = [False, False, False, False, False]  # Which slots are enduring mana
-        self.health_potion_delay = 2.0  # Default 2 second delay for health potions
-        self.instant_potion_delay = 0.3  # 0.3 second delay for instant potions
-        self.mana_potion_delay = 3.0  # Default 3 second delay for mana potions
+        self.slot_auto_use = SlotFlagView(self.slot_table, SLOT_AUTO_USE)  # Which slots to auto-use
+        self.slot_instant = SlotFlagView(self.slot_table, SLOT_INSTANT)  # Which slots are instant
+        self.slot_enduring = SlotFlagView(self.slot_table, SLOT_ENDURING)  # Which slots are enduring mana
         self.last_health_potion_time = 0  # Track last health potion use (shared cooldown)
         
+        # Trend prediction (fire before a damage spike crosses the threshold)
+        self.health_trend = ResourceTrend()
+        self.mana_trend = ResourceTrend()
+        self._prediction_window = {"health": None, "mana": None}  # (made at, deadline) of an unscored prediction
+        self.last_flask_time = {"health": 0.0, "mana": 0.0}  # Last health/mana press, for prediction scoring
+        
+        # High-frequency health watchdog (emergency path)
+        self.health_watchdog: Optional[HealthWatchdog] = None
+        # Health presses the watchdog made, as (slot index, time, pending press); the watchdog only
+        # appends and the main loop only pops, so neither waits on the other
+        self.watchdog_presses = deque()
+        self.watchdog_health_time = 0.0  # The watchdog's last press (written by the watchdog only)
+        # Held while slot state, cooldowns or pending presses change (main loop vs GUI and
+        # rescans); screen captures and key presses happen outside it
+        self.state_lock = threading.RLock()
+        
+        # Key presses are sent from a dispatch thread, never the monitor loop
+        self.dispatcher_factory: Optional[Callable[[], InputDispatcher]] = None  # Replaces the local dispatcher
+        
+        # Press verification (targeted slot diff instead of blind decrements)
+        self.pending_presses: Dict[str, PendingPress] = {}  # By hotkey
+        
+        # Latest (read-only frame, hash) captured per slot, reused for GUI previews
+        self.slot_frames: List[Optional[Tuple[np.ndarray, bytes]]] = [None] * self.slot_table.size
+        self.slot_frame_times: List[float] = [0.0] * self.slot_table.size  # perf_counter of each capture
+        
+        # Slot state saved for the next start (slots whose frame hash still matches skip detection)
+        self.state_store = WarmStateStore(self.slot_table.size)
+        self._last_state_save = 0.0
+        
+        # The shared monitoring loop; GUIs pull its latest snapshot
+        self.engine = EngineRunner(self)
+        self.input_dispatcher: Optional[InputDispatcher] = None
+        self.stats = {
+            "health_prediction_hits": 0,
+            "health_prediction_misses": 0,
+            "health_prediction_preempted": 0,
+            "mana_prediction_hits": 0,
+            "mana_prediction_misses": 0,
+            "mana_prediction_preempted": 0,
+        }
+        
         # Window focus detection
-        self.require_window_focus = True  # Only watch potions when Path of Exile is focused
         self.poe_window_focused = False
+        self.focus_provider: Optional[FocusProvider] = None  # Event-driven focus cache
+        self.process_finder = GameProcessFinder()  # Cached game PID for focus matching
+        self.window_rect: Optional[Rect] = None  # Game client area, updated on geometry events
+        self.coordinate_space = "desktop"  # "window": config regions are relative to window_rect
+        self.frame_source: Optional[Callable[[Rect], np.ndarray]] = None  # Replaces screen grabs (pipeline mode)
+        self.frame_source_ready: Optional[Callable[[], bool]] = None  # False while frame_source has no fresh frames
+        self.last_scan_time = 0.0
         
         # Screen regions (adjust these for your game)
         self.health_bar_region = (100, 50, 200, 20)
@@ -109,7 +903,13 @@ class AdvancedPotionManager:
         self.mana_pixel_point = None     # For pixel detection
         self.health_pixel_color = None   # Full health color
         self.mana_pixel_color = None     # Full mana color
-        self.pixel_color_tolerance = 50  # Color difference tolerance (increase if needed)
+        self.health_number_region = None # "current/max" text for the digit reader
+        self.mana_number_region = None
+        self._last_number_read = 0.0
+        self.health_probes: Optional[ProbeSet] = None  # Multi-point probes along the health orb
+        self.mana_probes: Optional[ProbeSet] = None    # Multi-point probes along the mana orb
+        self.health_orb_column = None    # 1-pixel-wide region through the health liquid (setup tool)
+        self.mana_orb_column = None      # 1-pixel-wide region through the mana liquid (setup tool)
         
         # Potion slot regions (will be loaded from config if available)
         self.slot_regions = [
@@ -123,8 +923,10 @@ class AdvancedPotionManager:
         # Template storage
         self.full_templates = {}  # Full potion templates
         self.empty_templates = {} # Empty potion templates
+        self.excluded_template_paths = set()  # Template files slot detection skips (leave-one-out benchmarks)
         self.progress_bar_templates = {}  # Empty progress bar templates
         self.slot_progress_regions = []  # Progress bar regions for each slot
+        self.templates_ready = threading.Event()  # Set once every template is loaded
         
         # Potion configurations
         self.potion_configs = self.setup_potion_configs()
@@ -132,11 +934,65 @@ class AdvancedPotionManager:
         # Initialize slots
         self.setup_slots()
         
-        # Try to load configuration from setup tool
-        self.load_setup_config()
+        # Load the settings files (setup tool layout and general settings)
+        with STARTUP.phase("config"):
+            self.load_setup_config()
+        
+        # Digit reader for the health/mana numbers; its atlas (learned by the setup tool) loads with the templates
+        self.digit_reader = DigitReader(GlyphAtlas())
         
         # Load templates
-        self.load_all_templates()
+        if load_templates:
+            self.load_templates()
+
+    @property
+    def debug(self) -> bool:
+        return self._debug
+
+    @debug.setter
+    def debug(self, value: bool):
+        self._debug = value
+        self.activity_log.echo_debug = value
+
+    @property
+    def potion_cooldown(self) -> int:
+        """Minimum ms between two presses of the same flask key
+
+        This is the input dispatcher's per-key spacing; presses of other keys
+        are not held back by it (health_potion_delay and friends space a
+        flask's uses).
+        """
+        return self._potion_cooldown
+
+    @potion_cooldown.setter
+    def potion_cooldown(self, value: int):
+        self._potion_cooldown = value
+        dispatcher = getattr(self, "input_dispatcher", None)  # Not created yet during __init__
+        if dispatcher is not None and self.dispatcher_factory is None:
+            dispatcher.min_key_spacing = self.min_key_spacing
+
+    @property
+    def min_key_spacing(self) -> float:
+        """Seconds between presses of the same key (the potion_cooldown setting)"""
+        return self.potion_cooldown / 1000.0
+
+    @property
+    def compiled_layout(self) -> CompiledLayout:
+        """Probe sets and capture bounds, rebuilt only after a layout attribute changed"""
+        layout = self._compiled_layout
+        if layout is None:
+            layout = CompiledLayout.compile(self)
+            self._compiled_layout = layout
+        return layout
+
+    @property
+    def flask_policy(self) -> FlaskPolicy:
+        """Compiled flask policy, rebuilt only after a setting or slot flag changed"""
+        policy = self._flask_policy
+        if policy is None or policy.flags_version != self.slot_table.flags_version:
+            policy = FlaskPolicy.compile(self)
+            self._flask_policy = policy
+        return policy
 
     def setup_potion_configs(self) -> Dict[PotionSubtype, dict]:
         """Define configurations for each potion subtype"""
@@ -257,73 +1113,85 @@ class AdvancedPotionManager:
         }
 
     def setup_slots(self):
-        """Initialize empty slots"""
-        self.slots = [
-            PotionSlot(slot_number=i+1, hotkey=str(i+1))
-            for i in range(5)
-        ]
+        """Initialize empty slots (views over the slot table)"""
+        self.slots = [PotionSlot(self.slot_table, i) for i in range(self.slot_table.size)]
     
     def load_setup_config(self):
-        """Load configuration from the setup tool if available"""
-        # Try loading from settings folder first
-        config_file = os.path.join("settings", "potion_manager_config.json")
-        if not os.path.exists(config_file):
-            # Try old location for backward compatibility
-            config_file = "potion_manager_config.json"
-        
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, "r") as f:
-                    config = json.load(f)
-                
-                # Load slot regions if available
-                if "slot_regions" in config and config["slot_regions"]:
-                    valid_regions = [r for r in config["slot_regions"] if r is not None]
-                    if valid_regions:
-                        self.slot_regions = valid_regions
-                        print(f"Loaded {len(valid_regions)} slot regions from config")
-                
-                # Load health bar region
-                if "health_bar_region" in config and config["health_bar_region"]:
-                    self.health_bar_region = tuple(config["health_bar_region"])
-                    print("Loaded health bar region from config")
-                
-                # Load mana bar region
-                if "mana_bar_region" in config and config["mana_bar_region"]:
-                    self.mana_bar_region = tuple(config["mana_bar_region"])
-                    print("Loaded mana bar region from config")
-                
-                # Load pixel detection settings
-                if "health_pixel_point" in config and config["health_pixel_point"]:
-                    self.health_pixel_point = tuple(config["health_pixel_point"])
-                    print("Loaded health pixel point from config")
-                    
-                if "health_pixel_color" in config and config["health_pixel_color"]:
-                    self.health_pixel_color = tuple(config["health_pixel_color"])
-                    print(f"Loaded health pixel color: RGB{self.health_pixel_color}")
-                    
-                if "mana_pixel_point" in config and config["mana_pixel_point"]:
-                    self.mana_pixel_point = tuple(config["mana_pixel_point"])
-                    print("Loaded mana pixel point from config")
-                    
-                if "mana_pixel_color" in config and config["mana_pixel_color"]:
-                    self.mana_pixel_color = tuple(config["mana_pixel_color"])
-                    print(f"Loaded mana pixel color: RGB{self.mana_pixel_color}")
-                
-                # Load progress bar regions
-                if "slot_progress_bars" in config and config["slot_progress_bars"]:
-                    valid_progress = [r for r in config["slot_progress_bars"] if r is not None]
-                    if valid_progress:
-                        self.slot_progress_regions = valid_progress
-                        print(f"Loaded {len(valid_progress)} progress bar regions from config")
-                        # Load progress bar templates
-                        self.load_progress_templates()
-                
-                print("Configuration loaded successfully from setup tool")
-            except Exception as e:
-                print(f"Failed to load config from {config_file}: {e}")
-        else:
-            print(f"No config file found at {config_file}, using default regions")
+        """Load the setup tool's screen layout and the general settings, if present"""
+        config = load_config()
+        for error in config.errors:
+            print(f"Failed to load config: {error}")
+            self.activity_log.warning(f"Failed to load config: {error}")
+        if not config.layout.get("slot_regions"):
+            print("No setup config found, using default regions")
+        self.apply_config(config)
+        
+        layout = config.layout
+        if self.coordinate_space == "window":
+            print("Config regions are relative to the game window")
+        for name, label in (("slot_regions", "slot regions"), ("slot_progress_regions", "progress bar regions")):
+            if name in layout:
+                print(f"Loaded {len(layout[name])} {label} from config")
+        for probes, kind in ((self.health_probes, "health"), (self.mana_probes, "mana")):
+            if probes:
+                print(f"Loaded {len(probes)} {kind} probes from config")
+        if config.settings:
+            print(f"Loaded {len(config.settings)} general settings")
+
+    def apply_config(self, config: ManagerConfig):
+        """Apply a validated config (or the changed part of one) right away
+
+        While the engine runs, use submit_config() instead so the change lands
+        between two ticks.
+        """
+        for name, value in config.settings.items():
+            setattr(self, name, value)
+        layout = dict(config.layout)
+        for kind in ("health", "mana"):
+            points, colors = layout.pop(f"{kind}_probe_points", None), layout.pop(f"{kind}_probe_colors", None)
+            if points and colors:
+                setattr(self, f"{kind}_probes", ProbeSet.from_points(points, colors))
+        for name, value in layout.items():
+            setattr(self, name, value)
+        self.config = self.config.merged(config)
+
+    def submit_config(self, config: ManagerConfig):
+        """Hand over a reloaded config; a running engine swaps it in at its next tick"""
+        with self._config_lock:
+            if self.engine.running:
+                self.pending_config = config if self.pending_config is None else self.pending_config.merged(config)
+                return
+        self.apply_config(config)
+
+    def apply_pending_config(self):
+        """Engine side of submit_config(): apply a waiting config in one step"""
+        with self._config_lock:
+            config, self.pending_config = self.pending_config, None
+        if config is not None:
+            self.apply_config(config)
+
+    def settings(self) -> Dict[str, object]:
+        """Current value of every tunable in manager_config.SETTINGS"""
+        return {name: getattr(self, name) for name in SETTINGS}
+
+    def update_settings(self, changes: Dict[str, object]) -> Dict[str, object]:
+        """Validate every change first, then apply them all; returns the coerced values"""
+        coerced = validate_settings(changes)
+        for name, value in coerced.items():
+            setattr(self, name, value)
+        return coerced
+
+    def ensure_config_watcher(self) -> ConfigWatcher:
+        """Start reloading the settings files when they change, if not already"""
+        if self.config_watcher is None or not self.config_watcher.is_alive():
+            self.config_watcher = ConfigWatcher(self)
+            self.config_watcher.start()
+        return self.config_watcher
+
+    def stop_config_watcher(self):
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+            self.config_watcher = None
 
     def load_progress_templates(self):
         """Load empty progress bar templates"""
@@ -340,6 +1208,42 @@ class AdvancedPotionManager:
                     self.progress_bar_templates[i] = template
                     print(f"Loaded progress bar template for slot {i+1}")
     
+    def load_templates(self):
+        """Load every template (progress bars, full and empty potions) and set templates_ready"""
+        with STARTUP.phase("templates"):
+            if self.slot_progress_regions:
+                self.load_progress_templates()
+            self.load_all_templates()
+            self.digit_reader = DigitReader(GlyphAtlas.load())
+        self.templates_ready.set()
+
+    def load_templates_async(self, initial_scan: bool = False,
+                             on_done: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Load templates on a background thread, optionally followed by the first slot scan
+
+        on_done runs on that thread once everything finished.
+        """
+        def load():
+            try:
+                self.load_templates()
+                if initial_scan:
+                    with STARTUP.phase("first scan"):
+                        self.engine.initial_scan()
+            except Exception as e:
+                print(f"Background template loading failed: {e}")
+                self.activity_log.error(f"Template loading failed: {e}")
+                self.templates_ready.set()  # Don't leave scans waiting forever
+            if on_done is not None:
+                on_done()
+        
+        thread = threading.Thread(target=load, name="TemplateLoader", daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_templates(self, timeout: Optional[float] = None) -> bool:
+        """Block until templates are loaded (immediately true unless loading was deferred)"""
+        return self.templates_ready.wait(timeout)
+
     def load_all_templates(self):
         """Load full and empty templates for all potion types"""
         # Load from slot-based structure (full/slot1/, empty/slot1/, etc.)
@@ -409,8 +1313,8 @@ class AdvancedPotionManager:
             return PotionSubtype.EMPTY, 0, 0.0
         
         region = self.slot_regions[slot_index]
-        screenshot = pyautogui.screenshot(region=region)
-        slot_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        slot_img = self.capture_region(region)
+        self.record_slot_frame(slot_index, slot_img)
         
         best_match = PotionSubtype.EMPTY
         best_confidence = 0.0
@@ -432,6 +1336,8 @@ class AdvancedPotionManager:
                 
                 # Load template
                 template_path = os.path.join(slot_dir, filename)
+                if template_path in self.excluded_template_paths:
+                    continue
                 template = cv2.imread(template_path)
                 if template is None:
                     continue
@@ -521,8 +1427,7 @@ class AdvancedPotionManager:
             if progress_region:
                 try:
                     # Capture current progress bar area
-                    screenshot = pyautogui.screenshot(region=progress_region)
-                    current_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+                    current_img = self.capture_region(progress_region)
                     
                     # Get the empty template
                     empty_template = self.progress_bar_templates[slot_index]
@@ -546,8 +1451,8 @@ class AdvancedPotionManager:
             return False
         
         region = self.slot_regions[slot_index]
-        screenshot = pyautogui.screenshot(region=region)
-        slot_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        slot_img = self.capture_region(region)
+        self.record_slot_frame(slot_index, slot_img)
         
         # Extract the progress bar area (bottom portion of slot region)
         height = slot_img.shape[0]
@@ -590,12 +1495,15 @@ class AdvancedPotionManager:
         
         # Progress bar is active if we detect lines or significant colored area
         has_lines = lines is not None and len(lines) > 0
-        has_colored_bar = colored_pixels > (total_pixels * 0.1)  # At least 10% colored
+        has_colored_bar = colored_pixels > (total_pixels * self.progress_threshold)
         
         return has_lines or has_colored_bar
     
-    def detect_active_utility_effects(self) -> List[ActiveEffect]:
-        """Detect active utility potions by scanning progress bars in each slot"""
+    def detect_active_utility_effects(self, progress_active: Optional[Tuple[bool, ...]] = None) -> List[ActiveEffect]:
+        """Detect active utility potions by scanning progress bars in each slot
+
+        If progress_active is given (from an Observation) the bars are not sampled again.
+        """
         active_effects = []
         current_time = time.time()
         
@@ -603,7 +1511,11 @@ class AdvancedPotionManager:
         for i, slot in enumerate(self.slots):
             # Only check utility potions
             if slot.category == PotionCategory.UTILITY and slot.subtype != PotionSubtype.EMPTY:
-                if self.detect_slot_progress_bar(i):
+                if progress_active is not None:
+                    bar_active = i < len(progress_active) and progress_active[i]
+                else:
+                    bar_active = self.detect_slot_progress_bar(i)
+                if bar_active:
                     # Progress bar detected, potion is active
                     if current_time < slot.active_until:
                         effect = ActiveEffect(
@@ -618,34 +1530,115 @@ class AdvancedPotionManager:
 
     def scan_all_slots(self):
         """Scan all slots and update their states"""
+        self.wait_for_templates()
         print("Scanning potion slots...")
         
-        for i, slot in enumerate(self.slots):
-            subtype, uses, confidence = self.detect_potion_type_and_uses(i)
-            
-            # Update slot if changed
+        for i in range(len(self.slots)):
+            self.scan_slot(i)
+
+    def scan_slot(self, i: int):
+        """Detect one slot's potion and uses and update its state"""
+        slot = self.slots[i]
+        subtype, uses, confidence = self.detect_potion_type_and_uses(i)
+        
+        # Update slot if changed
+        with self.state_lock:
             if slot.subtype != subtype or slot.uses_remaining != uses:
                 old_info = f"{slot.subtype.value}({slot.uses_remaining})"
-                
-                slot.subtype = subtype
-                slot.uses_remaining = uses
-                slot.confidence = confidence
-                
-                if subtype != PotionSubtype.EMPTY:
-                    config = self.potion_configs[subtype]
-                    slot.category = config["category"]
-                    slot.cooldown = 0.0  # No cooldowns - just check empty/full
-                    slot.max_uses = config["max_uses"]
-                    slot.duration = config.get("duration", 0.0)
-                else:
-                    slot.category = PotionCategory.EMPTY
-                    slot.cooldown = 0.0
-                    slot.max_uses = 0
-                    slot.duration = 0.0
-                
+                self.assign_slot(slot, subtype, uses, confidence)
                 new_info = f"{slot.subtype.value}({slot.uses_remaining})"
                 print(f"Slot {i+1}: {old_info} -> {new_info} (conf: {confidence:.2f})")
 
+    def assign_slot(self, slot: PotionSlot, subtype: PotionSubtype, uses: int, confidence: float):
+        """Set a slot's potion, filling category, max uses and duration from its config"""
+        slot.subtype = subtype
+        slot.uses_remaining = uses
+        slot.confidence = confidence
+        
+        if subtype != PotionSubtype.EMPTY:
+            config = self.potion_configs[subtype]
+            slot.category = config["category"]
+            slot.cooldown = 0.0  # No cooldowns - just check empty/full
+            slot.max_uses = config["max_uses"]
+            slot.duration = config.get("duration", 0.0)
+        else:
+            slot.category = PotionCategory.EMPTY
+            slot.cooldown = 0.0
+            slot.max_uses = 0
+            slot.duration = 0.0
+
+    def initial_scan(self):
+        """First scan of a session: restore unchanged slots from the saved state, detect the rest"""
+        restored = self.warm_restore() if self.persist_slot_state else set()
+        if len(restored) < len(self.slots):
+            self.wait_for_templates()
+            print("Scanning potion slots..." if not restored else
+                  f"Restored {len(restored)} unchanged slots, scanning the rest...")
+            for i in range(len(self.slots)):
+                if i not in restored:
+                    self.scan_slot(i)
+        self.last_scan_time = time.time()
+        self.persist_state(force=True)
+
+    def warm_restore(self) -> Set[int]:
+        """Restore saved state for every slot that still shows the frame it was saved with
+
+        Each slot is captured once and hashed; nothing is restored if the
+        state was saved for another slot layout. Returns the restored indices.
+        """
+        try:
+            state = self.state_store.load()
+        except (OSError, ValueError) as e:
+            print(f"Could not read the warm-start state: {e}")
+            return set()
+        if state is None or state.layout_hash != self.compiled_layout.slot_layout_hash:
+            return set()
+        
+        restored = set()
+        for i, saved in enumerate(state.slots[:len(self.slots)]):
+            if saved.frame_hash is None or i >= len(self.slot_regions) or not self.slot_regions[i]:
+                continue
+            try:
+                subtype = PotionSubtype(saved.subtype)
+            except ValueError:
+                continue
+            self.record_slot_frame(i, self.capture_region(self.slot_regions[i]))
+            if self.slot_frames[i][1] != saved.frame_hash:
+                continue
+            slot = self.slots[i]
+            with self.state_lock:
+                self.assign_slot(slot, subtype, saved.uses_remaining, saved.confidence)
+                slot.last_used = saved.last_used
+                slot.active_until = saved.active_until
+            restored.add(i)
+        if restored:
+            with self.state_lock:
+                self.last_health_potion_time = max(self.last_health_potion_time, state.last_health_potion_time)
+            age = time.time() - state.saved_at
+            print(f"Warm start: restored {len(restored)}/{len(self.slots)} slots (state saved {age:.0f}s ago)")
+            self.activity_log.info(f"Warm start: restored {len(restored)} unchanged slots")
+        return restored
+
+    def persist_state(self, force: bool = False):
+        """Save the warm-start state, at most once per state_save_interval unless forced"""
+        if not self.persist_slot_state:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_state_save < self.state_save_interval:
+            return
+        self._last_state_save = now
+        frames = self.slot_frames
+        with self.state_lock:
+            self.take_watchdog_presses()
+            slots = [SlotState(slot.subtype.value, slot.uses_remaining, slot.max_uses, slot.last_used,
+                               slot.active_until, slot.confidence, frames[i][1] if frames[i] else None)
+                     for i, slot in enumerate(self.slots)]
+            last_health_potion_time = float(self.last_health_potion_time)
+        try:
+            self.state_store.save(slots, last_health_potion_time, self.compiled_layout.slot_layout_hash)
+        except (OSError, ValueError) as e:
+            print(f"Could not save the warm-start state: {e}")
+
     def can_use_potion(self, slot: PotionSlot) -> bool:
         """Check if potion can be used - simplified to just check if not empty"""
         # Only check if the flask has uses (not empty)
@@ -680,219 +1673,190 @@ class AdvancedPotionManager:
         if not self.can_use_potion(slot):
             return False
         
-        print(f"\n>>> USING POTION: {slot.subtype.value} (slot {slot.slot_number})")
-        print(f"    Pressing key: {slot.hotkey}")
-        print(f"    Uses remaining after use: {slot.uses_remaining-1}")
-        
-        # Press the hotkey
-        pyautogui.press(slot.hotkey)
-        
-        current_time = time.time()
-        slot.last_used = current_time
+        self.activate_slot(slot)
+        return True
+
+    def activate_slot(self, slot: PotionSlot) -> bool:
+        """Press a slot's hotkey and record the use (no availability checks)"""
+        return bool(self.activate_slots([slot]))
+
+    def activate_slots(self, slots: List[PotionSlot]) -> List[PotionSlot]:
+        """Press several slots as one key burst and record the uses
+
+        Repeated slots, and slots whose key is still queued from an earlier
+        press, are skipped. Returns the slots that were queued. Call it
+        without the state lock held (it captures the slots for verification).
+        """
+        with self.state_lock:
+            reservation = self.reserve_presses(slots)
+        return self.press_reserved(reservation)
+
+    def record_use(self, slot: PotionSlot, when: float):
+        """Book one press of a slot: cooldown start, one use less, buff duration"""
+        slot.last_used = max(slot.last_used, when)
         slot.uses_remaining -= 1
         
         # Set active duration for non-instant potions
         config = self.potion_configs[slot.subtype]
         if not config.get("instant", True):
-            slot.active_until = current_time + slot.duration
-        
-        return True
+            slot.active_until = max(slot.active_until, when + slot.duration)
+
+    def reserve_presses(self, slots: List[PotionSlot]) -> PressReservation:
+        """Record the uses of slots about to be pressed (state_lock held)
+
+        The uses are booked before the keys are queued, so no other thread
+        picks the same flask while press_reserved prepares the press outside
+        the lock.
+        """
+        slots = list({slot.slot_number: slot for slot in slots}.values())
+        reservation = PressReservation(time.time(), slots,
+                                       [(slot.last_used, slot.uses_remaining, slot.active_until) for slot in slots])
+        for slot in slots:
+            self.record_use(slot, reservation.time)
+        return reservation
+
+    def reserve_actions(self, actions: List[FlaskAction]) -> PressReservation:
+        """reserve_presses for decision-engine actions, plus the health/mana cooldowns they start"""
+        actions = list({action.slot_index: action for action in actions}.values())
+        for action in actions:
+            if action.category == PotionCategory.UTILITY:
+                slot = self.slots[action.slot_index]
+                print(f"\nAuto-using utility potion: {slot.subtype.value} (slot {slot.slot_number})")
+                self.activity_log.debug(f"Auto-using utility potion: {slot.subtype.value} (slot {slot.slot_number})")
+        
+        reservation = self.reserve_presses([self.slots[action.slot_index] for action in actions])
+        for action in actions:
+            if action.category in (PotionCategory.HEALTH, PotionCategory.MANA):
+                kind = action.category.value
+                reservation.kinds[action.slot_index] = kind
+                reservation.flask_times.setdefault(kind, self.last_flask_time[kind])
+                self.last_flask_time[kind] = reservation.time
+        if "health" in reservation.flask_times:
+            reservation.health_time = self.last_health_potion_time
+            self.last_health_potion_time = reservation.time  # Update shared cooldown
+        return reservation
+
+    def prepare_pending_press(self, slot: PotionSlot) -> Optional[PendingPress]:
+        """The verification record for a press that is about to be queued
+
+        The pre-press image is the slot's recent capture where there is one,
+        a fresh capture otherwise - always taken before the key is queued, so
+        the game can't have reacted to the press yet. None if the slot can't
+        be captured or verification is off.
+        """
+        if not self.verify_presses or slot.hotkey in self.pending_presses:
+            return None
+        index = slot.slot_number - 1
+        before_slot, before_progress = self.recent_slot_frame(index), None
+        if before_slot is None:
+            before_slot, before_progress = self.capture_slot_state(index)
+        if before_slot is None:
+            return None
+        return PendingPress(index, slot.hotkey, before_slot, before_progress, time.time())
+
+    def announce_press(self, slot: PotionSlot, uses_left: int):
+        print(f"\n>>> USING POTION: {slot.subtype.value} (slot {slot.slot_number})")
+        print(f"    Pressing key: {slot.hotkey}")
+        print(f"    Uses remaining after use: {uses_left}")
+        self.activity_log.info(f"Used {slot.subtype.value} (slot {slot.slot_number}, key {slot.hotkey}), "
+                               f"{uses_left} uses left")
+
+    def press_reserved(self, reservation: PressReservation) -> List[PotionSlot]:
+        """Capture, queue the reserved keys as one burst, then settle the reservation
+
+        Runs without the state lock: the pre-press captures happen here,
+        before the burst is queued. Uses whose key the dispatcher refused are
+        taken back, unless something else has booked the slot since.
+        """
+        verify = {}
+        for slot in reservation.slots:
+            pending = self.prepare_pending_press(slot)
+            if pending is not None:
+                verify[slot.hotkey] = pending
+        accepted = set(self.send_keys([slot.hotkey for slot in reservation.slots], verify))
+        
+        used = []
+        with self.state_lock:
+            for slot, before in zip(reservation.slots, reservation.replaced):
+                if slot.hotkey not in accepted:
+                    if slot.last_used == reservation.time:
+                        slot.last_used, slot.uses_remaining, slot.active_until = before
+                    continue
+                if slot.hotkey in verify:
+                    self.pending_presses.setdefault(slot.hotkey, verify[slot.hotkey])
+                self.announce_press(slot, slot.uses_remaining)
+                used.append(slot)
+            
+            kinds_used = {reservation.kinds.get(slot.slot_number - 1) for slot in used}
+            for kind, before in reservation.flask_times.items():
+                if kind not in kinds_used and self.last_flask_time[kind] == reservation.time:
+                    self.last_flask_time[kind] = before
+            if (reservation.health_time is not None and "health" not in kinds_used and
+                    self.last_health_potion_time == reservation.time):
+                self.last_health_potion_time = reservation.health_time
+        return used
 
     def get_available_potions(self, category: PotionCategory) -> List[PotionSlot]:
         """Get all available potions of a specific category"""
-        return [slot for slot in self.slots 
-                if slot.category == category and slot.uses_remaining > 0]
+        mask = self.slot_table.available_mask(category)
+        return [self.slots[i] for i in np.flatnonzero(mask)]
 
     def should_use_health_potion(self) -> bool:
         """Check if we should use a health potion - use when health is not full"""
-        available = self.get_available_potions(PotionCategory.HEALTH)
         # Use potion when health is below 100% (not full)
-        return len(available) > 0 and self.game_state.health_percentage < 100.0
+        return (self.game_state.health_percentage < 100.0 and
+                bool(self.slot_table.available_mask(PotionCategory.HEALTH).any()))
 
     def should_use_mana_potion(self) -> bool:
         """Check if we should use a mana potion - use when mana is not full"""
-        available = self.get_available_potions(PotionCategory.MANA)
         # Use potion when mana is below 100% (not full)
-        return len(available) > 0 and self.game_state.mana_percentage < 100.0
+        return (self.game_state.mana_percentage < 100.0 and
+                bool(self.slot_table.available_mask(PotionCategory.MANA).any()))
+
+    def decide_actions(self, observation: Optional[Observation] = None) -> List[FlaskAction]:
+        """Run the decision engine on an observation (the latest one by default)"""
+        if observation is None:
+            observation = self.last_observation or self.update_game_state()
+        # The watchdog owns the health flask path while it runs
+        return self.decision_engine.decide(observation, self.slot_table, self.flask_policy,
+                                           self.last_health_potion_time,
+                                           include_health=not self.health_watchdog_active())
+
+    def apply_actions(self, actions: List[FlaskAction]) -> List[PotionSlot]:
+        """Press the flasks chosen by the decision engine as a single burst (state_lock not held)"""
+        with self.state_lock:
+            reservation = self.reserve_actions(actions)
+        return self.press_reserved(reservation)
+
+    def decide_and_apply(self, categories: Optional[Set[PotionCategory]] = None):
+        """Decide and book the uses in one step under the state lock, so no other
+        thread can use a flask between the cooldown check and the press; the
+        press itself (and its captures) happens after the lock is released"""
+        with self.state_lock:
+            self.take_watchdog_presses()
+            actions = self.decide_actions()
+            if categories is not None:
+                actions = [a for a in actions if a.category in categories]
+            reservation = self.reserve_actions(actions)
+        self.press_reserved(reservation)
+
+    def process_potions(self):
+        """Verify recent presses, then decide and use potions in one pass"""
+        if self.pending_presses:
+            self.verify_pending_presses()
+        self.decide_and_apply()
 
     def process_health_potions(self):
         """Use health potion if needed - with both shared and per-slot cooldown"""
-        if not self.should_use_health_potion():
-            return
-        
-        current_time = time.time()
-        
-        # Check shared health potion cooldown first
-        time_since_last_health = current_time - self.last_health_potion_time
-        min_shared_cooldown = self.instant_potion_delay  # At minimum, wait 300ms between any health potions
-        
-        if time_since_last_health < min_shared_cooldown:
-            return  # Too soon after last health potion
-        
-        available = self.get_available_potions(PotionCategory.HEALTH)
-        
-        # Filter by GUI controls and check per-slot cooldown
-        if self.use_gui_controls:
-            usable = []
-            for i, slot in enumerate(self.slots):
-                if (i < len(self.slot_auto_use) and self.slot_auto_use[i] and
-                    slot in available and self.can_use_potion(slot)):
-                    
-                    # Check per-slot cooldown
-                    time_since_slot_used = current_time - slot.last_used
-                    
-                    # Determine cooldown based on instant setting
-                    if i < len(self.slot_instant) and self.slot_instant[i]:
-                        required_cooldown = self.instant_potion_delay  # 300ms for instant
-                    else:
-                        required_cooldown = self.health_potion_delay  # 2s for non-instant
-                    
-                    # Check both shared cooldown and per-slot cooldown
-                    if (time_since_slot_used >= required_cooldown and 
-                        time_since_last_health >= required_cooldown):
-                        usable.append((i, slot))
-        else:
-            usable = []
-            for i, slot in enumerate(self.slots):
-                if slot in available and self.can_use_potion(slot):
-                    # Check per-slot cooldown
-                    time_since_slot_used = current_time - slot.last_used
-                    if (time_since_slot_used >= self.health_potion_delay and
-                        time_since_last_health >= self.health_potion_delay):
-                        usable.append((i, slot))
-        
-        if usable:
-            # Sort by uses remaining (use fuller potions first)
-            usable.sort(key=lambda x: x[1].uses_remaining, reverse=True)
-            slot_index, slot = usable[0]
-            self.use_potion(slot)
-            self.last_health_potion_time = current_time  # Update shared cooldown
+        self.decide_and_apply({PotionCategory.HEALTH})
 
     def process_mana_potions(self):
         """Use mana potion if needed - with per-slot cooldown for non-enduring, progress check for enduring"""
-        if not self.should_use_mana_potion():
-            return
-        
-        current_time = time.time()
-        available = self.get_available_potions(PotionCategory.MANA)
-        
-        # Filter by GUI controls if enabled
-        if self.use_gui_controls:
-            usable = []
-            for i, slot in enumerate(self.slots):
-                if (i < len(self.slot_auto_use) and self.slot_auto_use[i] and
-                    slot in available and self.can_use_potion(slot)):
-                    
-                    # Check if this is an enduring mana flask
-                    is_enduring = i < len(self.slot_enduring) and self.slot_enduring[i]
-                    
-                    if is_enduring:
-                        # For enduring flasks, check if buff is active via progress bar
-                        if not self.detect_slot_progress_bar(i):
-                            # No buff active, can use
-                            usable.append((i, slot))
-                    else:
-                        # For non-enduring, check per-slot cooldown
-                        time_since_last = current_time - slot.last_used
-                        if time_since_last >= self.mana_potion_delay:
-                            usable.append((i, slot))
-        else:
-            # Non-GUI mode - check per-slot cooldown
-            usable = []
-            for i, slot in enumerate(self.slots):
-                if slot in available and self.can_use_potion(slot):
-                    time_since_last = current_time - slot.last_used
-                    if time_since_last >= self.mana_potion_delay:
-                        usable.append((i, slot))
-        
-        if usable:
-            # Sort by uses remaining (use fuller potions first)
-            usable.sort(key=lambda x: x[1].uses_remaining, reverse=True)
-            slot_index, slot = usable[0]
-            self.use_potion(slot)
-    
+        self.decide_and_apply({PotionCategory.MANA})
+
     def process_utility_potions(self):
         """Process utility potion usage - keep buffs active and alternate same types"""
-        # Only print debug occasionally to avoid spam
-        current_time = time.time()
-        if not hasattr(self, '_last_utility_debug') or current_time - self._last_utility_debug > 2:
-            self._last_utility_debug = current_time
-            debug_enabled = True
-        else:
-            debug_enabled = False
-            
-        if debug_enabled:
-            print("\n[DEBUG] Processing utility potions...")
-        
-        # First, check all utility slots for active effects (including empty ones)
-        active_utility_types = set()
-        for i, slot in enumerate(self.slots):
-            if slot.category == PotionCategory.UTILITY and slot.subtype != PotionSubtype.EMPTY:
-                # Check if this slot has an active progress bar
-                if self.detect_slot_progress_bar(i):
-                    active_utility_types.add(slot.subtype.value)
-                    if debug_enabled:
-                        print(f"  Slot {i+1}: {slot.subtype.value} is ACTIVE (progress bar detected)")
-        
-        # Group utility potions by name/type (only non-empty ones)
-        utility_groups = {}
-        
-        for i, slot in enumerate(self.slots):
-            if debug_enabled:
-                print(f"  Checking slot {i+1}: {slot.subtype.value}, category={slot.category.value}, uses={slot.uses_remaining}")
-            
-            # Check GUI controls if enabled
-            if self.use_gui_controls and (i >= len(self.slot_auto_use) or not self.slot_auto_use[i]):
-                if debug_enabled:
-                    print(f"    Skipped - auto-use disabled in GUI")
-                continue  # Skip this slot if auto-use is disabled
-                
-            if (slot.category == PotionCategory.UTILITY and 
-                slot.uses_remaining > 0 and
-                slot.subtype != PotionSubtype.EMPTY):
-                
-                # Get the potion name from the subtype
-                key = slot.subtype.value
-                if key not in utility_groups:
-                    utility_groups[key] = []
-                utility_groups[key].append((i, slot))
-                if debug_enabled:
-                    print(f"    Added to utility group: {key}")
-        
-        # Process each group of utility potions
-        print(f"\nUtility groups found: {list(utility_groups.keys())}")
-        print(f"Active utility types: {active_utility_types}")
-        
-        for potion_type, slots_list in utility_groups.items():
-            print(f"\n[DEBUG] Processing {potion_type} group with {len(slots_list)} slots")
-            
-            # Check if this type is already active (from our earlier check)
-            if potion_type in active_utility_types:
-                print(f"  {potion_type} is already active, skipping")
-                continue
-            
-            # No active buff of this type, find an available slot to use
-            print(f"\n[DEBUG] {potion_type}: No active buff detected, looking for available slot...")
-            current_time = time.time()
-            best_slot = None
-            best_index = None
-            
-            for slot_index, slot in slots_list:
-                # Check if this slot can be used
-                can_use = self.can_use_potion(slot)
-                print(f"  Slot {slot_index + 1}: can_use={can_use}, has_uses={slot.uses_remaining > 0}")
-                if can_use:
-                    # Just use the first available slot
-                    best_slot = slot
-                    best_index = slot_index
-                    break
-            
-            # Use the best available slot
-            if best_slot is not None:
-                print(f"\nAuto-using utility potion: {best_slot.subtype.value} (slot {best_index + 1})")
-                self.use_potion(best_slot)
-            else:
-                print(f"\n[DEBUG] No available slot for {potion_type} - all empty")
+        self.decide_and_apply({PotionCategory.UTILITY})
 
     def color_distance(self, color1: tuple, color2: tuple) -> float:
         """Calculate Euclidean distance between two RGB colors"""
@@ -900,21 +1864,34 @@ class AdvancedPotionManager:
                 (color1[1] - color2[1])**2 + 
                 (color1[2] - color2[2])**2) ** 0.5
     
+    def match_probes(self, probes: ProbeSet) -> np.ndarray:
+        """Classify every probe against its reference color with one vectorized distance"""
+        img = self.capture_region(probes.region)
+        pixels = img[probes.rows, probes.cols].astype(np.float32)
+        distances = np.sqrt(((pixels - probes.colors) ** 2).sum(axis=1))
+        return distances < self.pixel_color_tolerance
+
+    def detect_probe_fill(self, probes: Optional[ProbeSet]) -> Optional[float]:
+        """Quantized fill level: how many probes, counted from the bottom, still match"""
+        if not probes:
+            return None
+        try:
+            matches = self.match_probes(probes)
+            level = len(matches) if matches.all() else int(np.argmin(matches))
+            return level / len(matches) * 100
+        except Exception as e:
+            print(f"Probe detection error: {e}")
+            return None
+
     def detect_health_percentage_pixel(self) -> float:
         """Detect health using pixel color comparison"""
-        if not self.health_pixel_point or not self.health_pixel_color:
+        probe = self.compiled_layout.health_pixel_probe  # A single pixel is a one-probe set
+        if probe is None:
             return None
             
         try:
-            # Get current pixel color
-            screenshot = pyautogui.screenshot()
-            current_color = screenshot.getpixel(self.health_pixel_point)
-            
-            # Calculate color distance from full health color
-            distance = self.color_distance(current_color, self.health_pixel_color)
-            
             # Binary detection: Full health or low health
-            if distance < self.pixel_color_tolerance:
+            if self.match_probes(probe)[0]:
                 return 100.0  # Full health - no potion needed
             else:
                 # Color changed = health is not full, trigger potion use
@@ -926,19 +1903,13 @@ class AdvancedPotionManager:
     
     def detect_mana_percentage_pixel(self) -> float:
         """Detect mana using pixel color comparison"""
-        if not self.mana_pixel_point or not self.mana_pixel_color:
+        probe = self.compiled_layout.mana_pixel_probe  # A single pixel is a one-probe set
+        if probe is None:
             return None
             
         try:
-            # Get current pixel color
-            screenshot = pyautogui.screenshot()
-            current_color = screenshot.getpixel(self.mana_pixel_point)
-            
-            # Calculate color distance from full mana color
-            distance = self.color_distance(current_color, self.mana_pixel_color)
-            
             # Binary detection: Full mana or low mana
-            if distance < self.pixel_color_tolerance:
+            if self.match_probes(probe)[0]:
                 return 100.0  # Full mana - no potion needed
             else:
                 # Color changed = mana is not full, trigger potion use
@@ -948,17 +1919,112 @@ class AdvancedPotionManager:
             print(f"Pixel detection error: {e}")
             return None
     
-    def detect_health_percentage(self) -> float:
-        """Detect current health percentage"""
-        # Try pixel detection first (low CPU)
-        pixel_result = self.detect_health_percentage_pixel()
-        if pixel_result is not None:
-            return pixel_result
+    def capture_region(self, region) -> np.ndarray:
+        """Capture a config region as a BGR image
+
+        Window-relative regions are offset by the game's client origin. When the
+        client area is known the capture is clipped to it; pixels outside it read
+        as black so callers always get an image of the requested size. Without
+        window geometry (polling focus fallback) regions are used as-is, which is
+        right for a fullscreen game at the desktop origin.
+        """
+        x, y, width, height = (int(v) for v in region)
+        if self.coordinate_space == "window" and self.focus_provider is None:
+            self.ensure_focus_provider()
+        rect = self.window_rect
+        if rect is None:
+            return self._grab((x, y, width, height))
+        
+        win_x, win_y, win_width, win_height = rect
+        if self.coordinate_space == "window":
+            x, y = x + win_x, y + win_y
+        left, top = max(x, win_x), max(y, win_y)
+        right = min(x + width, win_x + win_width)
+        bottom = min(y + height, win_y + win_height)
+        if (left, top, right, bottom) == (x, y, x + width, y + height):
+            return self._grab((x, y, width, height))
+        
+        img = np.zeros((height, width, 3), dtype=np.uint8)
+        if right > left and bottom > top:
+            img[top - y:bottom - y, left - x:right - x] = self._grab((left, top, right - left, bottom - top))
+        return img
+
+    def record_slot_frame(self, slot_index: int, img: np.ndarray):
+        """Keep the latest capture of a slot (with a content hash) for GUI previews"""
+        frame = img.copy()
+        frame.setflags(write=False)
+        self.slot_frames[slot_index] = (frame, hashlib.blake2b(frame.tobytes(), digest_size=8).digest())
+        self.slot_frame_times[slot_index] = time.perf_counter()
+
+    def recent_slot_frame(self, slot_index: int) -> Optional[np.ndarray]:
+        """The slot's latest capture if it is at most PRESS_FRAME_MAX_AGE old"""
+        entry = self.slot_frames[slot_index]
+        if entry is None or time.perf_counter() - self.slot_frame_times[slot_index] > PRESS_FRAME_MAX_AGE:
+            return None
+        return entry[0]
+
+    def capture_ready(self) -> bool:
+        """False while the frame source has no fresh frames (pipeline capture stalled or exited)"""
+        return self.frame_source_ready is None or self.frame_source_ready()
+
+    def _grab(self, region) -> np.ndarray:
+        if self.frame_source is not None:
+            return self.frame_source(region)
+        return grab_screen(region)
+
+    def capture_bounds(self) -> Optional[Rect]:
+        """Smallest config-space rectangle covering every region the engine captures"""
+        return self.compiled_layout.capture_bounds
+
+    def on_window_geometry(self, rect: Optional[Rect]):
+        """Focus-provider callback: the game window moved, resized or closed"""
+        self.window_rect = rect
+        if rect is not None:
+            print(f"\nGame client area: {rect[2]}x{rect[3]} at ({rect[0]}, {rect[1]})")
+
+    def is_liquid_pixel(self, pixel, kind: str) -> bool:
+        """Check whether a single BGR pixel has the health/mana liquid color"""
+        b, g, r = (int(c) for c in pixel[:3])
+        h, sat, val = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
+        if sat * 255 < ORB_MIN_SATURATION or val * 255 < ORB_MIN_VALUE:
+            return False
+        hue = h * 180
+        return any(low <= hue <= high for low, high in ORB_LIQUID_HUES[kind])
+
+    def detect_orb_fill(self, column, kind: str) -> Optional[float]:
+        """Measure an orb's fill level by bisecting a calibrated vertical column
+
+        The column runs from the bottom to the top of the liquid of a full orb,
+        so "is liquid" is monotonic down it and the surface row can be found
+        with O(log h) pixel tests. Returns None without a calibrated column, or
+        when its bottom pixel isn't liquid: an empty orb and a column that
+        misses the liquid look the same, so the other detectors decide.
+        """
+        if not column:
+            return None
+        try:
+            pixels = self.capture_region(column)[:, 0]
+            if not self.is_liquid_pixel(pixels[-1], kind):
+                return None
             
-        # Fallback to color detection
+            # Find the first liquid row; rows above it are empty
+            low, high = 0, len(pixels) - 1
+            while low < high:
+                mid = (low + high) // 2
+                if self.is_liquid_pixel(pixels[mid], kind):
+                    high = mid
+                else:
+                    low = mid + 1
+            
+            return (len(pixels) - low) / len(pixels) * 100
+        except Exception as e:
+            print(f"Orb fill detection error: {e}")
+            return None
+
+    def detect_health_percentage_hsv(self) -> float:
+        """Detect health by counting red pixels in the whole health region"""
         try:
-            screenshot = pyautogui.screenshot(region=self.health_bar_region)
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            img = self.capture_region(self.health_bar_region)
             hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
             
             # Red color range for health
@@ -978,17 +2044,10 @@ class AdvancedPotionManager:
         except:
             return 100.0
 
-    def detect_mana_percentage(self) -> float:
-        """Detect current mana percentage"""
-        # Try pixel detection first (low CPU)
-        pixel_result = self.detect_mana_percentage_pixel()
-        if pixel_result is not None:
-            return pixel_result
-            
-        # Fallback to color detection
+    def detect_mana_percentage_hsv(self) -> float:
+        """Detect mana by counting blue pixels in the whole mana region"""
         try:
-            screenshot = pyautogui.screenshot(region=self.mana_bar_region)
-            img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+            img = self.capture_region(self.mana_bar_region)
             hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
             
             # Blue color range for mana
@@ -1003,11 +2062,322 @@ class AdvancedPotionManager:
         except:
             return 100.0
 
-    def update_game_state(self):
+    def measure_health(self) -> Tuple[float, bool]:
+        """Measure health; returns (percentage, exact) where exact means a real fill level"""
+        # Multi-point probes recorded by the setup tool (quantized, sub-millisecond)
+        fill = self.detect_probe_fill(self.health_probes)
+        if fill is not None:
+            return fill, True
+        
+        # Orb bisection along the calibrated column (accurate and cheap)
+        if self.orb_fill_detection:
+            fill = self.detect_orb_fill(self.health_orb_column, "health")
+            if fill is not None:
+                return fill, True
+        
+        # Then pixel detection (low CPU, full / not full only)
+        pixel_result = self.detect_health_percentage_pixel()
+        if pixel_result is not None:
+            return pixel_result, False
+        
+        # Fallback to color detection
+        return self.detect_health_percentage_hsv(), False
+
+    def measure_mana(self) -> Tuple[float, bool]:
+        """Measure mana; returns (percentage, exact) where exact means a real fill level"""
+        fill = self.detect_probe_fill(self.mana_probes)
+        if fill is not None:
+            return fill, True
+        
+        if self.orb_fill_detection:
+            fill = self.detect_orb_fill(self.mana_orb_column, "mana")
+            if fill is not None:
+                return fill, True
+        
+        pixel_result = self.detect_mana_percentage_pixel()
+        if pixel_result is not None:
+            return pixel_result, False
+        
+        return self.detect_mana_percentage_hsv(), False
+
+    def detect_health_percentage(self) -> float:
+        """Detect current health percentage"""
+        return self.measure_health()[0]
+
+    def detect_mana_percentage(self) -> float:
+        """Detect current mana percentage"""
+        return self.measure_mana()[0]
+
+    def progress_watch_mask(self) -> np.ndarray:
+        """Slots whose progress bar the policy needs: utility and enduring mana flasks"""
+        table = self.slot_table
+        policy = self.flask_policy
+        watch = table.category_mask(PotionCategory.UTILITY)
+        watch |= table.available_mask(PotionCategory.MANA) & policy.enduring & policy.auto_use
+        return watch
+
+    def project_trend(self, kind: str, value: float, exact: bool, threshold: float,
+                      timestamp: float) -> Optional[float]:
+        """Update a resource trend and return its projection over the look-ahead window
+
+        Also scores earlier predictions: a hit is a projected crossing that really
+        happened within the look-ahead window, a miss is one that did not. A
+        window in which a flask of this kind was pressed is scored as
+        pre-empted instead, since the press changed the outcome either way.
+        """
+        trend = self.health_trend if kind == "health" else self.mana_trend
+        if not (self.trend_prediction and exact):
+            trend.reset()
+            self._prediction_window[kind] = None
+            return None
+        
+        trend.update(value, timestamp)
+        lookahead = self.trend_lookahead_ms / 1000.0
+        projected = trend.project(lookahead)
+        
+        window = self._prediction_window[kind]
+        if window is not None:
+            made_at, deadline = window
+            if self.last_flask_time[kind] >= made_at:
+                self.stats[f"{kind}_prediction_preempted"] += 1
+                self._prediction_window[kind] = None
+            elif value < threshold:
+                self.stats[f"{kind}_prediction_hits"] += 1
+                self._prediction_window[kind] = None
+            elif timestamp > deadline:
+                self.stats[f"{kind}_prediction_misses"] += 1
+                self._prediction_window[kind] = None
+        elif value >= threshold and projected is not None and projected < threshold:
+            self._prediction_window[kind] = (timestamp, timestamp + lookahead)
+        
+        return projected
+
+    def prediction_hit_rate(self, kind: str = "health") -> Optional[float]:
+        """Fraction of projected threshold crossings that actually happened (pre-empted ones excluded)"""
+        hits = self.stats[f"{kind}_prediction_hits"]
+        total = hits + self.stats[f"{kind}_prediction_misses"]
+        return hits / total if total else None
+
+    def ensure_input_dispatcher(self) -> InputDispatcher:
+        """Start the key dispatch thread if it isn't running yet"""
+        if self.input_dispatcher is None or not self.input_dispatcher.is_alive():
+            if self.dispatcher_factory is not None:
+                self.input_dispatcher = self.dispatcher_factory()
+            else:
+                self.input_dispatcher = InputDispatcher(min_key_spacing=self.min_key_spacing)
+            self.input_dispatcher.start()
+        return self.input_dispatcher
+
+    def send_keys(self, keys: List[str], pending: Optional[Dict[str, PendingPress]] = None) -> List[str]:
+        """Queue key presses as one burst without blocking the caller
+
+        The dispatcher stamps each press in pending (by hotkey) when its key
+        actually goes out, which starts its verification delay.
+        """
+        pending = pending or {}
+
+        def on_sent(dispatch):
+            press = pending.get(dispatch.key)
+            if press is not None:
+                press.sent_at = time.time()
+
+        return self.ensure_input_dispatcher().submit_burst(keys, spacing=self.burst_key_spacing, on_sent=on_sent)
+
+    def capture_slot_state(self, slot_index: int) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Capture just one slot and its progress bar (for press verification)"""
+        try:
+            slot_img = None
+            if slot_index < len(self.slot_regions) and self.slot_regions[slot_index]:
+                slot_img = self.capture_region(self.slot_regions[slot_index])
+                self.record_slot_frame(slot_index, slot_img)
+            progress_img = None
+            if slot_index < len(self.slot_progress_regions) and self.slot_progress_regions[slot_index]:
+                progress_img = self.capture_region(self.slot_progress_regions[slot_index])
+            return slot_img, progress_img
+        except Exception as e:
+            print(f"Slot capture error: {e}")
+            return None, None
+
+    def press_consumed(self, pending: PendingPress, slot_img: np.ndarray,
+                       progress_img: Optional[np.ndarray]) -> bool:
+        """A press took effect if the slot or its progress bar visibly changed"""
+        def changed(before, after):
+            return (before is not None and after is not None and before.shape == after.shape and
+                    float(cv2.absdiff(before, after).mean()) > self.press_diff_threshold)
+        return changed(pending.before_slot, slot_img) or changed(pending.before_progress, progress_img)
+
+    def verify_pending_presses(self):
+        """Confirm recent presses by re-capturing only the pressed slots
+
+        A press that left the slot unchanged is never sent again (a missed
+        change would cost a real flask charge); the slot is rescanned instead
+        and keeps its cooldown. Slots are captured and rescanned outside the
+        state lock.
+        """
+        now = time.time()
+        rescan = []
+        with self.state_lock:
+            due = []
+            for key, pending in list(self.pending_presses.items()):
+                if pending.sent_at is None:
+                    if now - pending.queued_at > 1.0:
+                        # Never sent (dispatch error): reconcile from the screen
+                        del self.pending_presses[key]
+                        rescan.append(pending.slot_index)
+                elif now - pending.sent_at >= self.verify_delay:
+                    due.append((key, pending))
+        
+        captures = {key: self.capture_slot_state(pending.slot_index) for key, pending in due}
+        
+        with self.state_lock:
+            for key, pending in due:
+                if self.pending_presses.get(key) is not pending:
+                    continue  # Resolved meanwhile (e.g. by a rescan)
+                del self.pending_presses[key]
+                slot_img, progress_img = captures[key]
+                if slot_img is None or self.press_consumed(pending, slot_img, progress_img):
+                    continue
+                
+                slot = self.slots[pending.slot_index]
+                print(f"\nPress on slot {slot.slot_number} not confirmed - rescanning slot")
+                self.activity_log.warning(f"Press on slot {slot.slot_number} not confirmed - rescanning slot")
+                rescan.append(pending.slot_index)
+        
+        for slot_index in rescan:
+            self.scan_slot(slot_index)
+
+    def stop_input_dispatcher(self):
+        if self.input_dispatcher is not None:
+            self.input_dispatcher.stop()
+            self.input_dispatcher = None
+
+    def health_watchdog_active(self) -> bool:
+        return self.health_watchdog is not None and self.health_watchdog.is_alive()
+
+    def start_health_watchdog(self):
+        """Start the high-frequency health watchdog thread if enabled"""
+        if self.use_health_watchdog and not self.health_watchdog_active():
+            self.health_watchdog = HealthWatchdog(self, self.health_watchdog_rate)
+            self.health_watchdog.start()
+
+    def stop_health_watchdog(self):
+        if self.health_watchdog is not None:
+            self.health_watchdog.stop()
+            self.health_watchdog = None
+
+    def health_watchdog_tick(self) -> Optional[Observation]:
+        """One watchdog sample: measure health only and fire a health flask if needed"""
+        if not self.capture_ready():
+            return None
+        current_time = time.time()
+        health, exact = self.measure_health()
+        projected = self.project_trend("health", health, exact, self.health_threshold, current_time)
+        observation = Observation(current_time, health, 100.0, (), exact, False, projected)
+        
+        if self.poe_window_focused or not self.require_window_focus:
+            # No state lock: the main loop leaves health flasks to the watchdog, and until it books
+            # the watchdog's presses the watchdog's own last press keeps the shared cooldown
+            last_health = max(self.last_health_potion_time, self.watchdog_health_time)
+            action = self.decision_engine.decide_health(observation, self.slot_table, self.flask_policy, last_health)
+            if action is not None:
+                self.watchdog_press(action)
+        return observation
+
+    def watchdog_press(self, action: FlaskAction):
+        """Press a health flask for the watchdog and hand the use to the main loop"""
+        slot = self.slots[action.slot_index]
+        pending = self.prepare_pending_press(slot)
+        if not self.send_keys([slot.hotkey], {slot.hotkey: pending} if pending is not None else None):
+            return  # Still queued from an earlier press
+        now = time.time()
+        self.watchdog_health_time = now
+        self.last_flask_time["health"] = now
+        self.watchdog_presses.append((action.slot_index, now, pending))
+        self.announce_press(slot, slot.uses_remaining - 1)
+
+    def take_watchdog_presses(self):
+        """Book the health presses the watchdog handed over since the last call (state_lock held)"""
+        while self.watchdog_presses:
+            slot_index, pressed_at, pending = self.watchdog_presses.popleft()
+            slot = self.slots[slot_index]
+            self.record_use(slot, pressed_at)
+            self.last_health_potion_time = max(self.last_health_potion_time, pressed_at)
+            if pending is not None:
+                self.pending_presses.setdefault(slot.hotkey, pending)
+
+    def observe(self) -> Observation:
+        """Sample the screen once and build an immutable observation for the policy"""
+        current_time = time.time()
+        latest = self.health_watchdog.latest if self.health_watchdog_active() else None
+        if latest is not None:
+            # Health comes from the watchdog's latest sample
+            health, health_exact, health_projected = (latest.health_percentage, latest.health_exact,
+                                                      latest.health_projected)
+        else:
+            health, health_exact = self.measure_health()
+            health_projected = self.project_trend("health", health, health_exact,
+                                                  self.health_threshold, current_time)
+        mana, mana_exact = self.measure_mana()
+        mana_projected = self.project_trend("mana", mana, mana_exact,
+                                            self.mana_threshold, current_time)
+        watch = self.progress_watch_mask()
+        progress = tuple(bool(watch[i]) and self.detect_slot_progress_bar(i)
+                         for i in range(self.slot_table.size))
+        return Observation(current_time, health, mana, progress, health_exact, mana_exact,
+                           health_projected, mana_projected)
+
+    def read_resource_numbers(self):
+        """Fill health/mana current and max from the number regions via the digit reader"""
+        for kind, region in (("health", self.health_number_region), ("mana", self.mana_number_region)):
+            if not region:
+                continue
+            try:
+                values = self.digit_reader.read_values(self.capture_region(region))
+            except Exception as e:
+                print(f"Digit reader error: {e}")
+                values = None
+            current, maximum = values if values else (None, None)
+            setattr(self.game_state, f"{kind}_current", current)
+            setattr(self.game_state, f"{kind}_max", maximum)
+
+    def update_game_state(self) -> Observation:
         """Update current game state"""
-        self.game_state.health_percentage = self.detect_health_percentage()
-        self.game_state.mana_percentage = self.detect_mana_percentage()
-        self.game_state.active_effects = self.detect_active_utility_effects()
+        observation = self.observe()
+        self.game_state.health_percentage = observation.health_percentage
+        self.game_state.mana_percentage = observation.mana_percentage
+        self.game_state.active_effects = self.detect_active_utility_effects(observation.progress_active)
+        if (len(self.digit_reader.atlas) and
+                observation.timestamp - self._last_number_read >= self.number_read_interval):
+            self._last_number_read = observation.timestamp
+            self.read_resource_numbers()
+        self.last_observation = observation
+        return observation
+
+    def check_window_focus(self) -> bool:
+        """Game focus from the event-driven focus provider (started on first use)
+
+        Costs nothing per tick; the provider thread keeps the flag up to date.
+        is_poe_window_focused() is only used as the provider's polling fallback.
+        """
+        self.ensure_focus_provider()
+        self.poe_window_focused = self.focus_provider.focused
+        return self.poe_window_focused
+
+    def ensure_focus_provider(self) -> FocusProvider:
+        """Start focus and window geometry tracking if it isn't running yet"""
+        if self.focus_provider is None:
+            self.focus_provider = create_focus_provider(self.is_poe_window_focused,
+                                                        finder=self.process_finder)
+            self.focus_provider.add_geometry_callback(self.on_window_geometry)
+            self.on_window_geometry(self.focus_provider.client_rect)
+            self.focus_provider.start()
+        return self.focus_provider
+
+    def stop_focus_tracking(self):
+        if self.focus_provider is not None:
+            self.focus_provider.stop()
+            self.focus_provider = None
+            self.window_rect = None
 
     def is_poe_window_focused(self) -> bool:
         """Check if Path of Exile window is currently focused"""
@@ -1020,40 +2390,13 @@ class AdvancedPotionManager:
                     import ctypes
                     from ctypes import wintypes
                     
-                    # Import Windows APIs
-                    user32 = ctypes.windll.user32
-                    kernel32 = ctypes.windll.kernel32
-                    psapi = ctypes.windll.psapi
-                    
                     # Get foreground window
-                    hwnd = user32.GetForegroundWindow()
+                    hwnd = ctypes.windll.user32.GetForegroundWindow()
                     
-                    # Get process ID
+                    # Get process ID and compare it with the cached game process
                     pid = wintypes.DWORD()
-                    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-                    
-                    # Open process
-                    PROCESS_QUERY_INFORMATION = 0x0400
-                    PROCESS_VM_READ = 0x0010
-                    process_handle = kernel32.OpenProcess(PROCESS_QUERY_INFORMATION | PROCESS_VM_READ, False, pid)
-                    
-                    if process_handle:
-                        # Get process name
-                        executable = ctypes.create_unicode_buffer(512)
-                        psapi.GetModuleBaseNameW(process_handle, None, executable, 512)
-                        kernel32.CloseHandle(process_handle)
-                        
-                        # Remove .exe extension if present
-                        process_name = executable.value
-                        if process_name.lower().endswith('.exe'):
-                            process_name = process_name[:-4]
-                        
-                        # Check if it's Path of Exile
-                        process_lower = process_name.lower()
-                        return ('pathofexile' in process_lower or 
-                               process_lower == 'pathofexile' or
-                               process_lower == 'pathofexile_x64' or
-                               process_lower == 'pathofexilesteam')
+                    ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+                    return self.process_finder.is_game_pid(pid.value)
                 except:
                     # Fallback to PowerShell method if ctypes fails
                     ps_script = """
@@ -1090,7 +2433,13 @@ class AdvancedPotionManager:
             elif system == "Linux":
                 # Linux implementation using xdotool (requires xdotool package)
                 try:
-                    # Get the active window ID
+                    # Compare the active window's PID with the cached game process
+                    result = subprocess.run(['xdotool', 'getactivewindow', 'getwindowpid'], 
+                                          capture_output=True, text=True, timeout=1)
+                    if result.returncode == 0 and result.stdout.strip().isdigit():
+                        return self.process_finder.is_game_pid(int(result.stdout.strip()))
+                    
+                    # No _NET_WM_PID on the window: fall back to its title
                     result = subprocess.run(['xdotool', 'getactivewindow'], 
                                           capture_output=True, text=True, timeout=1)
                     if result.returncode == 0:
@@ -1121,17 +2470,13 @@ class AdvancedPotionManager:
                 # macOS implementation using osascript
                 script = """
                 tell application "System Events"
-                    set frontApp to name of first application process whose frontmost is true
-                    if frontApp is "Path of Exile" then
-                        return "true"
-                    else
-                        return "false"
-                    end if
+                    return unix id of first application process whose frontmost is true
                 end tell
                 """
                 result = subprocess.run(['osascript', '-e', script], 
                                       capture_output=True, text=True, timeout=1)
-                return result.stdout.strip().lower() == "true"
+                pid = result.stdout.strip()
+                return pid.isdigit() and self.process_finder.is_game_pid(int(pid))
                 
             else:
                 # Unknown system, default to true
@@ -1195,71 +2540,87 @@ class AdvancedPotionManager:
         
         print(" | ".join(status_parts), end='\r')
 
+    def release_capture_resources(self):
+        """Drop cached captures and per-tick state while idle"""
+        self.last_observation = None
+        self.health_trend.reset()
+        self.mana_trend.reset()
+        self._prediction_window = {"health": None, "mana": None}
+        self.digit_reader.clear_cache()
+        self.pending_presses.clear()
+
+    def warm_start(self):
+        """Fast rescan after regaining focus so decisions start from fresh slot state"""
+        self.scan_all_slots()
+        self.last_scan_time = time.time()
+
+    def idle_until_focused(self, keep_running: Optional[Callable[[], bool]] = None) -> bool:
+        """Block while the game is unfocused, holding no capture resources
+
+        Waits on focus-change events (or a polling fallback with a growing
+        interval). Returns True after a warm-start rescan once the game is
+        focused again, or False if keep_running() turned false while idle.
+        """
+        if keep_running is None:
+            keep_running = lambda: self.running
+        self.check_window_focus()
+        provider = self.focus_provider
+        
+        print("\nPath of Exile is not focused - idling until it is active again")
+        watchdog_was_running = self.health_watchdog_active()
+        self.stop_health_watchdog()
+        self.release_capture_resources()
+        
+        poll_interval = getattr(provider, "interval", None)
+        wait = 0.5
+        while keep_running() and self.require_window_focus and not provider.focused:
+            provider.wait_for_change(timeout=wait)
+            if not provider.event_driven:
+                # No focus events: back off the focus poll while idle
+                wait = min(wait * 2, self.idle_max_backoff)
+                provider.set_interval(wait)
+        if poll_interval is not None:
+            provider.set_interval(poll_interval)
+        
+        if not keep_running():
+            return False
+        
+        self.check_window_focus()
+        print("Path of Exile is active - resuming")
+        self.warm_start()
+        if watchdog_was_running:
+            self.start_health_watchdog()
+        return True
+
     def main_loop(self):
-        """Main monitoring loop"""
+        """Main monitoring loop (runs the engine on this thread)"""
         print("Advanced Potion Manager started. Press Ctrl+C to stop.")
         if self.require_window_focus:
             print("Window focus detection enabled - potions will only be used when Path of Exile is active.")
-        last_scan_time = 0
-        
-        while self.running:
-            try:
-                current_time = time.time()
-                
-                # Check window focus if required
-                if self.require_window_focus:
-                    self.poe_window_focused = self.is_poe_window_focused()
-                    
-                    # Only process potions if window is focused
-                    if self.poe_window_focused:
-                        # Update game state
-                        self.update_game_state()
-                        
-                        # Rescan slots periodically
-                        if current_time - last_scan_time > 5:  # Every 5 seconds
-                            self.scan_all_slots()
-                            last_scan_time = current_time
-                        
-                        # Process potions
-                        self.process_health_potions()
-                        self.process_mana_potions()
-                        self.process_utility_potions()
-                else:
-                    # Window focus not required, process normally
-                    # Update game state
-                    self.update_game_state()
-                    
-                    # Rescan slots periodically
-                    if current_time - last_scan_time > 5:  # Every 5 seconds
-                        self.scan_all_slots()
-                        last_scan_time = current_time
-                    
-                    # Process potions
-                    self.process_health_potions()
-                    self.process_mana_potions()
-                    self.process_utility_potions()
-                
-                # Print status (always show status regardless of focus)
-                self.print_status()
-                
-                time.sleep(0.1)
-                
-            except KeyboardInterrupt:
-                print("\nStopping potion manager...")
-                break
-            except Exception as e:
-                print(f"Error in main loop: {e}")
-                time.sleep(1)
+        self.engine.run()
+
+    def _print_snapshot(self, snapshot: EngineSnapshot):
+        self.print_status()
 
     def start(self):
         """Start the potion manager"""
         self.running = True
-        self.scan_all_slots()  # Initial scan
-        self.main_loop()
+        self.engine.subscribe(self._print_snapshot)
+        try:
+            self.main_loop()
+        finally:
+            self.engine.unsubscribe(self._print_snapshot)
+            self.running = False
+            self.stop_focus_tracking()
 
     def stop(self):
         """Stop the potion manager"""
         self.running = False
+        self.engine.stop()
+        self.stop_health_watchdog()
+        self.stop_input_dispatcher()
+        self.stop_focus_tracking()
+        self.stop_config_watcher()
 
 # This module provides the AdvancedPotionManager class for potion management.
 # For the GUI interface, use potions_gui.py
\ No newline at end of file
@@ -1,28 +1,34 @@
 """
 GUI interface for Advanced Potion Manager
 Similar to test_all_slots_gui but with auto-use controls
+With --daemon [ADDRESS] it is a thin client of a running potion_daemon.py
 """
 
+import argparse
 import tkinter as tk
-from tkinter import ttk, messagebox
-import threading
+from tkinter import ttk, messagebox, filedialog
 import time
-from datetime import datetime
-from PIL import Image, ImageTk
-import cv2
-import numpy as np
-from potions import AdvancedPotionManager, PotionCategory
+from startup import STARTUP
+from potions import AdvancedPotionManager, PotionCategory, EngineSnapshot, SlotSnapshot
+from gui_common import SlotPreview, WidgetDiffer, RefreshPump, LogView
+from activity_log import LEVELS
+from daemon_client import DaemonError
 import os
 import json
 
 class PotionManagerGUI:
-    def __init__(self, root):
+    def __init__(self, root, manager=None):
         self.root = root
         self.root.title("Advanced Potion Manager")
         self.root.geometry("1200x900")
         
-        # Initialize potion manager
-        self.manager = AdvancedPotionManager()
+        # Initialize potion manager (templates load after the window is up),
+        # unless a remote_manager.DaemonManager was passed in (client mode)
+        self.client_mode = manager is not None
+        if manager is None:
+            with STARTUP.phase("manager"):
+                manager = AdvancedPotionManager(load_templates=False)
+        self.manager = manager
         self.manager.use_gui_controls = True  # Enable GUI control mode
         
         # Initialize variables
@@ -31,7 +37,7 @@ class PotionManagerGUI:
         self.instant_vars = []
         self.enduring_vars = []
         self.monitoring = False
-        self.monitor_thread = None
+        self.differ = WidgetDiffer()
         
         # Create main frame
         main_frame = ttk.Frame(root, padding="10")
@@ -66,8 +72,33 @@ class PotionManagerGUI:
         # Update checkboxes in slots
         self.update_slot_checkboxes()
         
-        # Initial scan
-        self.scan_all_slots()
+        # A daemon may already be monitoring
+        if self.manager.engine.is_alive():
+            self.monitoring = True
+            self.monitor_button.configure(text="Stop Monitoring")
+        
+        # The engine drives detection; this window only displays its snapshots
+        self.refresh_pump = RefreshPump(self.root, lambda: self.manager.engine.latest,
+                                        self.apply_snapshot, self.manager.gui_refresh_rate,
+                                        on_frame=self.log_view.flush)
+        self.refresh_pump.start()
+        
+        # Templates and the initial scan load in the background once the window is shown
+        self.root.after_idle(self.on_window_ready)
+    
+    def on_window_ready(self):
+        """First idle moment after the window appeared: load templates off the GUI thread"""
+        STARTUP.record("until interactive", STARTUP.t0)
+        if self.client_mode:
+            self.log(f"Connected to the potion daemon at {self.manager.address}")
+            return
+        self.log("Loading templates...")
+        self.manager.load_templates_async(initial_scan=True, on_done=self.on_templates_loaded)
+    
+    def on_templates_loaded(self):
+        """Runs on the loader thread; the activity log is safe to use from there"""
+        self.log(STARTUP.summary(["until interactive", "templates", "import cv2", "first scan"]), "DEBUG")
+        self.log(STARTUP.report(), "DEBUG")  # Echoed to the console only with debug on
     
     def create_header(self, parent):
         """Create header with title and control buttons"""
@@ -202,6 +233,7 @@ class PotionManagerGUI:
             self.slot_widgets[slot_num] = {
                 'frame': slot_frame,
                 'current_image': current_image,
+                'preview': SlotPreview(current_image),
                 'potion_label': potion_label,
                 'type_label': type_label,
                 'uses_label': uses_label,
@@ -239,16 +271,33 @@ class PotionManagerGUI:
         log_frame = ttk.Frame(status_frame)
         log_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
         
+        # Log level filter and export
+        log_controls = ttk.Frame(log_frame)
+        log_controls.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        
+        ttk.Label(log_controls, text="Log level:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value="INFO")
+        log_level_combo = ttk.Combobox(log_controls, textvariable=self.log_level_var,
+                                       values=list(LEVELS), state='readonly', width=10)
+        log_level_combo.pack(side=tk.LEFT, padx=5)
+        log_level_combo.bind('<<ComboboxSelected>>',
+                             lambda e: self.log_view.set_level(self.log_level_var.get()))
+        
+        ttk.Button(log_controls, text="Export Log", command=self.export_log).pack(side=tk.RIGHT)
+        
         # Create text widget for logs
         self.log_text = tk.Text(log_frame, height=8, width=80, wrap=tk.WORD)
         log_scrollbar = ttk.Scrollbar(log_frame, orient="vertical", command=self.log_text.yview)
         self.log_text.configure(yscrollcommand=log_scrollbar.set)
         
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        log_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.log_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        log_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         
         log_frame.columnconfigure(0, weight=1)
-        log_frame.rowconfigure(0, weight=1)
+        log_frame.rowconfigure(1, weight=1)
+        
+        # Filled from the manager's activity log, one batch per GUI refresh
+        self.log_view = LogView(self.log_text, self.manager.activity_log)
     
     def update_slot_checkboxes(self):
         """Initialize checkbox states from manager settings"""
@@ -278,216 +327,129 @@ class PotionManagerGUI:
             self.manager.slot_enduring[slot_index] = self.enduring_vars[slot_index].get()
             self.log(f"Slot {slot_index+1} enduring: {'Yes' if self.enduring_vars[slot_index].get() else 'No'}")
     
-    def convert_cv2_to_tk(self, cv2_image, size=(60, 60)):
-        """Convert OpenCV image to Tkinter PhotoImage"""
-        # Convert from BGR to RGB
-        rgb_image = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2RGB)
-        
-        # Convert to PIL Image
-        pil_image = Image.fromarray(rgb_image)
-        
-        # Resize
-        pil_image = pil_image.resize(size, Image.Resampling.LANCZOS)
-        
-        # Convert to PhotoImage
-        return ImageTk.PhotoImage(pil_image)
-    
-    def update_slot_display(self, slot_num):
+    def update_slot_display(self, slot: SlotSnapshot):
         """Update display for a specific slot"""
-        if slot_num > len(self.manager.slots):
-            return
-            
-        slot = self.manager.slots[slot_num-1]
+        slot_num = slot.slot_number
         widgets = self.slot_widgets[slot_num]
         
-        # Capture current slot image
-        if slot_num <= len(self.manager.slot_regions) and self.manager.slot_regions[slot_num-1]:
-            try:
-                import pyautogui
-                region = self.manager.slot_regions[slot_num-1]
-                screenshot = pyautogui.screenshot(region=region)
-                slot_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-                
-                tk_image = self.convert_cv2_to_tk(slot_img)
-                widgets['current_image'].configure(image=tk_image)
-                widgets['current_image'].image = tk_image
-            except:
-                pass
-        
         # Update labels
-        widgets['potion_label'].configure(text=f"Potion: {slot.subtype.value}")
+        self.differ.configure(widgets['potion_label'], text=f"Potion: {slot.subtype.value}")
         
         # Type with color
         type_text = f"Type: {slot.category.value}"
         if slot.category == PotionCategory.HEALTH:
-            widgets['type_label'].configure(text=type_text, foreground="red")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="red")
         elif slot.category == PotionCategory.MANA:
-            widgets['type_label'].configure(text=type_text, foreground="blue")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="blue")
         elif slot.category == PotionCategory.UTILITY:
-            widgets['type_label'].configure(text=type_text, foreground="green")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="green")
         else:
-            widgets['type_label'].configure(text=type_text, foreground="gray")
+            self.differ.configure(widgets['type_label'], text=type_text, foreground="gray")
         
         # Uses
-        widgets['uses_label'].configure(text=f"Uses: {slot.uses_remaining}/{slot.max_uses}")
+        self.differ.configure(widgets['uses_label'], text=f"Uses: {slot.uses_remaining}/{slot.max_uses}")
         
         # Status
         current_time = time.time()
         if slot.uses_remaining == 0:
-            widgets['status_label'].configure(text="Status: Empty", foreground="red")
+            self.differ.configure(widgets['status_label'], text="Status: Empty", foreground="red")
         elif current_time < slot.active_until:
             remaining = slot.active_until - current_time
-            widgets['status_label'].configure(text=f"Status: Active ({remaining:.0f}s)", foreground="green")
+            self.differ.configure(widgets['status_label'], text=f"Status: Active ({remaining:.0f}s)", foreground="green")
+        elif slot.category == PotionCategory.UTILITY and slot.progress_active:
+            self.differ.configure(widgets['status_label'], text="Status: Buff Active", foreground="green")
         else:
-            # Check for progress bar
-            if slot.category == PotionCategory.UTILITY:
-                if self.manager.detect_slot_progress_bar(slot_num-1):
-                    widgets['status_label'].configure(text="Status: Buff Active", foreground="green")
-                else:
-                    widgets['status_label'].configure(text="Status: Ready", foreground="blue")
-            else:
-                widgets['status_label'].configure(text="Status: Ready", foreground="blue")
+            self.differ.configure(widgets['status_label'], text="Status: Ready", foreground="blue")
         
         # Update instant checkbox visibility
         if slot.category == PotionCategory.HEALTH:
-            widgets['instant_check'].configure(state="normal")
+            self.differ.configure(widgets['instant_check'], state="normal")
         else:
-            widgets['instant_check'].configure(state="disabled")
+            self.differ.configure(widgets['instant_check'], state="disabled")
             
         # Update enduring checkbox visibility
         if slot.category == PotionCategory.MANA:
-            widgets['enduring_check'].configure(state="normal")
+            self.differ.configure(widgets['enduring_check'], state="normal")
         else:
-            widgets['enduring_check'].configure(state="disabled")
+            self.differ.configure(widgets['enduring_check'], state="disabled")
     
     def scan_all_slots(self):
-        """Scan all slots and update displays"""
+        """Rescan all slots (the displays update from the engine's next snapshot)"""
+        if not self.manager.templates_ready.is_set():
+            self.log("Templates are still loading - slots are scanned as soon as they are ready")
+            return
         self.log("Scanning all slots...")
-        self.manager.scan_all_slots()
-        
-        # Update all slot displays
-        for slot_num in range(1, 6):
-            self.update_slot_display(slot_num)
-        
-        self.log("Scan complete")
+        self.manager.engine.rescan()
     
-    def update_game_status(self):
+    def update_game_status(self, snapshot: EngineSnapshot):
         """Update game status display"""
         # Update health/mana
-        health = self.manager.game_state.health_percentage
-        mana = self.manager.game_state.mana_percentage
-        
-        self.health_label.configure(text=f"Health: {health:.1f}%")
-        self.mana_label.configure(text=f"Mana: {mana:.1f}%")
+        self.differ.configure(self.health_label, text=f"Health: {snapshot.health_percentage:.1f}%")
+        self.differ.configure(self.mana_label, text=f"Mana: {snapshot.mana_percentage:.1f}%")
         
         # Update window focus status if enabled
-        if self.manager.require_window_focus:
-            if self.manager.poe_window_focused:
-                self.main_status_label.configure(text="Monitoring Active - POE Focused", foreground="green")
+        if self.monitoring and self.manager.require_window_focus:
+            if snapshot.focused:
+                self.differ.configure(self.main_status_label, text="Monitoring Active - POE Focused", foreground="green")
             else:
-                self.main_status_label.configure(text="Monitoring Active - POE Not Focused", foreground="orange")
+                self.differ.configure(self.main_status_label, text="Monitoring Active - POE Not Focused", foreground="orange")
         
         # Update active effects
         active_effects = []
         current_time = time.time()
-        for slot in self.manager.slots:
+        for slot in snapshot.slots:
             if current_time < slot.active_until:
                 remaining = slot.active_until - current_time
                 active_effects.append(f"{slot.subtype.value}({remaining:.0f}s)")
         
         if active_effects:
-            self.active_label.configure(text=f"Active: {', '.join(active_effects)}")
+            self.differ.configure(self.active_label, text=f"Active: {', '.join(active_effects)}")
         else:
-            self.active_label.configure(text="Active Effects: None")
+            self.differ.configure(self.active_label, text="Active Effects: None")
     
     def toggle_monitoring(self):
         """Toggle monitoring on/off"""
         if not self.monitoring:
+            if not self.manager.engine.start():
+                return  # The previous run is still stopping; the reason is in the log
             self.monitoring = True
             self.monitor_button.configure(text="Stop Monitoring")
-            self.main_status_label.configure(text="Monitoring Active", foreground="green")
+            self.differ.configure(self.main_status_label, text="Monitoring Active", foreground="green")
             self.log("Started monitoring")
-            
-            # Start monitoring thread
-            self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
-            self.monitor_thread.start()
         else:
             self.monitoring = False
+            self.manager.engine.stop()
             self.monitor_button.configure(text="Start Monitoring")
-            self.main_status_label.configure(text="Monitoring Stopped", foreground="orange")
+            self.differ.configure(self.main_status_label, text="Monitoring Stopped", foreground="orange")
             self.log("Stopped monitoring")
     
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        last_scan_time = 0
-        
-        while self.monitoring:
-            try:
-                current_time = time.time()
-                
-                # Check window focus if required
-                if self.manager.require_window_focus:
-                    self.manager.poe_window_focused = self.manager.is_poe_window_focused()
-                    
-                    # Only process potions if window is focused
-                    if self.manager.poe_window_focused:
-                        # Update game state
-                        self.manager.update_game_state()
-                        
-                        # Rescan slots periodically
-                        if current_time - last_scan_time > 5:  # Every 5 seconds
-                            self.manager.scan_all_slots()
-                            last_scan_time = current_time
-                            
-                            # Update slot displays
-                            self.root.after(0, self.update_all_slots)
-                        
-                        # Process potions
-                        self.manager.process_health_potions()
-                        self.manager.process_mana_potions()
-                        self.manager.process_utility_potions()
-                else:
-                    # Window focus not required, process normally
-                    # Update game state
-                    self.manager.update_game_state()
-                    
-                    # Rescan slots periodically
-                    if current_time - last_scan_time > 5:  # Every 5 seconds
-                        self.manager.scan_all_slots()
-                        last_scan_time = current_time
-                        
-                        # Update slot displays
-                        self.root.after(0, self.update_all_slots)
-                    
-                    # Process potions
-                    self.manager.process_health_potions()
-                    self.manager.process_mana_potions()
-                    self.manager.process_utility_potions()
-                
-                # Update status display (always update regardless of focus)
-                self.root.after(0, self.update_game_status)
-                
-                time.sleep(0.1)
-                
-            except Exception as e:
-                self.root.after(0, lambda: self.log(f"Error: {e}"))
-                time.sleep(1)
+    def apply_snapshot(self, snapshot: EngineSnapshot):
+        """Show an engine snapshot"""
+        self.update_game_status(snapshot)
+        # Previews come from the engine's frames and only redraw when a slot changed
+        for slot in snapshot.slots:
+            self.slot_widgets[slot.slot_number]['preview'].update(slot.frame, slot.frame_hash)
+        self.update_all_slots(snapshot)
     
-    def update_all_slots(self):
-        """Update all slot displays (called from thread)"""
-        for slot_num in range(1, 6):
-            self.update_slot_display(slot_num)
+    def update_all_slots(self, snapshot: EngineSnapshot):
+        """Update all slot displays"""
+        for slot in snapshot.slots:
+            self.update_slot_display(slot)
     
-    def log(self, message):
-        """Add message to log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        
-        # Limit log size
-        lines = int(self.log_text.index('end-1c').split('.')[0])
-        if lines > 100:
-            self.log_text.delete('1.0', '2.0')
+    def log(self, message, level="INFO"):
+        """Add message to the activity log; the log view shows it on the next refresh"""
+        self.manager.activity_log.log(message, level)
+    
+    def export_log(self):
+        """Save the whole activity log ring to a text file"""
+        path = filedialog.asksaveasfilename(defaultextension=".txt", initialfile="activity_log.txt",
+                                            filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if path:
+            try:
+                count = self.manager.activity_log.export(path)
+                self.log(f"Exported {count} log entries to {path}")
+            except OSError as e:
+                messagebox.showerror("Export Failed", str(e))
     
     def show_settings(self):
         """Show settings dialog"""
@@ -541,14 +503,31 @@ class PotionManagerGUI:
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Potion manager GUI")
+    parser.add_argument("--daemon", nargs="?", const="", metavar="ADDRESS",
+                        help="drive a running potion_daemon.py instead of a local engine")
+    args = parser.parse_args()
+    STARTUP.mark("imports")
     root = tk.Tk()
     
+    manager = None
+    if args.daemon is not None:
+        from remote_manager import DaemonManager
+        try:
+            manager = DaemonManager(args.daemon or None)
+        except (DaemonError, EOFError, OSError) as e:
+            messagebox.showerror("Potion Daemon", f"Could not connect to the potion daemon: {e}")
+            root.destroy()
+            return
+    
     # Style configuration
     style = ttk.Style()
     style.configure("Accent.TButton", foreground="green")
     
-    app = PotionManagerGUI(root)
+    app = PotionManagerGUI(root, manager)
     root.mainloop()
+    if manager is not None:
+        manager.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Daemon-backed stand-in for the potion manager, for the GUIs' client mode
+
+Started with --daemon, main_gui.py and potions_gui.py drive a running
+potion_daemon.py instead of owning an engine. DaemonManager offers the part
+of AdvancedPotionManager the GUIs use: the manager_config settings as
+attributes, the per-slot flag lists, an activity log and an engine with
+latest/start/stop/rescan. It holds two daemon connections: one for
+request/reply commands, and one whose snapshot and log stream a background
+thread copies into engine.latest and the local activity log.
+
+Frames are not streamed, so slot previews stay empty in client mode.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from activity_log import ActivityLog
+from daemon_client import SLOT_FLAG_SETTINGS, DaemonClient, DaemonError
+from manager_config import SETTINGS
+from potions import EngineSnapshot, PotionCategory, PotionSubtype, SlotSnapshot
+
+
+def snapshot_from_dict(data: Dict[str, Any]) -> EngineSnapshot:
+    """Rebuild a snapshot from potion_daemon.snapshot_to_dict (without frames)"""
+    slots = tuple(SlotSnapshot(
+        slot_number=slot["slot_number"],
+        subtype=PotionSubtype(slot["subtype"]),
+        category=PotionCategory(slot["category"]),
+        uses_remaining=slot["uses_remaining"],
+        max_uses=slot["max_uses"],
+        last_used=slot["last_used"],
+        active_until=slot["active_until"],
+        confidence=slot["confidence"],
+        progress_active=slot["progress_active"],
+        frame_hash=bytes.fromhex(slot["frame_hash"]) if slot["frame_hash"] else None,
+    ) for slot in data["slots"])
+    return EngineSnapshot(
+        timestamp=data["timestamp"],
+        tick=data["tick"],
+        running=data["running"],
+        idle=data["idle"],
+        focused=data["focused"],
+        health_percentage=data["health_percentage"],
+        mana_percentage=data["mana_percentage"],
+        slots=slots,
+        scan_count=data["scan_count"],
+        error_count=data["error_count"],
+        last_error=data["last_error"],
+    )
+
+
+class RemoteEngine:
+    """The daemon's engine as the GUIs see it: the streamed snapshot and control commands"""
+
+    def __init__(self, manager: "DaemonManager", running: bool):
+        self.manager = manager
+        self.latest: Optional[EngineSnapshot] = None
+        self.running = running  # As of the last snapshot
+
+    def is_alive(self) -> bool:
+        return self.running
+
+    def start(self) -> bool:
+        return bool(self.manager.command("start"))  # Empty if the daemon refused
+
+    def stop(self):
+        self.manager.command("stop")
+
+    def rescan(self):
+        self.manager.command("rescan")
+
+
+class SlotFlags(list):
+    """A per-slot flag list whose item assignments are sent to the daemon"""
+
+    def __init__(self, manager: "DaemonManager", name: str, values: List[bool]):
+        super().__init__(values)
+        self.manager = manager
+        self.name = name
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.manager.apply({self.name: list(self)})
+
+
+class DaemonManager:
+    """Manager stand-in that forwards settings and commands to a potion daemon"""
+
+    def __init__(self, address: Optional[str] = None):
+        self._commands = DaemonClient(address)
+        self.address = self._commands.address
+        self._lock = threading.Lock()  # One request/reply at a time on the command connection
+        self._closed = False
+        self.activity_log = ActivityLog()
+        self.templates_ready = threading.Event()
+        self.templates_ready.set()  # The daemon loads its own templates
+        self._settings: Dict[str, Any] = {}
+        self._store(self._commands.get_settings())
+        self.engine = RemoteEngine(self, self._commands.ping()["running"])
+        self._stream = DaemonClient(self.address)
+        self._stream_thread = threading.Thread(target=self._read_stream, name="DaemonStream", daemon=True)
+        self._stream_thread.start()
+
+    def _store(self, settings: Dict[str, Any]):
+        for name in SLOT_FLAG_SETTINGS:
+            if name in settings:
+                settings[name] = SlotFlags(self, name, settings[name])
+        self._settings.update(settings)
+
+    def _read_stream(self):
+        try:
+            for event in self._stream.subscribe("DEBUG"):  # The log view filters levels itself
+                if event["event"] == "snapshot":
+                    snapshot = snapshot_from_dict(event["snapshot"])
+                    self.engine.running = snapshot.running
+                    self.engine.latest = snapshot
+                else:
+                    for record in event["records"]:
+                        self.activity_log.log(record["message"], record["level"], record["timestamp"])
+        except (DaemonError, EOFError, OSError) as e:
+            if not self._closed:
+                self.activity_log.error(f"Daemon stream failed: {e}")
+        if not self._closed:
+            self.activity_log.error(f"Lost the connection to the potion daemon at {self.address}")
+            self.engine.running = False
+
+    def command(self, cmd: str, **params) -> Dict[str, Any]:
+        """Send one request; failures are logged instead of raised (these run from Tk callbacks)"""
+        try:
+            return self.request(cmd, **params)
+        except (DaemonError, EOFError, OSError) as e:
+            self.activity_log.error(f"Daemon {cmd} failed: {e}")
+            return {}
+
+    def request(self, cmd: str, **params) -> Dict[str, Any]:
+        with self._lock:
+            return self._commands.request(cmd, **params)
+
+    def settings(self) -> Dict[str, Any]:
+        """The daemon's value of every tunable in manager_config.SETTINGS"""
+        return {name: self._settings[name] for name in SETTINGS}
+
+    def update_settings(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Validated and applied by the daemon, all or nothing; raises DaemonError if refused"""
+        self._store(self.request("set", settings=changes)["settings"])
+        return {name: self._settings[name] for name in changes}
+
+    def apply(self, changes: Dict[str, Any]):
+        """update_settings that logs a refusal instead of raising"""
+        try:
+            self.update_settings(changes)
+        except (DaemonError, EOFError, OSError) as e:
+            self.activity_log.error(f"Daemon refused {', '.join(sorted(changes))}: {e}")
+
+    def stop(self):
+        self._closed = True
+        self._stream.close()
+        self._commands.close()
+
+
+def _setting_property(name: str) -> property:
+    def get(self):
+        return self._settings[name]
+
+    def set(self, value):
+        self.apply({name: value})
+
+    return property(get, set, doc=SETTINGS[name].description if name in SETTINGS else None)
+
+
+for _name in (*SETTINGS, "use_gui_controls", *SLOT_FLAG_SETTINGS):
+    setattr(DaemonManager, _name, _setting_property(_name))
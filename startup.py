@@ -0,0 +1,113 @@
+"""
+Startup helpers: lazy imports of heavy modules and per-phase timing
+
+lazy_import() returns a stand-in module that imports the real one on first
+attribute access, so ``cv2 = lazy_import("cv2")`` costs nothing until
+OpenCV is actually used. Lazy imports record how long they took in the
+STARTUP timer, alongside the phases the GUIs and the manager mark
+(config, templates, window, first scan...).
+"""
+
+import importlib
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+class StartupTimer:
+    """Named startup phases, timed from when this module was first imported"""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases: List[Tuple[str, float, float]] = []  # (name, start, end) relative to t0
+        self._last_mark = self.t0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t0
+
+    def record(self, name: str, start: float, end: Optional[float] = None):
+        """Record a phase from perf_counter() start to end (default: now)"""
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            self.phases.append((name, start - self.t0, end - self.t0))
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def mark(self, name: str):
+        """Record a phase running from the previous mark (or t0) until now"""
+        now = time.perf_counter()
+        with self._lock:
+            start, self._last_mark = self._last_mark, now
+        self.record(name, start, now)
+
+    def duration(self, name: str) -> Optional[float]:
+        with self._lock:
+            durations = [end - start for phase, start, end in self.phases if phase == name]
+        return sum(durations) if durations else None
+
+    def summary(self, names) -> str:
+        """One line with the durations of the given phases"""
+        parts = [f"{name} {self.duration(name):.2f}s" for name in names if self.duration(name) is not None]
+        return "Startup: " + ", ".join(parts)
+
+    def report(self) -> str:
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = ["Startup phases (start -> end, duration):"]
+        for name, start, end in phases:
+            lines.append(f"  {name:<24} {start * 1000:7.0f} -> {end * 1000:7.0f} ms  ({(end - start) * 1000:6.0f} ms)")
+        return "\n".join(lines)
+
+
+STARTUP = StartupTimer()
+
+
+class _LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access
+
+    After loading, the real module's namespace is copied in, so later
+    attribute lookups are plain dict hits. Thread-safe; assignments are
+    forwarded to the real module.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_load(self) -> types.ModuleType:
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                name = self.__name__
+                with STARTUP.phase(f"import {name}"):
+                    module = importlib.import_module(name)
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_module"] = module
+        return self._lazy_module
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_load(), name, value)
+        self.__dict__[name] = value
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module if it is already imported, otherwise a lazy stand-in for it"""
+    module = sys.modules.get(name)
+    return module if module is not None else _LazyModule(name)
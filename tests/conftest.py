@@ -0,0 +1,61 @@
+"""Shared fixtures: a manager without templates, screen or real key input"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from input_dispatch import InputDispatcher  # noqa: E402
+from potions import AdvancedPotionManager, PotionSubtype  # noqa: E402
+
+
+class RecordingBackend:
+    """Key backend that records presses instead of sending them"""
+    name = "recording"
+
+    def __init__(self):
+        self.pressed = []
+        self.sent = threading.Event()
+
+    def press(self, key: str):
+        self.pressed.append(key)
+        self.sent.set()
+
+    def close(self):
+        pass
+
+    def wait(self, count: int, timeout: float = 2.0) -> bool:
+        deadline = time.time() + timeout
+        while len(self.pressed) < count and time.time() < deadline:
+            time.sleep(0.005)
+        return len(self.pressed) >= count
+
+
+@pytest.fixture
+def keys():
+    return RecordingBackend()
+
+
+@pytest.fixture
+def manager(monkeypatch, keys):
+    monkeypatch.chdir(ROOT)  # Settings are read relative to the repository
+    manager = AdvancedPotionManager(load_templates=False)
+    manager.persist_slot_state = False
+    manager.require_window_focus = False
+    manager.trend_prediction = False
+    manager.dispatcher_factory = lambda: InputDispatcher(keys, min_key_spacing=0.0, burst_spacing=0.0)
+    yield manager
+    manager.stop()
+
+
+@pytest.fixture
+def health_slot(manager):
+    """Slot 1 holding a full 3-use instant health flask"""
+    slot = manager.slots[0]
+    manager.assign_slot(slot, PotionSubtype.LARGE_HEALTH_INSTANT, 3, 1.0)
+    return slot
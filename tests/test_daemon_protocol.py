@@ -0,0 +1,101 @@
+"""Daemon control protocol: commands, settings, snapshots and the GUI client"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from daemon_client import DaemonClient, DaemonError
+from potion_daemon import PotionDaemon, snapshot_to_dict
+from potions import EngineSnapshot, PotionCategory, PotionSubtype, SlotSnapshot
+from remote_manager import DaemonManager, snapshot_from_dict
+
+
+def wait_until(condition, timeout: float = 2.0) -> bool:
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def daemon(manager, tmp_path):
+    daemon = PotionDaemon(manager, address=str(tmp_path / "daemon.sock"), stream_interval=0.02)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    assert wait_until(lambda: os.path.exists(daemon.address))
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+
+
+@pytest.fixture
+def client(daemon):
+    with DaemonClient(daemon.address) as client:
+        yield client
+
+
+def test_ping(client):
+    reply = client.ping()
+    assert reply["pid"] == os.getpid()
+    assert reply["running"] is False
+
+
+def test_set_validates_and_applies(client, manager):
+    settings = client.set_settings(health_threshold=45)
+    assert settings["health_threshold"] == 45.0 and isinstance(settings["health_threshold"], float)
+    assert manager.health_threshold == 45.0
+
+
+def test_set_is_all_or_nothing(client, manager):
+    before = manager.health_threshold
+    with pytest.raises(DaemonError, match="mana_threshold"):
+        client.set_settings(health_threshold=before + 1, mana_threshold=140)
+    assert manager.health_threshold == before
+
+
+def test_slot_flags_need_one_value_per_slot(client, manager):
+    with pytest.raises(DaemonError, match="one value per slot"):
+        client.set_settings(slot_auto_use=[True])
+    flags = [False, True, True, True, False]
+    assert client.set_settings(slot_auto_use=flags)["slot_auto_use"] == flags
+    assert list(manager.slot_auto_use) == flags
+
+
+def test_unknown_command_is_refused(client):
+    with pytest.raises(DaemonError, match="Unknown command"):
+        client.request("launch")
+    assert client.ping()  # The connection survives a refused request
+
+
+def test_snapshot_round_trip():
+    slot = SlotSnapshot(slot_number=1, subtype=PotionSubtype.LARGE_HEALTH_INSTANT,
+                        category=PotionCategory.HEALTH, uses_remaining=2, max_uses=3, last_used=12.5,
+                        active_until=0.0, confidence=0.9, progress_active=False, frame_hash=b"\x01\x02")
+    snapshot = EngineSnapshot(timestamp=100.0, tick=7, running=True, idle=False, focused=True,
+                              health_percentage=55.0, mana_percentage=80.0, slots=(slot,), scan_count=2,
+                              error_count=1, last_error="boom")
+    assert snapshot_from_dict(snapshot_to_dict(snapshot)) == snapshot
+
+
+def test_daemon_manager_forwards_settings_and_streams(daemon, manager):
+    remote = DaemonManager(daemon.address)
+    try:
+        assert remote.health_threshold == manager.health_threshold
+        remote.health_threshold = 42.0
+        assert manager.health_threshold == 42.0
+        remote.slot_auto_use[1] = False
+        assert not manager.slot_auto_use[1]
+
+        def streamed() -> bool:
+            manager.engine.publish(force=True)  # Until the stream has subscribed
+            return remote.engine.latest is not None
+
+        assert wait_until(streamed)
+        assert len(remote.engine.latest.slots) == len(manager.slots)
+        manager.activity_log.warning("from the daemon")
+        assert wait_until(lambda: any(record.message == "from the daemon" and record.level == "WARNING"
+                                      for record in remote.activity_log.since()))
+    finally:
+        remote.stop()
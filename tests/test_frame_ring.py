@@ -0,0 +1,98 @@
+"""Shared-memory frame ring: crops, staleness and the seqlock"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import LATEST, FrameRing, StaleFrameError
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(16, 8, slots=2)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def gradient(width=16, height=8) -> np.ndarray:
+    img = np.zeros((height, width, 3), np.uint8)
+    img[..., 0] = np.arange(width)[None, :]
+    img[..., 1] = np.arange(height)[:, None]
+    return img
+
+
+def test_crop_in_desktop_coordinates(ring):
+    img = gradient()
+    ring.write(img, 100, 200, time.time())
+    crop = ring.read((103, 202, 4, 3), max_age=1.0)
+    assert np.array_equal(crop, img[2:5, 3:7])
+
+
+def test_region_partly_outside_the_frame_reads_black(ring):
+    img = gradient() + 1
+    ring.write(img, 100, 200, time.time())
+    crop = ring.read((98, 206, 4, 4), max_age=1.0)
+    assert np.array_equal(crop[:2, 2:], img[6:8, 0:2])
+    assert not crop[:, :2].any()
+    assert not crop[2:].any()
+
+
+def test_short_frame_clears_the_rest_of_its_slot():
+    ring = FrameRing(16, 8, slots=1)
+    try:
+        ring.write(np.full((8, 16, 3), 255, np.uint8), 0, 0, time.time())
+        ring.write(np.full((4, 10, 3), 7, np.uint8), 0, 0, time.time())  # Window partly off-screen
+        crop = ring.read((0, 0, 16, 8), max_age=1.0)
+        assert (crop[:4, :10] == 7).all()
+        assert not crop[4:].any() and not crop[:, 10:].any()
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_no_frame_yet_is_stale(ring):
+    with pytest.raises(StaleFrameError, match="No frame"):
+        ring.read((0, 0, 2, 2), max_age=1.0, timeout=0.05)
+
+
+def test_old_frame_is_stale(ring):
+    ring.write(gradient(), 0, 0, time.time() - 5)
+    started = time.time()
+    with pytest.raises(StaleFrameError, match="old"):
+        ring.read((0, 0, 2, 2), max_age=0.1, timeout=0.1, stale_after=1.0)
+    assert time.time() - started < 0.5
+
+
+def test_slightly_old_frame_is_used_after_the_wait(ring):
+    img = gradient()
+    ring.write(img, 0, 0, time.time() - 0.3)
+    crop = ring.read((0, 0, 2, 2), max_age=0.1, timeout=0.05, stale_after=1.0)
+    assert np.array_equal(crop, img[:2, :2])
+
+
+def test_frame_being_written_is_never_returned(ring):
+    ring.write(gradient(), 0, 0, time.time())
+    slot = int(ring.header[LATEST]) % ring.slots
+    seq = int(ring.meta[slot, 0])
+    ring.meta[slot, 0] = -1  # Writer is in the middle of this slot
+    with pytest.raises(StaleFrameError):
+        ring.read((0, 0, 2, 2), max_age=1.0, timeout=0.05)
+
+    finish = threading.Timer(0.05, lambda: ring.meta.__setitem__((slot, 0), seq))
+    finish.start()
+    crop = ring.read((0, 0, 2, 2), max_age=1.0, timeout=1.0)
+    finish.join()
+    assert np.array_equal(crop, gradient()[:2, :2])
+
+
+def test_attached_reader_sees_the_writers_frames(ring):
+    reader = FrameRing(ring.width, ring.height, ring.slots, name=ring.name)
+    try:
+        img = gradient()
+        ring.write(img, 5, 5, time.time())
+        assert np.array_equal(reader.read((5, 5, 16, 8), max_age=1.0), img)
+    finally:
+        reader.close()
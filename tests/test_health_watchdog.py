@@ -0,0 +1,77 @@
+"""Health watchdog: lock-free presses handed to the main loop"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+class AliveWatchdog:
+    """Marks the watchdog as running without starting its thread"""
+    latest = None
+
+    def is_alive(self):
+        return True
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def low_health(manager, health_slot):
+    manager.measure_health = lambda: (20.0, True)
+    manager.measure_mana = lambda: (100.0, True)
+    manager.detect_slot_progress_bar = lambda i: False
+    manager.capture_slot_state = lambda i: (np.zeros((8, 8, 3), np.uint8), None)
+    manager.health_watchdog = AliveWatchdog()
+    return manager
+
+
+def test_tick_does_not_wait_for_state_lock(low_health, keys):
+    held, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with low_health.state_lock:
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    held.wait(1)
+    try:
+        started = time.perf_counter()
+        low_health.health_watchdog_tick()
+        elapsed = time.perf_counter() - started
+        assert keys.wait(1)
+    finally:
+        release.set()
+        holder.join()
+    assert elapsed < 0.5
+    assert keys.pressed == ["1"]
+
+
+def test_main_loop_books_handed_over_press(low_health, health_slot, keys):
+    low_health.health_watchdog_tick()
+    assert keys.wait(1)
+    assert health_slot.uses_remaining == 3  # Not booked by the watchdog itself
+    (slot_index, pressed_at, pending), = low_health.watchdog_presses
+
+    low_health.update_game_state()
+    low_health.decide_and_apply()
+
+    assert not low_health.watchdog_presses
+    assert health_slot.uses_remaining == 2
+    assert health_slot.last_used == pressed_at
+    assert low_health.last_health_potion_time == pressed_at
+    assert low_health.pending_presses["1"] is pending
+    assert keys.pressed == ["1"]  # The main loop leaves health flasks to the watchdog
+
+
+def test_watchdog_keeps_its_cooldown_until_booked(low_health, keys):
+    for _ in range(5):
+        low_health.health_watchdog_tick()
+    assert keys.wait(1)
+    time.sleep(0.05)
+    assert keys.pressed == ["1"]
+    assert len(low_health.watchdog_presses) == 1
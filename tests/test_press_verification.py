@@ -0,0 +1,134 @@
+"""Press verification: pre-press images, confirmation and refused keys"""
+
+import glob
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from input_dispatch import InputDispatcher
+from potions import PendingPress
+
+BEFORE = np.zeros((8, 8, 3), np.uint8)
+
+
+class SlotCamera:
+    """Stands in for capture_slot_state: returns .image and records every call"""
+
+    def __init__(self):
+        self.image = BEFORE
+        self.calls = []
+
+
+@pytest.fixture
+def camera(manager):
+    """Records for each capture whether a key was queued by then and whether the state lock was free"""
+    camera = SlotCamera()
+
+    def lock_free() -> bool:
+        result = []
+
+        def probe():
+            result.append(manager.state_lock.acquire(blocking=False))
+            if result[0]:
+                manager.state_lock.release()
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def capture(slot_index):
+        dispatcher = manager.input_dispatcher
+        queued = dispatcher is not None and (dispatcher.pending() > 0 or len(dispatcher.history) > 0)
+        camera.calls.append({"slot": slot_index, "queued": queued, "lock_free": lock_free()})
+        return camera.image, None
+
+    manager.capture_slot_state = capture
+    manager.verify_delay = 0.0
+    return camera
+
+
+def test_pre_press_capture_before_queue_and_outside_lock(manager, health_slot, camera, keys):
+    assert manager.activate_slots([health_slot]) == [health_slot]
+    assert camera.calls == [{"slot": 0, "queued": False, "lock_free": True}]
+    assert manager.pending_presses["1"].before_slot is BEFORE
+    assert keys.wait(1)
+
+
+def test_recent_frame_is_reused(manager, health_slot, camera, keys):
+    frame = np.full((8, 8, 3), 50, np.uint8)
+    manager.record_slot_frame(0, frame)
+    manager.activate_slots([health_slot])
+    assert camera.calls == []
+    assert np.array_equal(manager.pending_presses["1"].before_slot, frame)
+
+
+def test_unchanged_slot_is_rescanned_not_pressed_again(manager, health_slot, camera, keys):
+    rescans = []
+    manager.scan_slot = rescans.append
+    manager.activate_slots([health_slot])
+    assert keys.wait(1)
+    time.sleep(0.02)
+    manager.verify_pending_presses()
+    assert rescans == [0]
+    assert manager.pending_presses == {}
+    time.sleep(0.05)
+    assert keys.pressed == ["1"]
+    assert health_slot.uses_remaining == 2
+
+
+def test_changed_slot_confirms_press(manager, health_slot, camera, keys):
+    rescans = []
+    manager.scan_slot = rescans.append
+    manager.activate_slots([health_slot])
+    assert keys.wait(1)
+    time.sleep(0.02)
+    camera.image = np.full((8, 8, 3), 200, np.uint8)
+    manager.verify_pending_presses()
+    assert rescans == []
+    assert manager.pending_presses == {}
+
+
+def test_refused_key_gives_the_use_back(manager, health_slot, camera):
+    unblock = threading.Event()
+
+    class BlockingBackend:
+        name = "blocking"
+
+        def press(self, key):
+            unblock.wait(2)
+
+        def close(self):
+            pass
+
+    manager.dispatcher_factory = lambda: InputDispatcher(BlockingBackend(), min_key_spacing=0.0)
+    try:
+        assert manager.activate_slots([health_slot]) == [health_slot]
+        used_at = health_slot.last_used
+        time.sleep(0.05)  # First press is now stuck in the backend with its key still queued
+        assert manager.activate_slots([health_slot]) == []
+        assert health_slot.uses_remaining == 2
+        assert health_slot.last_used == used_at
+    finally:
+        unblock.set()
+
+
+def labeled_pairs():
+    for full in sorted(glob.glob(os.path.join(ROOT, "full", "slot*", "*.png"))):
+        empty = full.replace(os.path.join(ROOT, "full"), os.path.join(ROOT, "empty"), 1)
+        if os.path.exists(empty):
+            yield full, empty
+
+
+@pytest.mark.parametrize("full, empty", list(labeled_pairs()),
+                         ids=lambda path: os.path.relpath(path, ROOT))
+def test_default_threshold_on_labeled_images(manager, full, empty):
+    full_img, empty_img = cv2.imread(full), cv2.imread(empty)
+    pending = PendingPress(0, "1", full_img, None, 0.0)
+    assert manager.press_consumed(pending, empty_img, None)
+    assert not manager.press_consumed(pending, full_img.copy(), None)
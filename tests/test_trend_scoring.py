@@ -0,0 +1,60 @@
+"""Trend prediction scoring: hits, misses and pre-empted windows"""
+
+import pytest
+
+THRESHOLD = 50.0
+
+
+@pytest.fixture
+def trend(manager):
+    manager.trend_prediction = True
+    manager.trend_lookahead_ms = 500
+    return manager
+
+
+def falling(manager, start=0.0):
+    """Feed a fast health drop that stays above the threshold; returns the time of the last sample"""
+    for i, value in enumerate((100.0, 80.0, 60.0)):
+        manager.project_trend("health", value, True, THRESHOLD, start + 0.1 * i)
+    assert manager._prediction_window["health"] is not None  # A crossing was predicted
+    return start + 0.2
+
+
+def test_crossing_within_lookahead_is_a_hit(trend):
+    now = falling(trend)
+    trend.project_trend("health", 40.0, True, THRESHOLD, now + 0.1)
+    assert trend.stats["health_prediction_hits"] == 1
+    assert trend.stats["health_prediction_misses"] == 0
+    assert trend.prediction_hit_rate("health") == 1.0
+
+
+def test_no_crossing_by_the_deadline_is_a_miss(trend):
+    now = falling(trend)
+    trend.project_trend("health", 70.0, True, THRESHOLD, now + 0.3)
+    trend.project_trend("health", 75.0, True, THRESHOLD, now + 0.6)
+    assert trend.stats["health_prediction_misses"] == 1
+    assert trend.stats["health_prediction_hits"] == 0
+    assert trend.prediction_hit_rate("health") == 0.0
+
+
+def test_flask_press_in_the_window_preempts_it(trend):
+    now = falling(trend)
+    trend.last_flask_time["health"] = now + 0.05
+    trend.project_trend("health", 40.0, True, THRESHOLD, now + 0.1)
+    assert trend.stats["health_prediction_preempted"] == 1
+    assert trend.stats["health_prediction_hits"] == 0
+    assert trend.prediction_hit_rate("health") is None  # Pre-empted windows don't count
+
+
+def test_press_of_the_other_kind_does_not_preempt(trend):
+    now = falling(trend)
+    trend.last_flask_time["mana"] = now + 0.05
+    trend.project_trend("health", 40.0, True, THRESHOLD, now + 0.1)
+    assert trend.stats["health_prediction_hits"] == 1
+
+
+def test_inexact_reading_drops_the_window(trend):
+    now = falling(trend)
+    assert trend.project_trend("health", 40.0, False, THRESHOLD, now + 0.1) is None
+    assert trend._prediction_window["health"] is None
+    assert trend.stats["health_prediction_hits"] == 0
@@ -0,0 +1,131 @@
+"""
+Persistent warm-start state
+
+The engine's per-slot state (potion identity, uses, cooldown timestamps,
+buff expiry and the content hash of the slot's last capture) is written to
+a small fixed-size file through mmap, so saving is one memory copy and
+survives a crash of the process. On the next start the manager re-captures
+each slot and restores the saved state for every slot whose frame hash
+still matches, instead of running the template detectors on it.
+
+A record carries a CRC (a half-written record is ignored), a hash of the
+slot regions (state saved for another layout is ignored) and wall-clock
+timestamps, so cooldowns and buff timers carry over restarts.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+MAGIC = b"POTW"
+VERSION = 1
+# magic, version, slot count, write counter, saved at, last health flask, layout hash, crc of the rest
+HEADER = struct.Struct("<4sHHQdd8sI")
+# subtype value, uses, max uses, last used, active until, confidence, frame hash, frame hash present
+SLOT = struct.Struct("<24shhddd8s?")
+DEFAULT_PATH = os.path.join("settings", "engine_state.bin")
+
+
+@dataclass(frozen=True)
+class SlotState:
+    subtype: str
+    uses_remaining: int
+    max_uses: int
+    last_used: float
+    active_until: float
+    confidence: float
+    frame_hash: Optional[bytes]
+
+
+@dataclass(frozen=True)
+class WarmState:
+    saved_at: float
+    last_health_potion_time: float
+    layout_hash: bytes
+    slots: Tuple[SlotState, ...]
+
+
+def layout_hash(slot_regions: Sequence, coordinate_space: str) -> bytes:
+    """Identifies the slot layout the state was saved for"""
+    regions = [tuple(int(v) for v in region) if region else None for region in slot_regions]
+    return hashlib.blake2b(repr((coordinate_space, regions)).encode(), digest_size=8).digest()
+
+
+class WarmStateStore:
+    """Fixed-size state file mapped into memory, for one slot count"""
+
+    def __init__(self, slot_count: int, path: str = DEFAULT_PATH):
+        self.slot_count = slot_count
+        self.path = path
+        self.size = HEADER.size + SLOT.size * slot_count
+        self.writes = 0
+        self._map: Optional[mmap.mmap] = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._last_saved: Optional[tuple] = None
+
+    def _open(self) -> mmap.mmap:
+        if self._map is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._file = os.fdopen(fd, "r+b")
+            if os.fstat(fd).st_size != self.size:
+                self._file.truncate(self.size)  # New file or another slot count: start blank
+            self._map = mmap.mmap(self._file.fileno(), self.size)
+        return self._map
+
+    def load(self) -> Optional[WarmState]:
+        """The saved state, or None if there is none or it doesn't check out"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) != self.size:
+            return None
+        with self._lock:
+            data = bytes(self._open()[:self.size])
+        magic, version, count, _, saved_at, last_health, layout, crc = HEADER.unpack_from(data)
+        payload = data[HEADER.size:]
+        if magic != MAGIC or version != VERSION or count != self.slot_count or \
+                zlib.crc32(data[:HEADER.size - 4] + payload) != crc:
+            return None
+        slots = []
+        for i in range(count):
+            subtype, uses, max_uses, last_used, active_until, confidence, frame_hash, has_hash = \
+                SLOT.unpack_from(payload, i * SLOT.size)
+            slots.append(SlotState(subtype.rstrip(b"\0").decode(), uses, max_uses, last_used, active_until,
+                                   confidence, frame_hash if has_hash else None))
+        return WarmState(saved_at, last_health, layout, tuple(slots))
+
+    def save(self, slots: List[SlotState], last_health_potion_time: float, layout: bytes) -> bool:
+        """Write the state unless nothing but the time changed; True if written"""
+        payload = b"".join(SLOT.pack(slot.subtype.encode()[:24], slot.uses_remaining, slot.max_uses,
+                                     slot.last_used, slot.active_until, slot.confidence,
+                                     slot.frame_hash or b"", slot.frame_hash is not None)
+                           for slot in slots)
+        key = (payload, last_health_potion_time, layout)
+        with self._lock:
+            if key == self._last_saved:
+                return False
+            self._last_saved = key
+            self.writes += 1
+            header = HEADER.pack(MAGIC, VERSION, len(slots), self.writes, time.time(),
+                                 last_health_potion_time, layout, 0)[:-4]
+            self._open()[:self.size] = header + struct.pack("<I", zlib.crc32(header + payload)) + payload
+        return True
+
+    def clear(self):
+        """Forget the saved state (the next start scans every slot)"""
+        with self._lock:
+            self._last_saved = None
+            if os.path.exists(self.path):
+                self._open()[:HEADER.size] = bytes(HEADER.size)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
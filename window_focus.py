@@ -0,0 +1,433 @@
+"""
+Event-driven window focus tracking for the potion manager
+
+A focus provider keeps a cached ``focused`` flag that is updated by
+foreground-window change events, so checking focus costs nothing per tick:
+- Linux/X11: persistent python-xlib connection watching _NET_ACTIVE_WINDOW
+- Windows: SetWinEventHook(EVENT_SYSTEM_FOREGROUND) on a message-loop thread
+- Anything else: a slow background poll of a fallback check function
+
+Game windows are matched by PID against the cached game process
+(poe_process.GameProcessFinder), with the window title as a fallback.
+
+The event-driven providers also track the game window's client rectangle
+(``client_rect``), re-resolved only when the window is moved or resized, so
+capture regions can be stored relative to the game window.
+"""
+
+import platform
+import select
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+from poe_process import GameProcessFinder
+
+GAME_WINDOW_TITLE = "path of exile"
+
+# Setup config entries holding screen coordinates, by shape
+CONFIG_REGION_KEYS = ("health_bar_region", "mana_bar_region", "health_number_region", "mana_number_region",
+                      "health_orb_column", "mana_orb_column")
+CONFIG_REGION_LIST_KEYS = ("slot_regions", "slot_progress_bars")
+CONFIG_POINT_KEYS = ("health_pixel_point", "mana_pixel_point")
+CONFIG_POINT_LIST_KEYS = ("health_probe_points", "mana_probe_points")
+
+Rect = Tuple[int, int, int, int]
+
+
+def is_game_title(title: Optional[str]) -> bool:
+    return bool(title) and GAME_WINDOW_TITLE in title.lower()
+
+
+def translate_config(config: dict, dx: int, dy: int) -> dict:
+    """Copy of a setup config with every region and point moved by (dx, dy)"""
+    def move(value):
+        if value is None:
+            return None
+        return [value[0] + dx, value[1] + dy] + list(value[2:])
+
+    config = dict(config)
+    for key in CONFIG_REGION_KEYS + CONFIG_POINT_KEYS:
+        if config.get(key):
+            config[key] = move(config[key])
+    for key in CONFIG_REGION_LIST_KEYS + CONFIG_POINT_LIST_KEYS:
+        if config.get(key):
+            config[key] = [move(value) for value in config[key]]
+    return config
+
+
+class FocusProvider(ABC):
+    """Cached game-focus flag, updated from a background thread"""
+    event_driven = False
+
+    def __init__(self):
+        self.focused = False
+        self._condition = threading.Condition()
+        self._callbacks: List[Callable[[bool], None]] = []
+        self.client_rect: Optional[Rect] = None  # Game client area (x, y, w, h) on the desktop
+        self._geometry_callbacks: List[Callable[[Optional[Rect]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_callback(self, callback: Callable[[bool], None]):
+        """Call callback(focused) from the provider thread whenever focus changes"""
+        self._callbacks.append(callback)
+
+    def add_geometry_callback(self, callback: Callable[[Optional[Rect]], None]):
+        """Call callback(client_rect) whenever the game window moves or resizes"""
+        self._geometry_callbacks.append(callback)
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Block until the focus flag changes; returns the (possibly unchanged) flag"""
+        with self._condition:
+            current = self.focused
+            self._condition.wait_for(lambda: self.focused != current or self._stop_event.is_set(),
+                                     timeout)
+            return self.focused
+
+    def _set_focused(self, focused: bool):
+        if focused == self.focused:
+            return
+        with self._condition:
+            self.focused = focused
+            self._condition.notify_all()
+        for callback in self._callbacks:
+            try:
+                callback(focused)
+            except Exception as e:
+                print(f"Focus callback error: {e}")
+
+    def _set_client_rect(self, rect: Optional[Rect]):
+        if rect == self.client_rect:
+            return
+        self.client_rect = rect
+        for callback in self._geometry_callbacks:
+            try:
+                callback(rect)
+            except Exception as e:
+                print(f"Geometry callback error: {e}")
+
+    @abstractmethod
+    def _run(self):
+        """Background thread body: keep focused (and client_rect) up to date until stopped"""
+
+
+class PollingFocusProvider(FocusProvider):
+    """Fallback provider: polls a check function off the hot path (no window geometry)"""
+
+    def __init__(self, check: Callable[[], bool], interval: float = 0.5):
+        super().__init__()
+        self.check = check
+        self.interval = interval
+        self._wake = threading.Event()
+
+    def set_interval(self, interval: float):
+        """Change the poll interval, re-polling right away instead of after the old one"""
+        self.interval = interval
+        self._wake.set()
+
+    def stop(self):
+        super().stop()
+        self._wake.set()
+
+    def start(self):
+        # Seed the flag so the first read after start() is meaningful
+        try:
+            self._set_focused(bool(self.check()))
+        except Exception as e:
+            print(f"Focus poll error: {e}")
+        super().start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._set_focused(bool(self.check()))
+            except Exception as e:
+                print(f"Focus poll error: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+class X11FocusProvider(FocusProvider):
+    """Watches _NET_ACTIVE_WINDOW on the root window over one persistent X connection
+
+    The game window itself is watched for ConfigureNotify so its client
+    rectangle is only re-read when it actually moves or resizes.
+    """
+    event_driven = True
+
+    def __init__(self, finder: Optional[GameProcessFinder] = None):
+        super().__init__()
+        from Xlib import X, display  # Optional dependency (python-xlib)
+        self.finder = finder or GameProcessFinder()
+        self._X = X
+        self.display = display.Display()
+        self.root = self.display.screen().root
+        self.NET_ACTIVE_WINDOW = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        self.NET_CLIENT_LIST = self.display.intern_atom("_NET_CLIENT_LIST")
+        self.NET_WM_NAME = self.display.intern_atom("_NET_WM_NAME")
+        self.NET_WM_PID = self.display.intern_atom("_NET_WM_PID")
+        self.UTF8_STRING = self.display.intern_atom("UTF8_STRING")
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.active_window = None
+        self.game_window = None
+        self._refresh()
+        if self.game_window is None:
+            self._find_game_window()
+
+    def window_title(self, window) -> Optional[str]:
+        prop = window.get_full_property(self.NET_WM_NAME, self.UTF8_STRING)
+        if prop is not None and prop.value:
+            value = prop.value
+            return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+        name = window.get_wm_name()
+        return name.decode("utf-8", "replace") if isinstance(name, bytes) else name
+
+    def window_pid(self, window) -> Optional[int]:
+        prop = window.get_full_property(self.NET_WM_PID, self._X.AnyPropertyType)
+        return int(prop.value[0]) if prop is not None and len(prop.value) else None
+
+    def window_matches(self, window) -> bool:
+        pid = self.window_pid(window)
+        if pid and self.finder.is_game_pid(pid):
+            return True
+        if pid and self.finder.current() is not None:
+            return False  # The game is running under another PID
+        # No _NET_WM_PID or no local game process (e.g. forwarded X): match the title
+        return is_game_title(self.window_title(window))
+
+    def _find_game_window(self):
+        """Look the game up among the managed windows, focused or not"""
+        prop = self.root.get_full_property(self.NET_CLIENT_LIST, self._X.AnyPropertyType)
+        for window_id in (prop.value if prop is not None else ()):
+            window = self.display.create_resource_object("window", window_id)
+            try:
+                if self.window_matches(window):
+                    self._track_game_window(window)
+                    return
+            except Exception:
+                continue
+
+    def _track_game_window(self, window):
+        if self.game_window is not None and self.game_window.id == window.id:
+            return
+        window.change_attributes(event_mask=self._X.StructureNotifyMask)
+        self.game_window = window
+        self._update_geometry()
+
+    def _update_geometry(self):
+        try:
+            geometry = self.game_window.get_geometry()
+            origin = self.root.translate_coords(self.game_window, 0, 0)
+            self._set_client_rect((origin.x, origin.y, geometry.width, geometry.height))
+        except Exception:
+            # Game window was destroyed
+            self.game_window = None
+            self._set_client_rect(None)
+
+    def _refresh(self):
+        prop = self.root.get_full_property(self.NET_ACTIVE_WINDOW, self._X.AnyPropertyType)
+        window_id = prop.value[0] if prop is not None and len(prop.value) else 0
+        if not window_id:
+            self.active_window = None
+            self._set_focused(False)
+            return
+        self.active_window = self.display.create_resource_object("window", window_id)
+        try:
+            focused = self.window_matches(self.active_window)
+            if focused:
+                self._track_game_window(self.active_window)
+            self._set_focused(focused)
+        except Exception:
+            # Window vanished between the event and the query
+            self._set_focused(False)
+
+    def _run(self):
+        fd = self.display.fileno()
+        while not self._stop_event.is_set():
+            # Wake up periodically so stop() is honoured without a pending event
+            readable, _, _ = select.select([fd], [], [], 0.5)
+            if not readable and not self.display.pending_events():
+                continue
+            refresh = geometry = False
+            while self.display.pending_events():
+                event = self.display.next_event()
+                if (event.type == self._X.PropertyNotify and
+                        event.atom == self.NET_ACTIVE_WINDOW):
+                    refresh = True
+                elif (event.type in (self._X.ConfigureNotify, self._X.DestroyNotify) and
+                      self.game_window is not None and event.window.id == self.game_window.id):
+                    geometry = True
+            if refresh:
+                self._refresh()
+            if geometry and self.game_window is not None:
+                self._update_geometry()
+        self.display.close()
+
+
+class WindowsFocusProvider(FocusProvider):
+    """Receives EVENT_SYSTEM_FOREGROUND notifications through SetWinEventHook
+
+    A second hook, scoped to the game's process, reports
+    EVENT_OBJECT_LOCATIONCHANGE so the client rectangle follows window moves.
+    """
+    event_driven = True
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    EVENT_OBJECT_LOCATIONCHANGE = 0x800B
+    OBJID_WINDOW = 0
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+
+    def __init__(self, finder: Optional[GameProcessFinder] = None):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+        self.finder = finder or GameProcessFinder()
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        # Private library handles, so these prototypes don't leak into other callers of windll
+        self.user32 = ctypes.WinDLL("user32")
+        self.kernel32 = ctypes.WinDLL("kernel32")
+        self.WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                               wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self._declare_prototypes()
+        self._thread_id = None
+        self._hook_proc = None  # Keep a reference so the callback isn't collected
+        self._geometry_proc = None
+        self._geometry_hook = None
+        self.game_hwnd = self.user32.FindWindowW(None, "Path of Exile") or None
+        if self.game_hwnd:
+            self._set_client_rect(self.client_rect_of(self.game_hwnd))
+
+    def _declare_prototypes(self):
+        """Handle-typed signatures, so HWNDs and hook handles aren't truncated to 32-bit ints"""
+        ctypes, wintypes, user32 = self.ctypes, self.wintypes, self.user32
+        prototypes = {
+            "SetWinEventHook": (wintypes.HANDLE, [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, self.WinEventProc,
+                                                  wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]),
+            "UnhookWinEvent": (wintypes.BOOL, [wintypes.HANDLE]),
+            "GetForegroundWindow": (wintypes.HWND, []),
+            "FindWindowW": (wintypes.HWND, [wintypes.LPCWSTR, wintypes.LPCWSTR]),
+            "GetWindowThreadProcessId": (wintypes.DWORD, [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]),
+            "GetClientRect": (wintypes.BOOL, [wintypes.HWND, ctypes.POINTER(wintypes.RECT)]),
+            "ClientToScreen": (wintypes.BOOL, [wintypes.HWND, ctypes.POINTER(wintypes.POINT)]),
+            "GetMessageW": (wintypes.BOOL, [ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT]),
+            "TranslateMessage": (wintypes.BOOL, [ctypes.POINTER(wintypes.MSG)]),
+            "DispatchMessageW": (wintypes.LPARAM, [ctypes.POINTER(wintypes.MSG)]),
+            "PostThreadMessageW": (wintypes.BOOL, [wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]),
+        }
+        for name, (restype, argtypes) in prototypes.items():
+            function = getattr(user32, name)
+            function.restype = restype
+            function.argtypes = argtypes
+        self.kernel32.GetCurrentThreadId.restype = wintypes.DWORD
+        self.kernel32.GetCurrentThreadId.argtypes = []
+
+    def window_pid(self, hwnd) -> int:
+        pid = self.wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(hwnd, self.ctypes.byref(pid))
+        return pid.value
+
+    def window_matches(self, hwnd) -> bool:
+        return self.finder.is_game_pid(self.window_pid(hwnd))
+
+    def client_rect_of(self, hwnd) -> Optional[Rect]:
+        rect = self.wintypes.RECT()
+        origin = self.wintypes.POINT(0, 0)
+        if not (self.user32.GetClientRect(hwnd, self.ctypes.byref(rect)) and
+                self.user32.ClientToScreen(hwnd, self.ctypes.byref(origin))):
+            return None
+        return origin.x, origin.y, rect.right - rect.left, rect.bottom - rect.top
+
+    def _track_game_window(self, hwnd):
+        """Re-scope the location hook to the game's process (runs on the hook thread)"""
+        if hwnd == self.game_hwnd and self._geometry_hook:
+            return
+        if self._geometry_hook:
+            self.user32.UnhookWinEvent(self._geometry_hook)
+        self.game_hwnd = hwnd
+        self._geometry_hook = self.user32.SetWinEventHook(
+            self.EVENT_OBJECT_LOCATIONCHANGE, self.EVENT_OBJECT_LOCATIONCHANGE, None,
+            self._geometry_proc, self.window_pid(hwnd), 0, self.WINEVENT_OUTOFCONTEXT)
+        self._set_client_rect(self.client_rect_of(hwnd))
+
+    def _on_foreground(self, hwnd):
+        try:
+            focused = bool(hwnd) and self.window_matches(hwnd)
+            if focused:
+                self._track_game_window(hwnd)
+            self._set_focused(focused)
+        except Exception:
+            self._set_focused(False)
+
+    def _on_location_change(self, hwnd, obj):
+        if hwnd and hwnd == self.game_hwnd and obj == self.OBJID_WINDOW:
+            self._set_client_rect(self.client_rect_of(hwnd))
+
+    def _run(self):
+        ctypes, wintypes = self.ctypes, self.wintypes
+        self._thread_id = self.kernel32.GetCurrentThreadId()
+        self._hook_proc = self.WinEventProc(
+            lambda hook, event, hwnd, obj, child, thread, ms: self._on_foreground(hwnd))
+        self._geometry_proc = self.WinEventProc(
+            lambda hook, event, hwnd, obj, child, thread, ms: self._on_location_change(hwnd, obj))
+        hook = self.user32.SetWinEventHook(self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND,
+                                           None, self._hook_proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+        if self.game_hwnd:
+            self._track_game_window(self.game_hwnd)
+        self._on_foreground(self.user32.GetForegroundWindow())
+
+        msg = wintypes.MSG()
+        while self.user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            self.user32.TranslateMessage(ctypes.byref(msg))
+            self.user32.DispatchMessageW(ctypes.byref(msg))
+        self.user32.UnhookWinEvent(hook)
+        if self._geometry_hook:
+            self.user32.UnhookWinEvent(self._geometry_hook)
+
+    def stop(self):
+        super().stop()
+        if self._thread_id is not None:
+            self.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+
+
+def create_focus_provider(fallback_check: Callable[[], bool],
+                          poll_interval: float = 0.5,
+                          finder: Optional[GameProcessFinder] = None) -> FocusProvider:
+    """Best available focus provider for this platform
+
+    fallback_check is polled every poll_interval seconds if no event source
+    is available (macOS, X11 without python-xlib, Wayland...).
+    """
+    system = platform.system()
+    try:
+        if system == "Windows":
+            return WindowsFocusProvider(finder)
+        if system == "Linux":
+            return X11FocusProvider(finder)
+    except Exception as e:
+        print(f"Event-driven focus tracking unavailable ({e}); polling every {poll_interval}s instead")
+    return PollingFocusProvider(fallback_check, poll_interval)
+
+
+def locate_game_client_rect() -> Optional[Rect]:
+    """One-shot lookup of the game's client rectangle (None if unavailable)"""
+    try:
+        provider = create_focus_provider(lambda: False)
+    except Exception:
+        return None
+    rect = provider.client_rect
+    if isinstance(provider, X11FocusProvider):
+        provider.display.close()
+    return rect